@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Microbenchmark of storage.utils.pseudofolder_object_list against its
+previous list-based implementation, on delimiter listings of 10k to 100k
+entries (one subdir for every 4 objects).
+
+Usage: python helpers/benchmarks/pseudofolder_object_list.py [repeat]
+"""
+
+import os
+import re
+import sys
+import copy
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'vault.settings_test')
+
+import django  # noqa: E402
+django.setup()
+
+from storage.utils import pseudofolder_object_list  # noqa: E402
+
+
+PUBLIC_URL = 'https://s3.fakeurl/v1/AUTH_1/internal_container'
+
+
+def previous_pseudofolder_object_list(objects, prefix, public_url):
+    pseudofolders = []
+    objs = []
+    duplist = []
+
+    for obj in objects:
+        if obj.get('content_type', None) in ('application/directory',
+                                             'application/x-directory'):
+            obj['subdir'] = obj['name']
+
+        if 'subdir' in obj:
+            entry = obj['subdir'].strip('/') + '/'
+            if entry != prefix and entry not in duplist:
+                duplist.append(entry)
+                pseudofolders.append({'prefix': entry, 'name': obj['subdir']})
+        else:
+            pattern = re.compile('^internal_.+')
+            if pattern.match(public_url.split('/')[-1]):
+                public_url = public_url.replace('://s3.', '://i.s3.')
+            obj['public_url'] = public_url + '/' + obj['name']
+            objs.append(obj)
+
+    return pseudofolders + objs
+
+
+def listing(size):
+    objects = []
+    for i in range(size):
+        if i % 5 == 0:
+            objects.append({'subdir': 'folder/sub{:06}/'.format(i)})
+        else:
+            objects.append({'name': 'folder/obj{:06}'.format(i), 'bytes': i,
+                            'content_type': 'text/plain'})
+    return objects
+
+
+def bench(func, objects, repeat):
+    def run():
+        for _ in func(copy.copy(objects), 'folder/', PUBLIC_URL):
+            pass
+
+    return min(timeit.repeat(run, number=1, repeat=repeat))
+
+
+def main(repeat=3):
+    print('{:>8} {:>12} {:>12} {:>8}'.format(
+        'entries', 'previous (s)', 'current (s)', 'speedup'))
+
+    for size in (10000, 25000, 50000, 100000):
+        objects = listing(size)
+
+        expected = previous_pseudofolder_object_list(listing(size), 'folder/',
+                                                     PUBLIC_URL)
+        assert list(pseudofolder_object_list(listing(size), 'folder/',
+                                             PUBLIC_URL)) == expected
+
+        previous = bench(previous_pseudofolder_object_list, objects, repeat)
+        current = bench(pseudofolder_object_list, objects, repeat)
+
+        print('{:>8} {:>12.4f} {:>12.4f} {:>7.1f}x'.format(
+            size, previous, current, previous / current))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
@@ -4,6 +4,7 @@
 # Vault database and migrations
 python helpers/docker/vault/create_db.py
 python manage.py migrate
+python manage.py createcachetable
 
 # create user, group, user_group
 python manage.py create_user -s -u admin -e 'admin@admin' -t SampleGroup -p admin
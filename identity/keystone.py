@@ -1,9 +1,13 @@
 # -*- coding: utf-8 -*-
 
 import random
+import time
 import string
+import hashlib
 import logging
-import requests
+import threading
+
+from collections import OrderedDict
 
 from keystoneclient import exceptions, v3
 
@@ -11,13 +15,332 @@ from django.conf import settings
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth.models import User, Group
 
+from vault.access import invalidate_access
 from vault.models import GroupProjects
 from identity.models import Project
+from storage.connection import swift_pool
 
 
 log = logging.getLogger(__name__)
 
 
+class KeystoneSessions:
+    """
+    Per-process cache of Keystone tokens, keyed by the identity they were
+    issued to (auth URL, username, password and project).
+
+    Clients are built from the cached token (auth_ref) of their identity,
+    without authenticating again. A token that expires in less than
+    KEYSTONE_TOKEN_REFRESH seconds is renewed by a background thread while
+    it is still used; an expired one is renewed before returning, by a
+    single thread per identity.
+    """
+
+    # Seconds before its expiration a token is no longer used
+    stale_duration = 30
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._auth_refs = {}
+        self._key_locks = {}
+        self._refreshing = set()
+
+    def _key(self, config):
+        password = hashlib.sha256(
+            str(config.get('password')).encode('utf-8')).hexdigest()
+
+        return (config.get('auth_url'), config.get('username'), password,
+                config.get('project_name'))
+
+    def _stale(self, auth_ref):
+        return auth_ref is None or auth_ref.will_expire_soon(self.stale_duration)
+
+    def _authenticate(self, key, config):
+        conn = v3.client.Client(**config)
+
+        with self._lock:
+            self._auth_refs[key] = conn.auth_ref
+
+        return conn
+
+    def _refresh(self, key, config):
+        try:
+            self._authenticate(key, config)
+        except Exception as err:
+            log.exception('Exception: {0}'.format(err))
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def client(self, config):
+        """Returns a keystoneclient v3 Client for config, reusing the token
+        of its identity."""
+
+        key = self._key(config)
+
+        with self._lock:
+            auth_ref = self._auth_refs.get(key)
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        if self._stale(auth_ref):
+            with key_lock:
+                with self._lock:
+                    auth_ref = self._auth_refs.get(key)
+
+                if self._stale(auth_ref):
+                    return self._authenticate(key, config)
+
+        refresh_soon = auth_ref.will_expire_soon(settings.KEYSTONE_TOKEN_REFRESH)
+
+        with self._lock:
+            refresh = refresh_soon and key not in self._refreshing
+            if refresh:
+                self._refreshing.add(key)
+
+        if refresh:
+            threading.Thread(target=self._refresh, args=(key, config),
+                             daemon=True).start()
+
+        return v3.client.Client(auth_ref=auth_ref, **config)
+
+    def clear(self):
+        """Forgets every token."""
+
+        with self._lock:
+            self._auth_refs.clear()
+
+
+keystone_sessions = KeystoneSessions()
+
+
+class KeystoneClients:
+    """
+    Bounded LRU cache of Keystone connections, keyed by the identity they
+    act as (auth URL, username, password and project), holding up to
+    KEYSTONE_CLIENT_CACHE_SIZE of them.
+
+    A connection is dropped when its token gets close to its expiration,
+    and all of them when a project or user changes (invalidate()). Only
+    the connection is shared: whether the user of a request may use it is
+    decided again for every request.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients = OrderedDict()
+
+    def _key(self, username=None, password=None, project_name=None):
+        password = hashlib.sha256(str(
+            password or settings.KEYSTONE_PASSWORD).encode('utf-8')).hexdigest()
+
+        return (settings.KEYSTONE_URL, username or settings.KEYSTONE_USERNAME,
+                password, project_name or settings.KEYSTONE_PROJECT)
+
+    def _expired(self, keystone):
+        auth_ref = getattr(keystone.conn, 'auth_ref', None)
+        if auth_ref is None:
+            return True
+
+        return auth_ref.will_expire_soon(settings.KEYSTONE_TOKEN_REFRESH)
+
+    def get_keystone(self, request, username=None, password=None,
+                     project_name=None):
+        """
+        Returns a connection acting as the given identity (Vault's Keystone
+        user by default), or None when the user of request is not allowed to
+        connect to the project in session.
+        """
+
+        if not Keystone.is_allowed_to_connect(request):
+            return None
+
+        key = self._key(username, password, project_name)
+
+        with self._lock:
+            keystone = self._clients.get(key)
+            if keystone is not None:
+                self._clients.move_to_end(key)
+
+        if keystone is not None and not self._expired(keystone):
+            return keystone
+
+        keystone = KeystoneNoRequest(username, password, project_name)
+        if keystone.conn is None:
+            return keystone
+
+        with self._lock:
+            self._clients[key] = keystone
+            self._clients.move_to_end(key)
+            while len(self._clients) > settings.KEYSTONE_CLIENT_CACHE_SIZE:
+                self._clients.popitem(last=False)
+
+        return keystone
+
+    def invalidate(self):
+        """Drops every connection."""
+
+        with self._lock:
+            self._clients.clear()
+
+
+keystone_clients = KeystoneClients()
+
+
+class KeystoneDirectory:
+    """
+    Per-process copy of the projects, users and roles of Keystone, indexed
+    by id and by name, so finding one of them doesn't list them all again.
+
+    An index is fresh for KEYSTONE_DIRECTORY_TTL seconds (0 disables it).
+    Up to twice as old, it is still used while a background thread lists its
+    kind again; older than that, it is listed again before returning. A name
+    or id that is not found lists its kind again, at most once every
+    miss_interval seconds.
+
+    Indexes are kept per identity, as each sees different resources.
+    KeystoneBase writes through: its creates, updates and deletes are applied
+    to the index of its identity, and drop the same kind of the others.
+    """
+
+    # Seconds an index is used for names or ids it does not have
+    miss_interval = 5
+
+    loaders = {
+        'projects': lambda keystone: keystone.project_list(),
+        'users': lambda keystone: keystone.user_list(),
+        'roles': lambda keystone: keystone.conn.roles.list(),
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._indexes = {}
+        self._generations = {}
+        self._refreshing = set()
+
+    def _key(self, keystone, kind):
+        config = keystone.config
+        return (kind, config.get('auth_url'), config.get('username'),
+                config.get('project_name'))
+
+    def _load(self, keystone, kind, key=None):
+        with self._lock:
+            generation = self._generations.get(kind, 0)
+
+        index = {'time': time.monotonic(), 'id': {}, 'name': {}}
+        for item in self.loaders[kind](keystone):
+            index['id'][item.id] = item
+            index['name'].setdefault(item.name, item)
+
+        # Unless it was written while it was listed, the index is kept
+        with self._lock:
+            if key is not None and self._generations.get(kind, 0) == generation:
+                self._indexes[key] = index
+
+        return index
+
+    def _refresh(self, keystone, kind, key):
+        try:
+            self._load(keystone, kind, key)
+        except Exception as err:
+            log.exception('Exception: {0}'.format(err))
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _index(self, keystone, kind, miss=False):
+        ttl = settings.KEYSTONE_DIRECTORY_TTL
+        if ttl <= 0:
+            return self._load(keystone, kind)
+
+        key = self._key(keystone, kind)
+
+        with self._lock:
+            index = self._indexes.get(key)
+
+        if index is None:
+            return self._load(keystone, kind, key)
+
+        age = time.monotonic() - index['time']
+        if age > 2 * ttl or (miss and age > self.miss_interval):
+            return self._load(keystone, kind, key)
+
+        if age > ttl:
+            with self._lock:
+                refresh = key not in self._refreshing
+                if refresh:
+                    self._refreshing.add(key)
+
+            if refresh:
+                threading.Thread(target=self._refresh,
+                                 args=(keystone, kind, key),
+                                 daemon=True).start()
+
+        return index
+
+    def get(self, keystone, kind, name=None, id=None):
+        """Returns the project, user or role (kind) with the given name or
+        id, or None."""
+
+        field, value = ('name', name) if id is None else ('id', id)
+
+        index = self._index(keystone, kind)
+        with self._lock:
+            item = index[field].get(value)
+
+        if item is None and settings.KEYSTONE_DIRECTORY_TTL > 0:
+            index = self._index(keystone, kind, miss=True)
+            with self._lock:
+                item = index[field].get(value)
+
+        return item
+
+    def list(self, keystone, kind):
+        index = self._index(keystone, kind)
+
+        with self._lock:
+            return list(index['id'].values())
+
+    def _write(self, keystone, kind, id, item=None):
+        key = self._key(keystone, kind)
+
+        with self._lock:
+            self._generations[kind] = self._generations.get(kind, 0) + 1
+            for other in [k for k in self._indexes if k[0] == kind and k != key]:
+                del self._indexes[other]
+
+            index = self._indexes.get(key)
+            if index is None:
+                return
+
+            old = index['id'].pop(id, None)
+            if old is not None and index['name'].get(old.name) is old:
+                del index['name'][old.name]
+
+            if item is not None:
+                index['id'][id] = item
+                index['name'][item.name] = item
+
+    def store(self, keystone, kind, item):
+        """Writes a created or updated resource through."""
+        self._write(keystone, kind, item.id, item)
+
+    def discard(self, keystone, kind, id):
+        """Writes a deleted resource through."""
+        self._write(keystone, kind, id)
+
+    def invalidate(self, kind=None):
+        """Drops the indexes of kind, or all of them."""
+
+        with self._lock:
+            for key in [k for k in self._indexes if kind in (None, k[0])]:
+                del self._indexes[key]
+            for name in (kind,) if kind else tuple(self.loaders):
+                self._generations[name] = self._generations.get(name, 0) + 1
+
+
+keystone_directory = KeystoneDirectory()
+
+
 class KeystoneBase:
 
     def __init__(self, username=None, password=None, project_name=None,
@@ -44,9 +367,7 @@ class KeystoneBase:
         return True
 
     def _create_keystone_connection(self):
-        client = v3.client
-
-        return client.Client(**self.config)
+        return keystone_sessions.client(self.config)
 
     def vault_database_project_delete(self, project_id):
         project = Project.objects.filter(project=project_id)
@@ -121,6 +442,8 @@ class KeystoneBase:
             # if self.config['version'] > 2 or role.name != '_member_':
             self.add_user_role(user, project, role)
 
+        keystone_directory.store(self, 'users', user)
+
         return user
 
     def user_update(self, user, **data):
@@ -129,46 +452,65 @@ class KeystoneBase:
             data.pop('password')
 
         user = self.conn.users.update(user, **data)
+        keystone_directory.store(self, 'users', user)
+        keystone_clients.invalidate()
 
         return user
 
     def user_update_password(self, user, password):
-        return self.conn.users.update(user, password=password)
+        result = self.conn.users.update(user, password=password)
+        keystone_clients.invalidate()
+        return result
 
     def user_delete(self, user_id):
-        return self.conn.users.delete(user_id)
+        result = self.conn.users.delete(user_id)
+        keystone_directory.discard(self, 'users', user_id)
+        keystone_clients.invalidate()
+        return result
 
     def user_get_by_name(self, user_name):
-        users = self.user_list()
-
-        for user in users:
-            if user.name == user_name:
-                return user
-
-        return None
+        return keystone_directory.get(self, 'users', name=user_name)
 
     def user_update_enabled(self, user_id, enabled=False):
-        return self.conn.users.update_enabled(user_id, enabled)
+        result = self.conn.users.update_enabled(user_id, enabled)
+        keystone_directory.invalidate('users')
+        keystone_clients.invalidate()
+        return result
 
     def project_create(self, name, domain_id='default', description=None,
                        enabled=True, **kwargs):
         conn = self._project_manager()
+        project = conn.create(name, domain_id, description=description,
+                              enabled=enabled, **kwargs)
+        keystone_directory.store(self, 'projects', project)
+        invalidate_access()
 
-        return conn.create(name, domain_id, description=description,
-                           enabled=enabled, **kwargs)
+        return project
 
     def project_update(self, project, **kwargs):
         conn = self._project_manager()
+        result = conn.update(project, **kwargs)
+        keystone_directory.store(self, 'projects', result)
+        keystone_clients.invalidate()
+        invalidate_access()
 
-        return conn.update(project, **kwargs)
+        return result
 
     def project_delete(self, project_id):
         conn = self._project_manager()
-        return conn.delete(project_id)
+        result = conn.delete(project_id)
+        keystone_directory.discard(self, 'projects', project_id)
+        keystone_clients.invalidate()
+        invalidate_access()
+        return result
 
     def project_update_enabled(self, project_id, enabled=False):
         project = self.project_get(project_id)
-        return project.update(enabled=enabled)
+        result = project.update(enabled=enabled)
+        keystone_directory.invalidate('projects')
+        keystone_clients.invalidate()
+        invalidate_access()
+        return result
 
     def project_list(self):
         conn = self._project_manager()
@@ -179,16 +521,13 @@ class KeystoneBase:
         return conn.get(project_id)
 
     def project_get_by_name(self, project_name):
-        projects = self.project_list()
-
-        for project in projects:
-            if project.name == project_name:
-                return project
-
-        return None
+        return keystone_directory.get(self, 'projects', name=project_name)
 
     def role_list(self):
-        return self.conn.roles.list()
+        return keystone_directory.list(self, 'roles')
+
+    def role_get_by_name(self, role_name):
+        return keystone_directory.get(self, 'roles', name=role_name)
 
     def role_get(self, role_id):
         return self.conn.roles.get(role_id)
@@ -454,17 +793,21 @@ class KeystoneBase:
         _, project_admin_id = storage_url.split('AUTH_')
         url = storage_url.replace(project_admin_id, project_id)
 
-        return requests.delete(url, headers=headers, verify=verify)
+        return swift_pool.session(url).delete(url, headers=headers,
+                                              verify=verify)
 
     def find_user_with_u_prefix(self, project_id, prefix):
-        project = self.project_get(project_id)
-        users = self.user_list(project.id)
+        project = keystone_directory.get(self, 'projects', id=project_id)
+        if project is None:
+            project = self.project_get(project_id)
+        user = keystone_directory.get(
+            self, 'users', name='{}_{}'.format(prefix, project.name))
 
-        for user in users:
-            if user.name == '{}_{}'.format(prefix, project.name):
-                return user
+        # Only users of the project (default project), as user_list(project)
+        if getattr(user, 'default_project_id', None) != project.id:
+            return None
 
-        return None
+        return user
 
     @staticmethod
     def create_password():
@@ -513,14 +856,18 @@ class Keystone(KeystoneBase):
         return self._is_allowed_to_connect()
 
     def _is_allowed_to_connect(self):
+        return self.is_allowed_to_connect(self.request)
+
+    @staticmethod
+    def is_allowed_to_connect(request):
         """
         Check if logged user can access the project set on session.
         If no project was set, it means that it should connect to the "admin"
         project.
         """
 
-        project_id = self.request.session.get('project_id')
-        groups = self.request.user.groups.all()
+        project_id = request.session.get('project_id')
+        groups = request.user.groups.all()
         group_projects = []
 
         if project_id:
@@ -535,7 +882,7 @@ class Keystone(KeystoneBase):
                 return True
 
         # Pode autenticar se project pertence ao time do usuario
-        if not group_projects and not self.request.user.is_superuser:
+        if not group_projects and not request.user.is_superuser:
             log.warning(_('Permission denied to manage this project'))
             return False
 
@@ -27,6 +27,15 @@ class FakeToken:
         self.id = id
 
 
+class FakeAuthRef:
+    """ Fake Keystone token (auth_ref), expiring in expires_in seconds """
+    def __init__(self, expires_in=3600):
+        self.expires_in = expires_in
+
+    def will_expire_soon(self, stale_duration=30):
+        return self.expires_in <= stale_duration
+
+
 class FakeKeystone:
 
     def __init__(self, request):
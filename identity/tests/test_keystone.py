@@ -1,5 +1,8 @@
 # -*- coding:utf-8 -*-
 
+import time
+import threading
+
 from uuid import uuid4
 from unittest import TestCase
 from unittest.mock import patch, MagicMock
@@ -7,10 +10,14 @@ from keystoneclient.v3.projects import Project
 from keystoneclient import exceptions
 
 from django.conf import settings
+from django.test import override_settings
 from django.contrib.auth.models import User, Group
 
-from identity.keystone import Keystone
-from identity.tests.fakes import UserFactory, GroupFactory, FakeResource
+from identity.keystone import (Keystone, KeystoneNoRequest, KeystoneSessions,
+                               KeystoneClients, KeystoneDirectory,
+                               keystone_clients, keystone_directory)
+from identity.tests.fakes import (UserFactory, GroupFactory, FakeResource,
+                                  FakeAuthRef)
 
 from vault.tests.fakes import fake_request
 from vault.models import GroupProjects
@@ -356,3 +363,388 @@ class TestKeystonePermissionToConnect(TestCase):
 
         keystone = Keystone(self.request, project_name='abcdefg')
         self.assertEqual(keystone.conn, None)
+
+
+class TestKeystoneSessions(TestCase):
+
+    config = {'auth_url': 'http://keystone/v3', 'username': 'u_vault',
+              'password': 'secret', 'project_name': 'Vault'}
+
+    expires_in = 3600
+
+    def setUp(self):
+        self.sessions = KeystoneSessions()
+        self.auth_refs = []
+        self.lock = threading.Lock()
+        self.mock_client = patch('identity.keystone.v3.client.Client').start()
+        self.mock_client.side_effect = self.client
+
+    def tearDown(self):
+        patch.stopall()
+
+    def client(self, auth_ref=None, **config):
+        """Fake v3 Client, which authenticates without an auth_ref"""
+        conn = MagicMock()
+
+        if auth_ref is None:
+            time.sleep(0.01)
+            with self.lock:
+                auth_ref = FakeAuthRef(self.expires_in)
+                self.auth_refs.append(auth_ref)
+
+        conn.auth_ref = auth_ref
+        return conn
+
+    def authentications(self):
+        return len(self.auth_refs)
+
+    def test_token_is_reused(self):
+        first = self.sessions.client(self.config)
+        second = self.sessions.client(dict(self.config, remote_addr='10.0.0.1'))
+
+        self.assertEqual(self.authentications(), 1)
+        self.assertIs(second.auth_ref, first.auth_ref)
+        self.assertEqual(self.mock_client.call_args[1]['remote_addr'], '10.0.0.1')
+
+    def test_token_is_per_identity(self):
+        self.sessions.client(self.config)
+        self.sessions.client(dict(self.config, project_name='Other'))
+        self.sessions.client(dict(self.config, password='wrong'))
+
+        self.assertEqual(self.authentications(), 3)
+
+    def test_expired_token_is_renewed(self):
+        self.sessions.client(self.config)
+        self.auth_refs[0].expires_in = 10
+
+        conn = self.sessions.client(self.config)
+
+        self.assertEqual(self.authentications(), 2)
+        self.assertIs(conn.auth_ref, self.auth_refs[1])
+
+    def test_expiring_token_is_renewed_in_background(self):
+        self.sessions.client(self.config)
+        self.auth_refs[0].expires_in = 60
+
+        conn = self.sessions.client(self.config)
+
+        self.assertIs(conn.auth_ref, self.auth_refs[0])
+        for _ in range(100):
+            if self.authentications() == 2 and not self.sessions._refreshing:
+                break
+            time.sleep(0.01)
+
+        self.assertEqual(self.authentications(), 2)
+        self.assertIs(self.sessions.client(self.config).auth_ref, self.auth_refs[1])
+
+    def test_concurrent_clients_authenticate_once(self):
+        conns = []
+
+        def connect():
+            conns.append(self.sessions.client(self.config))
+
+        threads = [threading.Thread(target=connect) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(conns), 20)
+        self.assertEqual(self.authentications(), 1)
+        self.assertTrue(all(c.auth_ref is self.auth_refs[0] for c in conns))
+
+
+class TestKeystoneClients(TestCase):
+
+    expires_in = 3600
+
+    def setUp(self):
+        self.clients = KeystoneClients()
+        self.conns = []
+        self.lock = threading.Lock()
+
+        self.mock_allowed = patch(
+            'identity.keystone.Keystone.is_allowed_to_connect').start()
+        self.mock_allowed.side_effect = lambda request: request.user.allowed
+
+        self.mock_conn = patch(
+            'identity.keystone.KeystoneBase._create_keystone_connection').start()
+        self.mock_conn.side_effect = self.connection
+
+    def tearDown(self):
+        patch.stopall()
+        keystone_clients.invalidate()
+
+    def connection(self):
+        conn = MagicMock()
+        conn.auth_ref = FakeAuthRef(self.expires_in)
+
+        with self.lock:
+            self.conns.append(conn)
+
+        return conn
+
+    def request(self, allowed=True):
+        request = MagicMock()
+        request.user.allowed = allowed
+        return request
+
+    def test_connection_is_reused(self):
+        first = self.clients.get_keystone(self.request())
+        second = self.clients.get_keystone(self.request())
+
+        self.assertIs(second, first)
+        self.assertEqual(len(self.conns), 1)
+
+    def test_connection_is_per_identity(self):
+        first = self.clients.get_keystone(self.request())
+        other = self.clients.get_keystone(self.request(), username='u_other',
+                                          password='secret')
+
+        self.assertIsNot(other, first)
+        self.assertEqual(other.config['username'], 'u_other')
+        self.assertEqual(len(self.conns), 2)
+
+    def test_not_allowed_user_gets_no_connection(self):
+        self.clients.get_keystone(self.request())
+
+        self.assertIsNone(self.clients.get_keystone(self.request(allowed=False)))
+        self.assertEqual(len(self.conns), 1)
+
+    def test_expiring_connection_is_renewed(self):
+        first = self.clients.get_keystone(self.request())
+        first.conn.auth_ref.expires_in = settings.KEYSTONE_TOKEN_REFRESH
+
+        second = self.clients.get_keystone(self.request())
+
+        self.assertIsNot(second, first)
+        self.assertIs(self.clients.get_keystone(self.request()), second)
+
+    def test_failed_connection_is_not_kept(self):
+        self.mock_conn.side_effect = None
+        self.mock_conn.return_value = None
+
+        self.assertIsNone(self.clients.get_keystone(self.request()).conn)
+        self.assertEqual(len(self.clients._clients), 0)
+
+    @override_settings(KEYSTONE_CLIENT_CACHE_SIZE=2)
+    def test_least_recently_used_connection_is_dropped(self):
+        first = self.clients.get_keystone(self.request(), username='u_1')
+        self.clients.get_keystone(self.request(), username='u_2')
+        self.clients.get_keystone(self.request(), username='u_1')
+        self.clients.get_keystone(self.request(), username='u_3')
+
+        self.assertEqual(len(self.clients._clients), 2)
+        self.assertIs(self.clients.get_keystone(self.request(), username='u_1'), first)
+        self.clients.get_keystone(self.request(), username='u_2')
+        self.assertEqual(len(self.conns), 4)
+
+    def test_project_and_user_changes_invalidate(self):
+        keystone = keystone_clients.get_keystone(self.request())
+
+        keystone.project_update('1', name='new_name')
+        self.assertIsNot(keystone_clients.get_keystone(self.request()), keystone)
+
+        keystone = keystone_clients.get_keystone(self.request())
+        keystone.user_delete('1')
+        self.assertIsNot(keystone_clients.get_keystone(self.request()), keystone)
+
+    def test_concurrent_requests_never_share_decisions(self):
+        results = {}
+        first = self.clients.get_keystone(self.request())
+
+        def get(index):
+            allowed = index % 2 == 0
+            for _ in range(20):
+                keystone = self.clients.get_keystone(self.request(allowed))
+                results.setdefault(index, set()).add(
+                    None if keystone is None else id(keystone))
+
+        threads = [threading.Thread(target=get, args=(i,)) for i in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for index, seen in results.items():
+            expected = {id(first)} if index % 2 == 0 else {None}
+            self.assertEqual(seen, expected)
+
+        self.assertEqual(len(self.conns), 1)
+
+    def test_concurrent_misses_keep_one_connection(self):
+        keystones = []
+
+        def get():
+            keystones.append(self.clients.get_keystone(self.request()))
+
+        threads = [threading.Thread(target=get) for _ in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(keystones), 16)
+        self.assertEqual(len(self.clients._clients), 1)
+        self.assertIn(self.clients.get_keystone(self.request()), keystones)
+
+
+class TestKeystoneDirectory(TestCase):
+
+    def setUp(self):
+        self.ttl = override_settings(KEYSTONE_DIRECTORY_TTL=60)
+        self.ttl.enable()
+
+        self.directory = KeystoneDirectory()
+        self.projects = [FakeResource(1, 'project1'), FakeResource(2, 'project2')]
+
+        self.mock_conn = patch(
+            'identity.keystone.KeystoneBase._create_keystone_connection').start()
+        self.conn = self.mock_conn.return_value
+        self.conn.projects.list.side_effect = lambda: list(self.projects)
+
+        self.keystone = KeystoneNoRequest()
+
+    def tearDown(self):
+        patch.stopall()
+        self.ttl.disable()
+        keystone_directory.invalidate()
+
+    def listings(self):
+        return self.conn.projects.list.call_count
+
+    def age(self, seconds):
+        for index in self.directory._indexes.values():
+            index['time'] -= seconds
+
+    def test_lookups_list_once(self):
+        by_name = self.directory.get(self.keystone, 'projects', name='project2')
+        by_id = self.directory.get(self.keystone, 'projects', id=1)
+
+        self.assertEqual(by_name.id, 2)
+        self.assertEqual(by_id.name, 'project1')
+        self.assertEqual(self.listings(), 1)
+
+    def test_missing_name_lists_again_once_per_interval(self):
+        self.directory.get(self.keystone, 'projects', name='project1')
+        self.projects.append(FakeResource(3, 'project3'))
+
+        self.assertIsNone(self.directory.get(self.keystone, 'projects', name='project3'))
+        self.assertEqual(self.listings(), 1)
+
+        self.age(self.directory.miss_interval + 1)
+        project = self.directory.get(self.keystone, 'projects', name='project3')
+
+        self.assertEqual(project.id, 3)
+        self.assertEqual(self.listings(), 2)
+
+    def test_stale_index_is_refreshed_in_background(self):
+        self.directory.get(self.keystone, 'projects', name='project1')
+        self.projects[0] = FakeResource(1, 'renamed')
+        self.age(61)
+
+        project = self.directory.get(self.keystone, 'projects', name='project1')
+
+        self.assertEqual(project.id, 1)
+        for _ in range(100):
+            if self.listings() == 2 and not self.directory._refreshing:
+                break
+            time.sleep(0.01)
+
+        self.assertEqual(self.listings(), 2)
+        self.assertEqual(self.directory.get(self.keystone, 'projects', id=1).name, 'renamed')
+
+    def test_expired_index_is_listed_before_returning(self):
+        self.directory.get(self.keystone, 'projects', name='project1')
+        self.projects[0] = FakeResource(1, 'renamed')
+        self.age(121)
+
+        project = self.directory.get(self.keystone, 'projects', id=1)
+
+        self.assertEqual(project.name, 'renamed')
+        self.assertEqual(self.listings(), 2)
+
+    @override_settings(KEYSTONE_DIRECTORY_TTL=0)
+    def test_disabled_lists_on_every_lookup(self):
+        self.directory.get(self.keystone, 'projects', name='project1')
+        self.directory.get(self.keystone, 'projects', name='project1')
+
+        self.assertEqual(self.listings(), 2)
+        self.assertEqual(self.directory._indexes, {})
+
+    def test_project_writes_go_through(self):
+        self.keystone.project_get_by_name('project1')
+
+        self.conn.projects.create.return_value = FakeResource(3, 'project3')
+        self.keystone.project_create('project3')
+        self.assertEqual(self.keystone.project_get_by_name('project3').id, 3)
+
+        self.conn.projects.update.return_value = FakeResource(1, 'renamed')
+        self.keystone.project_update(1, name='renamed')
+        self.assertEqual(self.keystone.project_get_by_name('renamed').id, 1)
+        self.assertIsNone(self.keystone.project_get_by_name('project1'))
+
+        self.keystone.project_delete(2)
+        self.assertIsNone(self.keystone.project_get_by_name('project2'))
+
+        self.assertEqual(self.listings(), 1)
+
+    def test_user_writes_go_through(self):
+        self.conn.users.list.return_value = [FakeResource(1, 'u_project1')]
+        self.assertEqual(self.keystone.user_get_by_name('u_project1').id, 1)
+
+        self.conn.users.create.return_value = FakeResource(2, 'user2')
+        self.keystone.user_create('user2')
+        self.assertEqual(self.keystone.user_get_by_name('user2').id, 2)
+
+        self.keystone.user_delete(1)
+        self.assertIsNone(self.keystone.user_get_by_name('u_project1'))
+
+        self.assertEqual(self.conn.users.list.call_count, 1)
+
+    def test_writes_drop_other_identities(self):
+        other = KeystoneNoRequest(username='u_other', password='secret')
+        self.keystone.project_get_by_name('project1')
+        other.project_get_by_name('project1')
+
+        self.conn.projects.create.return_value = FakeResource(3, 'project3')
+        self.keystone.project_create('project3')
+        other.project_get_by_name('project3')
+
+        self.assertEqual(self.listings(), 3)
+
+    def test_role_list_is_cached(self):
+        self.conn.roles.list.return_value = [FakeResource(1, 'swiftoperator')]
+
+        self.assertEqual(len(self.keystone.role_list()), 1)
+        self.assertEqual(self.keystone.role_get_by_name('swiftoperator').id, 1)
+        self.assertEqual(self.conn.roles.list.call_count, 1)
+
+    def test_find_user_with_u_prefix(self):
+        user = FakeResource(5, 'u_project1')
+        user.default_project_id = 1
+        other = FakeResource(6, 'u_vault_project1')
+        other.default_project_id = 2
+        self.conn.users.list.return_value = [user, other]
+
+        self.assertIs(self.keystone.find_user_with_u_prefix(1, 'u'), user)
+        self.assertIsNone(self.keystone.find_user_with_u_prefix(1, 'u_vault'))
+        self.assertFalse(self.conn.projects.get.called)
+
+    def test_concurrent_lookups(self):
+        found = []
+
+        def get(index):
+            project = self.directory.get(self.keystone, 'projects',
+                                         name='project{}'.format(index % 2 + 1))
+            found.append((index, project.id))
+
+        self.directory.get(self.keystone, 'projects', id=1)
+        threads = [threading.Thread(target=get, args=(i,)) for i in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(found), [(i, i % 2 + 1) for i in range(16)])
+        self.assertEqual(self.listings(), 1)
@@ -442,10 +442,8 @@ class ChangeProjectView(LoginRequiredMixin, WithKeystoneMixin, TemplateView):
 
     def _get_data(self):
         """Retrieve sorted list of projects"""
-        user = self.request.user
-        groups = user.groups.all()
         try:
-            keystone = Keystone(self.request)
+            teams = utils.accessible_projects(self.request.user)
         except exceptions.AuthorizationFailure:
             msg = _("Unable to retrieve Keystone data")
             messages.add_message(self.request, messages.ERROR, msg)
@@ -453,22 +451,15 @@ class ChangeProjectView(LoginRequiredMixin, WithKeystoneMixin, TemplateView):
 
             return []
 
-        projects = []
-
-        for group in groups:
-            gps = GroupProjects.objects.filter(group=group.id)
-            gps_ks = [x for x in filter(lambda x: x.enabled, keystone.project_list())]
+        project_name = self.request.GET.get('project_name', '')
+        projects = {}
 
-            for gp in gps:
-                for gp_ks in gps_ks:
-                    if gp.project == gp_ks.id and gp_ks not in projects:
-                        if self.request.GET.get('project_name', '') in gp_ks.name:
-                            projects.append(gp_ks)
-                        break
+        for team in teams:
+            for project in team['projects']:
+                if project['enabled'] and project_name in project['name']:
+                    projects[project['id']] = project
 
-            projects.sort(key=lambda x: x.name.lower())
-
-        return projects
+        return sorted(projects.values(), key=lambda x: x['name'].lower())
 
 
 class UpdateProjectView(BaseProjectView):
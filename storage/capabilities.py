@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+""" Cache of the capabilities published by Swift clusters on /info. """
+
+import json
+import time
+import logging
+import threading
+import requests
+
+from django.conf import settings
+
+from storage.connection import swift_pool
+
+log = logging.getLogger(__name__)
+
+
+class SwiftCapabilities:
+    """
+    Keeps the /info of each Swift cluster, as capabilities like bulk delete
+    limits, SLO limits and tempurl methods almost never change.
+
+    An entry is used for SWIFT_INFO_CACHE_TIME seconds. After that it is
+    still returned while a background thread fetches it again. If /info
+    can't be fetched, the last known capabilities are kept (or an empty dict
+    is returned for an unknown cluster) and the fetch is tried again after
+    retry_time seconds.
+    """
+
+    retry_time = 60
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._info = {}
+        self._refreshing = set()
+
+    def _info_url(self, storage_url):
+        return storage_url.split('v1')[0] + 'info'
+
+    def _refresh(self, info_url):
+        info, ttl = None, settings.SWIFT_INFO_CACHE_TIME
+
+        try:
+            res = swift_pool.session(info_url).get(info_url,
+                timeout=int(settings.SWIFT_REQUESTS_TIMEOUT),
+                verify=not settings.SWIFT_INSECURE)
+            info = json.loads(res.text)
+        except (requests.exceptions.RequestException, ValueError) as err:
+            log.exception('Fail to get Swift capabilities from {}: {}'.format(
+                info_url, err))
+            ttl = self.retry_time
+
+        with self._lock:
+            if info is None:
+                info, _ = self._info.get(info_url, ({}, None))
+            self._info[info_url] = (info, time.monotonic() + ttl)
+            self._refreshing.discard(info_url)
+
+        return info
+
+    def get(self, storage_url):
+        """Returns the capabilities of the cluster of storage_url."""
+
+        info_url = self._info_url(storage_url)
+
+        with self._lock:
+            info, expires = self._info.get(info_url, (None, None))
+            expired = info is not None and expires <= time.monotonic()
+            refresh = expired and info_url not in self._refreshing
+            if refresh:
+                self._refreshing.add(info_url)
+
+        if info is None:
+            return self._refresh(info_url)
+
+        if refresh:
+            threading.Thread(target=self._refresh, args=(info_url,),
+                             daemon=True).start()
+
+        return info
+
+    def clear(self):
+        """Forgets every cached capability."""
+
+        with self._lock:
+            self._info = {}
+
+
+swift_capabilities = SwiftCapabilities()
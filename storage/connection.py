@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+
+""" Pool of keep-alive HTTP connections to Swift. """
+
+import time
+import logging
+import threading
+import requests
+
+from urllib.parse import urlparse
+
+from django.conf import settings
+
+from swiftclient import client
+
+log = logging.getLogger(__name__)
+
+
+class SwiftConnectionPool:
+    """
+    Keeps one requests.Session per Swift endpoint (scheme + host), shared by
+    every Swift request made by the process, so consecutive requests reuse a
+    warm TCP/TLS connection instead of opening a new one each time.
+
+    Each session keeps at most SWIFT_POOL_MAXSIZE idle connections. Before
+    being reused, a connection dropped by the server is discarded by urllib3,
+    and a session left unused for more than SWIFT_POOL_IDLE_TIMEOUT seconds
+    is closed and replaced, as load balancers usually drop connections idle
+    for that long.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions = {}
+
+    def _key(self, url):
+        parsed = urlparse(url)
+        return parsed.scheme, parsed.netloc
+
+    def _create_session(self):
+        session = requests.Session()
+
+        # Don't use requests's default headers, like swiftclient does
+        session.headers = None
+
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=1, pool_maxsize=settings.SWIFT_POOL_MAXSIZE)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+
+        return session
+
+    def session(self, url):
+        """Returns the pooled session for the Swift endpoint of url."""
+
+        key = self._key(url)
+        now = time.monotonic()
+
+        with self._lock:
+            session, last_used = self._sessions.get(key, (None, now))
+
+            if session is not None and \
+               now - last_used > settings.SWIFT_POOL_IDLE_TIMEOUT:
+                log.debug('Recycling idle Swift connections to {}://{}'.format(*key))
+                session.close()
+                session = None
+
+            if session is None:
+                session = self._create_session()
+
+            self._sessions[key] = (session, now)
+
+        return session
+
+    def http_connection(self, url, timeout=None):
+        """
+        Returns a swiftclient (parsed_url, HTTPConnection) tuple, to be used as
+        http_conn on swiftclient calls, backed by the pooled session.
+        """
+
+        conn = client.HTTPConnection(url, insecure=settings.SWIFT_INSECURE,
+                                     timeout=timeout)
+        conn.request_session = self.session(url)
+
+        return conn.parsed_url, conn
+
+    def close(self):
+        """Closes every pooled connection."""
+
+        with self._lock:
+            for session, _ in self._sessions.values():
+                session.close()
+            self._sessions = {}
+
+
+swift_pool = SwiftConnectionPool()
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+
+""" Request-scoped memoization of container and object HEADs. """
+
+import threading
+
+from swiftclient import client
+
+# Headers of a write that are credentials, not metadata of the resource
+_AUTH_HEADERS = ('x-auth-token', 'x-storage-token', 'x-service-token')
+
+
+def _call_args(names, args, kwargs):
+    values = dict(zip(names, args))
+    values.update(kwargs)
+    return values
+
+
+class HeadCache:
+    """
+    Remembers container and object HEADs during a request, so helpers that
+    HEAD the same resource more than once (e.g. get_acls and get_cors) only
+    reach Swift the first time.
+
+    The cache only works between start() and stop(), which
+    HeadCacheMiddleware calls around each request, and only in the thread
+    of the request: jobs, commands and worker threads always go to Swift.
+
+    Methods take the arguments of their swiftclient counterparts. Writes go
+    to Swift and then update the cached entry: container POSTs and PUTs are
+    merged into it, other writes drop it.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def start(self):
+        self._local.entries = {}
+
+    def stop(self):
+        self._local.entries = None
+
+    def _entries(self):
+        return getattr(self._local, 'entries', None)
+
+    def _head(self, key, head, args, kwargs):
+        entries = self._entries()
+        if entries is None:
+            return head(*args, **kwargs)
+
+        if key not in entries:
+            entries[key] = head(*args, **kwargs)
+
+        return dict(entries[key])
+
+    def head_container(self, *args, **kwargs):
+        call = _call_args(('url', 'token', 'container'), args, kwargs)
+        key = (call['url'], call['container'], None)
+
+        return self._head(key, client.head_container, args, kwargs)
+
+    def head_object(self, *args, **kwargs):
+        call = _call_args(('url', 'token', 'container', 'name'), args, kwargs)
+        key = (call['url'], call['container'], call['name'])
+
+        return self._head(key, client.head_object, args, kwargs)
+
+    def merge(self, url, container, headers):
+        """Applies the headers of a container write to its cached HEAD."""
+
+        entries = self._entries()
+        if not entries:
+            return
+
+        entry = entries.get((url, container, None))
+        if entry is None:
+            return
+
+        for key, value in (headers or {}).items():
+            key = key.lower()
+            if key in _AUTH_HEADERS:
+                continue
+            if key.startswith('x-remove-'):
+                entry.pop('x-' + key[len('x-remove-'):], None)
+            elif value is None or str(value) == '':
+                entry.pop(key, None)
+            else:
+                entry[key] = str(value)
+
+    def invalidate(self, url, container, name=None):
+        """Drops the cached HEAD of an object and of its container, whose
+        counters change, or of a container and all its objects."""
+
+        entries = self._entries()
+        if not entries:
+            return
+
+        for key in list(entries):
+            if key[0] == url and key[1] == container and (
+                    name is None or key[2] in (None, name)):
+                del entries[key]
+
+    def post_container(self, *args, **kwargs):
+        call = _call_args(('url', 'token', 'container', 'headers'), args, kwargs)
+        result = client.post_container(*args, **kwargs)
+        self.merge(call['url'], call['container'], call.get('headers'))
+        return result
+
+    def put_container(self, *args, **kwargs):
+        call = _call_args(('url', 'token', 'container', 'headers'), args, kwargs)
+        result = client.put_container(*args, **kwargs)
+        self.merge(call['url'], call['container'], call.get('headers'))
+        return result
+
+    def delete_container(self, *args, **kwargs):
+        call = _call_args(('url', 'token', 'container'), args, kwargs)
+        result = client.delete_container(*args, **kwargs)
+        self.invalidate(call['url'], call['container'])
+        return result
+
+    def post_object(self, *args, **kwargs):
+        call = _call_args(('url', 'token', 'container', 'name'), args, kwargs)
+        result = client.post_object(*args, **kwargs)
+        self.invalidate(call['url'], call['container'], call['name'])
+        return result
+
+    def put_object(self, *args, **kwargs):
+        call = _call_args(('url', 'token', 'container', 'name'), args, kwargs)
+        result = client.put_object(*args, **kwargs)
+        self.invalidate(call['url'], call['container'], call['name'])
+        return result
+
+    def delete_object(self, *args, **kwargs):
+        call = _call_args(('url', 'token', 'container', 'name'), args, kwargs)
+        result = client.delete_object(*args, **kwargs)
+        self.invalidate(call['url'], call['container'], call['name'])
+        return result
+
+
+head_cache = HeadCache()
@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+
+""" Background jobs for long-running storage operations. """
+
+import json
+import time
+import logging
+import threading
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from identity.keystone import KeystoneNoRequest
+from storage.models import StorageJob
+from storage.connection import swift_pool
+from storage.utils import get_storage_endpoint
+
+log = logging.getLogger(__name__)
+
+# kind -> (handler, required params)
+JOB_HANDLERS = {}
+
+
+class JobError(Exception):
+    """Raised by a job handler when the job fails."""
+
+
+class JobCanceled(Exception):
+    """Raised inside a job handler once cancellation was requested."""
+
+
+def job_handler(kind, params=()):
+    """
+    Registers a function as the handler of a kind of job. The handler is
+    called with a JobContext, and returns a message when done or raises
+    JobError when it fails.
+    """
+
+    def register(func):
+        JOB_HANDLERS[kind] = (func, tuple(params))
+        return func
+
+    return register
+
+
+def missing_job_params(kind, params):
+    """Returns the required params of kind not found in params."""
+
+    _, required = JOB_HANDLERS[kind]
+    return [name for name in required if not params.get(name)]
+
+
+def submit_job(request, kind, **params):
+    """
+    Queues a job on the current project of request. No credentials are kept:
+    the worker authenticates as Vault's Keystone user, as views do.
+    """
+
+    job = StorageJob.objects.create(
+        kind=kind,
+        params=json.dumps(params),
+        username=request.user.username,
+        project_id=request.session.get('project_id'),
+        project_name=request.session.get('project_name'),
+        storage_url=get_storage_endpoint(request, 'adminURL'))
+
+    log.info('{} submitted {}'.format(job.username, job))
+
+    return job
+
+
+class JobContext:
+    """
+    What a job handler works with: the job params and the Swift account of
+    its project, with the token of Vault's Keystone user.
+
+    Handlers report what they did with progress(). Counters are saved every
+    flush_interval seconds, which is also when cancellation is checked.
+    """
+
+    flush_interval = 2
+
+    def __init__(self, job):
+        self.job = job
+        self.params = job.get_params()
+        self.username = job.username
+        self.storage_url = job.storage_url
+        self.http_conn = swift_pool.http_connection(
+            job.storage_url, timeout=settings.SWIFT_REQUESTS_TIMEOUT)
+        self._flushed_at = time.monotonic()
+
+    def get_auth_token(self):
+        """
+        Current token of Vault's Keystone user. Handlers pass this method,
+        not its result, to storage functions that run for long, so each batch
+        of requests reads the token again and a renewed one is picked up.
+        """
+
+        keystone = KeystoneNoRequest()
+        if keystone.conn is None:
+            raise JobError('Unable to authenticate in Keystone')
+
+        return keystone.conn.auth_token
+
+    def progress(self, objects=0, bytes=0, errors=0):
+        self.job.objects_processed += objects
+        self.job.bytes_processed += bytes
+        self.job.errors += errors
+
+        if time.monotonic() - self._flushed_at >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Saves the counters, raising JobCanceled if the job was canceled."""
+
+        self._flushed_at = time.monotonic()
+        jobs = StorageJob.objects.filter(pk=self.job.pk)
+        jobs.update(objects_processed=self.job.objects_processed,
+                    bytes_processed=self.job.bytes_processed,
+                    errors=self.job.errors,
+                    updated_at=timezone.now())
+
+        if jobs.filter(cancel_requested=True).exists():
+            raise JobCanceled()
+
+
+def claim_next_job():
+    """Marks the oldest pending job as running and returns it, if any."""
+
+    for job in StorageJob.objects.filter(status=StorageJob.PENDING).order_by('id')[:10]:
+        # Only one worker can move the job out of pending
+        claimed = StorageJob.objects.filter(
+            pk=job.pk, status=StorageJob.PENDING).update(
+                status=StorageJob.RUNNING, started_at=timezone.now(),
+                updated_at=timezone.now())
+
+        if claimed:
+            job.refresh_from_db()
+            return job
+
+    return None
+
+
+def requeue_stale_jobs():
+    """
+    Puts back in the queue running jobs that stopped reporting for
+    STORAGE_JOB_STALE_TIMEOUT seconds, as their worker is gone.
+    """
+
+    limit = timezone.now() - timedelta(seconds=settings.STORAGE_JOB_STALE_TIMEOUT)
+    count = StorageJob.objects.filter(
+        status=StorageJob.RUNNING, updated_at__lt=limit).update(
+            status=StorageJob.PENDING)
+
+    if count:
+        log.warning('{} stale storage jobs requeued'.format(count))
+
+    return count
+
+
+def _heartbeat(job, stop):
+    try:
+        while not stop.wait(settings.STORAGE_JOB_STALE_TIMEOUT / 3):
+            StorageJob.objects.filter(pk=job.pk).update(updated_at=timezone.now())
+    finally:
+        # Threads get their own database connection, not closed by Django
+        connection.close()
+
+
+def run_job(job):
+    """Runs a claimed job and saves its outcome."""
+
+    status, message = StorageJob.DONE, ''
+    stop = threading.Event()
+    threading.Thread(target=_heartbeat, args=(job, stop), daemon=True).start()
+
+    try:
+        if job.kind not in JOB_HANDLERS:
+            raise JobError('Unknown job kind: {}'.format(job.kind))
+
+        handler, _ = JOB_HANDLERS[job.kind]
+        message = handler(JobContext(job)) or ''
+    except JobCanceled:
+        status, message = StorageJob.CANCELED, 'Canceled'
+    except Exception as err:
+        log.exception('Exception: {0}'.format(err))
+        status, message = StorageJob.FAILED, str(err)
+    finally:
+        stop.set()
+
+    job.status = status
+    job.message = message
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'message', 'finished_at', 'updated_at',
+                            'objects_processed', 'bytes_processed', 'errors'])
+
+    log.info('{} finished: {}'.format(job, message))
+
+    return job
+
+
+def cancel_job(job):
+    """Cancels a pending job, or asks a running job to stop."""
+
+    if job.status == StorageJob.PENDING:
+        StorageJob.objects.filter(pk=job.pk, status=StorageJob.PENDING).update(
+            status=StorageJob.CANCELED, message='Canceled',
+            finished_at=timezone.now())
+
+    StorageJob.objects.filter(pk=job.pk).exclude(
+        status__in=StorageJob.FINISHED).update(cancel_requested=True)
+
+    job.refresh_from_db()
+
+    return job
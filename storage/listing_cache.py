@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+
+""" Short-lived cache of account and container listings. """
+
+import uuid
+import hashlib
+import logging
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+
+from swiftclient import client
+
+log = logging.getLogger(__name__)
+
+
+class ListingCache:
+    """
+    Keeps account and container listing pages for SWIFT_LISTING_CACHE_TIME
+    seconds, so paging back and forth doesn't go to Swift every time.
+
+    Every key holds the current generation of its account or container.
+    Views that change a listing call invalidate(), which starts a new
+    generation: the old pages are no longer found and expire on their own.
+    Listings changed outside of Vault, like FormPost uploads sent by the
+    browser straight to Swift, are read from Swift while bypass() lasts.
+
+    Generations are kept in Django's cache, so every Vault process (web
+    workers and storage_worker) must share a cache backend (see CACHES in
+    settings) for an invalidation to reach them all.
+
+    Hits and misses of this process are counted, and the hit rate is logged
+    every report_every lookups.
+    """
+
+    report_every = 1000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, *parts):
+        digest = hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+        return 'listing:{}'.format(digest)
+
+    def _generation(self, storage_url, container=None):
+        key = self._key('generation', storage_url, container)
+        generation = cache.get(key)
+
+        if generation is None:
+            cache.add(key, uuid.uuid4().hex, None)
+            generation = cache.get(key)
+
+        return generation
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+            total = self.hits + self.misses
+
+        if total % self.report_every == 0:
+            log.info('Listing cache hit rate: {hit_rate:.1%} '
+                     '({hits} hits, {misses} misses)'.format(**self.stats()))
+
+    def _get(self, key, fetch, storage_url, container=None):
+        ttl = settings.SWIFT_LISTING_CACHE_TIME
+        if ttl <= 0 or cache.get(self._key('bypass', storage_url, container)):
+            return fetch()
+
+        listing = cache.get(key)
+        self._count(listing is not None)
+
+        if listing is None:
+            listing = fetch()
+            cache.set(key, listing, ttl)
+
+        return listing
+
+    def get_account(self, storage_url, auth_token, http_conn, **kwargs):
+        """Cached client.get_account(), keyed by its listing arguments."""
+
+        key = self._key('account', storage_url,
+                        self._generation(storage_url), sorted(kwargs.items()))
+
+        return self._get(key, lambda: client.get_account(
+            storage_url, auth_token, http_conn=http_conn, **kwargs),
+            storage_url)
+
+    def get_container(self, storage_url, auth_token, container, http_conn,
+                      **kwargs):
+        """Cached client.get_container(), keyed by its listing arguments."""
+
+        key = self._key('container', storage_url, container,
+                        self._generation(storage_url, container),
+                        sorted(kwargs.items()))
+
+        return self._get(key, lambda: client.get_container(
+            storage_url, auth_token, container, http_conn=http_conn, **kwargs),
+            storage_url, container)
+
+    def invalidate(self, storage_url, container=None):
+        """Drops the cached account listing, and the container listing."""
+
+        cache.set(self._key('generation', storage_url, None),
+                  uuid.uuid4().hex, None)
+
+        if container is not None:
+            cache.set(self._key('generation', storage_url, container),
+                      uuid.uuid4().hex, None)
+
+    def bypass(self, storage_url, container, seconds):
+        """Reads the account listing, and the container listing, straight
+        from Swift for the next seconds, while they change without going
+        through Vault."""
+
+        cache.set_many({
+            self._key('bypass', storage_url, None): True,
+            self._key('bypass', storage_url, container): True,
+        }, seconds)
+
+    def stats(self):
+        """Returns the hits, misses and hit rate of this process."""
+
+        with self._lock:
+            hits, misses = self.hits, self.misses
+
+        total = hits + misses
+
+        return {'hits': hits, 'misses': misses,
+                'hit_rate': hits / total if total else 0.0}
+
+
+listing_cache = ListingCache()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+
+from django.conf import settings
+from django.template.defaultfilters import filesizeformat
+from django.core.management.base import BaseCommand, CommandError
+
+from swiftclient import client
+
+from identity.keystone import KeystoneNoRequest
+from storage.connection import swift_pool
+from storage.views.main import prune_versions
+
+
+def _auth_token():
+    """Current token of Vault's Keystone user, read again by each request
+    batch, as storage jobs do."""
+
+    keystone = KeystoneNoRequest()
+    if keystone.conn is None:
+        raise CommandError("Unable to authenticate in Keystone")
+
+    return keystone.conn.auth_token
+
+
+class Command(BaseCommand):
+    help = ("Deletes the object versions that the retention policy of their "
+            "container no longer keeps, in every project Vault's Keystone "
+            "user can reach.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('containers', nargs='*',
+            help="Versioned containers to prune. Defaults to every container "
+                 "of each project.", )
+        parser.add_argument('-p', '--project', action='append', default=[],
+            help="Name or id of a project to prune. Can be repeated. "
+                 "Defaults to every project.", )
+        parser.add_argument('-n', '--dry-run', action='store_true',
+            help="Reports the expired versions without deleting them.", )
+
+    def _storage_urls(self, projects):
+        """(project name, Swift account URL) of each project, from the
+        admin URL of the object store, as Vault builds them for any
+        project."""
+
+        keystone = KeystoneNoRequest()
+        if keystone.conn is None:
+            raise CommandError("Unable to authenticate in Keystone")
+
+        endpoint = keystone.get_object_store_endpoints()['adminURL']
+        _, admin_id = endpoint.split('AUTH_')
+
+        for project in keystone.project_list():
+            if projects and not {project.name, project.id} & set(projects):
+                continue
+            yield project.name, endpoint.replace(admin_id, project.id)
+
+    def _containers(self, storage_url, http_conn, names):
+        _, containers = client.get_account(storage_url, _auth_token(),
+            full_listing=True, http_conn=http_conn)
+
+        for container in containers:
+            name = container['name']
+            if names and name not in names:
+                continue
+            if not any(name.startswith(prefix)
+                       for prefix in settings.SWIFT_HIDE_PREFIXES):
+                yield name
+
+    def handle(self, *args, **kwargs):
+        dry_run = kwargs.get("dry_run")
+        names = kwargs.get("containers")
+
+        report = None
+        if dry_run and kwargs.get("verbosity", 1) > 1:
+            def report(version):
+                self.stdout.write("  {}".format(version['name']))
+
+        failed = 0
+
+        for project, storage_url in self._storage_urls(kwargs.get("project")):
+            http_conn = swift_pool.http_connection(
+                storage_url, timeout=settings.SWIFT_REQUESTS_TIMEOUT)
+
+            try:
+                containers = list(self._containers(storage_url, http_conn,
+                                                   names))
+            except client.ClientException as err:
+                self.stderr.write("{}: {}".format(project, err))
+                failed += 1
+                continue
+
+            for container in containers:
+                try:
+                    result = prune_versions(storage_url, _auth_token,
+                                            http_conn, container,
+                                            dry_run=dry_run, report=report)
+                except client.ClientException as err:
+                    self.stderr.write("{}/{}: {}".format(project, container,
+                                                         err))
+                    failed += 1
+                    continue
+
+                if result['keep_last'] is None and result['keep_days'] is None:
+                    continue
+
+                line = "{}/{}: {} expired versions ({})".format(
+                    project, container, result['expired'],
+                    filesizeformat(result['bytes']))
+
+                if not dry_run:
+                    line += ", {} deleted, {} failed".format(
+                        result['deleted'], result['failed'])
+                    failed += result['failed']
+
+                self.stdout.write(line)
+
+        if failed:
+            raise CommandError("{} failures".format(failed))
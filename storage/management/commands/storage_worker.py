@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection
+from django.core.management.base import BaseCommand
+
+from storage.jobs import claim_next_job, requeue_stale_jobs, run_job
+
+# Registers the job handlers
+import storage.views  # noqa
+
+
+def _run(job):
+    try:
+        return run_job(job)
+    finally:
+        # Each worker thread has its own database connection
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = "Runs queued storage jobs, like deleting big containers."
+
+    def add_arguments(self, parser):
+        parser.add_argument('-w', '--workers', type=int,
+            default=settings.STORAGE_JOB_WORKERS,
+            help="Number of jobs run at once.", )
+        parser.add_argument('--once', action='store_true',
+            help="Runs the queued jobs and exits.", )
+
+    def handle(self, *args, **kwargs):
+        workers = kwargs.get("workers")
+        once = kwargs.get("once")
+        running = set()
+
+        self.stdout.write("Running storage jobs with {} workers".format(workers))
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            while True:
+                running = {future for future in running if not future.done()}
+                job = None
+
+                if len(running) < workers:
+                    requeue_stale_jobs()
+                    job = claim_next_job()
+
+                if job is not None:
+                    self.stdout.write("Starting {}".format(job))
+                    running.add(pool.submit(_run, job))
+                    continue
+
+                if once and not running:
+                    break
+
+                time.sleep(settings.STORAGE_JOB_POLL_INTERVAL)
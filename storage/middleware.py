@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+
+""" Storage middlewares. """
+
+from storage.head_cache import head_cache
+
+
+class HeadCacheMiddleware:
+    """Memoizes container and object HEADs during each request."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        head_cache.start()
+        try:
+            return self.get_response(request)
+        finally:
+            head_cache.stop()
@@ -1,5 +1,7 @@
 # -*- coding: utf-8 -*-
 
+import json
+
 from django.db import models
 
 
@@ -17,3 +19,70 @@ class BackupContainer(models.Model):
     def __unicode__(self):
         return "Container: {}, Project: {}".format(self.container,
                                                    self.project_name)
+
+
+class StorageJob(models.Model):
+    """ A long-running storage operation, run by the storage_worker command """
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    CANCELED = 'canceled'
+
+    STATUS_CHOICES = (
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+        (CANCELED, 'Canceled'),
+    )
+
+    FINISHED = (DONE, FAILED, CANCELED)
+
+    id = models.AutoField(primary_key=True)
+    kind = models.CharField(max_length=64)
+    params = models.TextField(default='{}')
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES,
+                              default=PENDING, db_index=True)
+    username = models.CharField(max_length=255)
+    project_id = models.CharField(max_length=255, db_index=True)
+    project_name = models.CharField(max_length=255)
+    storage_url = models.CharField(max_length=255)
+    objects_processed = models.BigIntegerField(default=0)
+    bytes_processed = models.BigIntegerField(default=0)
+    errors = models.BigIntegerField(default=0)
+    message = models.TextField(blank=True, default='')
+    cancel_requested = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'swift_storage_job'
+
+    def __str__(self):
+        return "Job {}: {} ({})".format(self.id, self.kind, self.status)
+
+    def get_params(self):
+        return json.loads(self.params)
+
+    def to_dict(self):
+        def isoformat(date):
+            return date.isoformat() if date else None
+
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'params': self.get_params(),
+            'status': self.status,
+            'objects_processed': self.objects_processed,
+            'bytes_processed': self.bytes_processed,
+            'errors': self.errors,
+            'message': self.message,
+            'cancel_requested': self.cancel_requested,
+            'created_at': isoformat(self.created_at),
+            'started_at': isoformat(self.started_at),
+            'finished_at': isoformat(self.finished_at),
+        }
@@ -17,11 +17,17 @@ Storage.Tools = {};
                            '<i class="fa fa-download"></i>',
                          '</a>',
                        '</td>',
+                     '</tr>'].join(''),
+        more_tmpl = ['<tr class="trash-more">',
+                       '<td colspan="4" style="text-align: center">',
+                         '<a href="#" class="btn btn-sm btn-light btn-trash-more">Load more</a>',
+                       '</td>',
                      '</tr>'].join('');
 
     function init(opts) {
         options = $.extend({
             'deleted_objects_url': '',
+            'trash_sort': 'name',
             'restore_object_url': '',
             'trash_remove_url': '',
             'backup_restore_url': '',
@@ -47,6 +53,13 @@ Storage.Tools = {};
             _populate_content();
         });
 
+        $content.on('click', '.btn-trash-more', function(e) {
+            e.preventDefault();
+            var marker = $(this).data('marker');
+            $(this).closest('td').html('<div class="loader"></div>');
+            _populate_content(marker);
+        });
+
         _build_bind_restore_button();
         _bind_backup_restore_buttons();
     }
@@ -122,14 +135,22 @@ Storage.Tools = {};
                        '</tr>'].join(''));
     }
 
-    function _populate_content() {
+    function _populate_content(marker) {
+        var params = {'sort': options.trash_sort};
+
+        if (marker) {
+            params.marker = marker;
+        }
+
         $.ajax({
             type: "GET",
             url: options.deleted_objects_url,
+            data: params
         })
         .done(function (data) {
             var objs = data.deleted_objects,
-                content = "";
+                content = "",
+                $more;
 
             options = $.extend({
                 'original_container': data.original_container,
@@ -140,7 +161,11 @@ Storage.Tools = {};
                 content += tmpl(item_tmpl, objs[i]);
             }
 
-            if(content !== "") {
+            // Next pages are appended to the ones already loaded
+            if (marker) {
+                $content.find('.trash-more').remove();
+                $content.append(content);
+            } else if(content !== "" || data.next_marker) {
                 $content.html(content);
             } else {
                 $content.html(['<tr>',
@@ -150,6 +175,12 @@ Storage.Tools = {};
                                '</tr>'].join(''));
             }
 
+            if (data.next_marker) {
+                $more = $(more_tmpl);
+                $more.find('.btn-trash-more').data('marker', data.next_marker);
+                $content.append($more);
+            }
+
             $('[data-toggle="tooltip"]').tooltip({'animation': false});
         })
         .fail(function (data) {
@@ -323,6 +354,10 @@ Storage.Container = {};
 
     var containerId, $btnOptions;
 
+    // Storage jobs are polled every 2 seconds for up to 10 minutes
+    var JOB_POLL_INTERVAL = 2000,
+        JOB_TIMEOUT = 10 * 60 * 1000;
+
     function init() {
         $btnOptions = $('.btn-options');
         bindEvents();
@@ -370,29 +405,35 @@ Storage.Container = {};
         $btnDelete.on('click', function() {
             var $elem = $(this),
                 msgDelete = $elem.data('msg-delete'),
+                msgRunning = $elem.data('msg-running'),
                 urlDelete = $elem.data('delete-url');
 
             bootbox.confirm(msgDelete, function(result) {
-                result && deleteContainer(urlDelete);
+                result && deleteContainer(urlDelete, msgRunning);
             });
         });
     }
 
     function checkCurrentStatus() {
-        var statusItems = $('#options-'+ containerId).data('status-urls');
-        statusItems.map(function(item) {
-            var $conf = $(item.elementId);
+        var $options = $('#options-'+ containerId),
+            statusItems = $options.data('status-items').filter(function(item) {
+                var $conf = $(item.elementId);
+                return !($conf.hasClass('enabled') || $conf.hasClass('disabled'));
+            });
 
-            if($conf.hasClass('enabled') || $conf.hasClass('disabled')) {
-                return;
-            }
+        if (!statusItems.length) {
+            return;
+        }
+
+        $.ajax({
+            type: "GET",
+            url: $options.data('summary-url'),
+        })
+        .done(function(data) {
+            statusItems.map(function(item) {
+                var $conf = $(item.elementId);
 
-            $.ajax({
-                type: "GET",
-                url: item.url,
-            })
-            .done(function(data) {
-                if(data.status == 'enabled') {
+                if(data[item.field] == 'enabled') {
                     $conf.data('current-status', 'enabled')
                          .removeClass('disabled')
                          .addClass('enabled');
@@ -401,10 +442,10 @@ Storage.Container = {};
                          .removeClass('enabled')
                          .addClass('disabled');
                 }
-            })
-            .fail(function(data) {
-                console.log(data);
             });
+        })
+        .fail(function(data) {
+            console.log(data);
         });
     }
 
@@ -443,9 +484,41 @@ Storage.Container = {};
         });
     }
 
-    function deleteContainer(url) {
+    function responseMessage(data) {
+        return (data.responseJSON && data.responseJSON.message) || data.statusText;
+    }
+
+    function deleteContainer(url, msgRunning) {
         Base.Loading.show();
 
+        // Big containers are deleted by a storage job. When the job can't be
+        // started, the container is deleted within the request, as before.
+        $.ajax({
+            type: 'DELETE',
+            url: url + '?async=1'
+        })
+        .done(function(data) {
+            if (!data || !data.status_url) {
+                deleteContainerSync(url);
+                return;
+            }
+
+            waitForJob(data.status_url, Date.now() + JOB_TIMEOUT, function(job) {
+                Base.Loading.hide();
+                Base.Messages.setMessage({
+                    description: job.status === 'timeout' ? msgRunning : job.message,
+                    type: job.status === 'done' ? 'success' : 'fail'
+                }, function() {
+                    window.location.reload();
+                });
+            });
+        })
+        .fail(function() {
+            deleteContainerSync(url);
+        });
+    }
+
+    function deleteContainerSync(url) {
         $.ajax({
             type: 'DELETE',
             url: url
@@ -460,8 +533,9 @@ Storage.Container = {};
             });
         })
         .fail(function(data) {
+            Base.Loading.hide();
             Base.Messages.setMessage({
-                description: data.message,
+                description: responseMessage(data),
                 type: 'fail'
             }, function() {
                 window.location.reload();
@@ -469,6 +543,29 @@ Storage.Container = {};
         });
     }
 
+    function waitForJob(statusUrl, deadline, callback) {
+        $.ajax({
+            type: 'GET',
+            url: statusUrl
+        })
+        .done(function(job) {
+            if (job.status === 'pending' || job.status === 'running') {
+                if (Date.now() + JOB_POLL_INTERVAL > deadline) {
+                    callback({status: 'timeout', message: job.message});
+                    return;
+                }
+                setTimeout(function() {
+                    waitForJob(statusUrl, deadline, callback);
+                }, JOB_POLL_INTERVAL);
+                return;
+            }
+            callback(job);
+        })
+        .fail(function(data) {
+            callback({status: 'failed', message: responseMessage(data)});
+        });
+    }
+
     $.extend(Storage.Container, {
         init: init
     });
@@ -1,10 +1,17 @@
 # -*- coding: utf-8 -*-
 
 import os
+import re
+import json
+import time
+import threading
 from io import StringIO
 
+from swiftclient import client
+
 from django.contrib.auth.models import AnonymousUser
-from django.core.files.uploadedfile import InMemoryUploadedFile
+from django.core.files.uploadedfile import (InMemoryUploadedFile,
+                                            TemporaryUploadedFile)
 
 
 # From: http://www.rkblog.rk.edu.pl/w/p/temporary-files-django-tests-and-fly-file-manipulation/
@@ -17,6 +24,15 @@ def get_temporary_text_file():
     return text_file
 
 
+def get_temporary_big_file(size, block_size=1024 * 1024):
+    big_file = TemporaryUploadedFile('big.bin', 'application/octet-stream',
+                                     size, None)
+    for _ in range(size // block_size):
+        big_file.write(b'\0' * block_size)
+    big_file.seek(0)
+    return big_file
+
+
 def get_account():
     account_stat = {
         'content-length': '147',
@@ -97,12 +113,62 @@ class FakeUser(AnonymousUser):
         self.description = ''
 
 
+class FakeRawResponse:
+    """Fake urllib3 response, streaming the body of a fake response"""
+
+    def __init__(self, response):
+        self.response = response
+        self.decode_content = None
+
+    def stream(self, amt=2 ** 16, decode_content=None):
+        self.decode_content = decode_content
+        return self.response.iter_content(amt)
+
+
 class FakeRequestResponse:
 
     def __init__(self, status_code=200, content=None, headers=None):
         self.status_code = status_code
         self.content = content
         self.headers = headers
+        self.closed = False
+        self.raw = FakeRawResponse(self)
+
+    def json(self):
+        return json.loads(self.content)
+
+    def iter_content(self, chunk_size=1):
+        content = self.content or b''
+        for i in range(0, len(content), chunk_size):
+            yield content[i:i + chunk_size]
+
+    def close(self):
+        self.closed = True
+
+
+class FakeStreamedResponse(FakeRequestResponse):
+    """Fake streamed response whose body is generated chunk by chunk"""
+
+    def __init__(self, chunks, chunk_size, status_code=200, headers=None):
+        super(FakeStreamedResponse, self).__init__(status_code,
+                                                   headers=headers or {})
+        self.chunks = chunks
+        self.chunk_size = chunk_size
+        self.produced = 0
+
+    def iter_content(self, chunk_size=1):
+        for _ in range(self.chunks):
+            self.produced += 1
+            yield b'\0' * self.chunk_size
+
+
+def get_bulk_delete_response(deleted=0, not_found=0, errors=None):
+    status = '400 Bad Request' if errors else '200 OK'
+    body = {'Number Deleted': deleted, 'Number Not Found': not_found,
+            'Response Status': status, 'Response Body': '',
+            'Errors': errors or []}
+
+    return FakeRequestResponse(200, content=json.dumps(body))
 
 
 class FakeElasticResult:
@@ -110,3 +176,126 @@ class FakeElasticResult:
 
     def __init__(self, headers):
         self.headers = headers
+
+
+class FakeContainerListing:
+    """Fake container listing that honors marker, end_marker, prefix and limit"""
+
+    def __init__(self, names, page_size):
+        self.names = sorted(names)
+        self.page_size = page_size
+        self.lock = threading.Lock()
+        self.calls = 0
+
+    def __call__(self, storage_url, auth_token, container, marker=None,
+                 end_marker=None, prefix=None, limit=None, http_conn=None):
+        with self.lock:
+            self.calls += 1
+
+        names = [n for n in self.names
+                 if (marker is None or n > marker)
+                 if (end_marker is None or n < end_marker)
+                 if n.startswith(prefix or '')]
+        limit = min(limit or self.page_size, self.page_size)
+
+        return {}, [{'name': n} for n in names[:limit]]
+
+
+class FakeConcurrentRequest:
+    """Fake Swift request sent from several threads at once. Each call takes
+    delay seconds, and max_running keeps how many ran at the same time."""
+
+    def __init__(self, delay=0):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.running = 0
+        self.max_running = 0
+
+    def wait(self):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+
+        time.sleep(self.delay)
+
+        with self.lock:
+            self.running -= 1
+
+
+class FakeSwiftPut(FakeConcurrentRequest):
+    """Fake requests.put of upload segments. Only the size of the uploaded
+    data is kept, so memory measures aren't skewed by the fake. Segments
+    whose index is in fail_segments get the given status, or raise it when
+    it's an exception."""
+
+    def __init__(self, delay=0, fail_segments=None):
+        super(FakeSwiftPut, self).__init__(delay)
+        self.fail_segments = fail_segments or {}
+        self.calls = []
+
+    def __call__(self, url, data=None, headers=None, verify=True):
+        size = None
+        if isinstance(data, bytes):
+            size = len(data)
+        elif data is not None and not isinstance(data, str):
+            size = sum(len(chunk) for chunk in data)
+
+        with self.lock:
+            self.calls.append((url, size, data if isinstance(data, str) else None))
+
+        self.wait()
+
+        match = re.search(r'/(\d{8})$', url)
+        failure = self.fail_segments.get(int(match.group(1))) if match else None
+
+        if isinstance(failure, Exception):
+            raise failure
+        if failure is not None:
+            return FakeRequestResponse(failure, headers={})
+
+        return FakeRequestResponse(201, headers={'etag': 'fakeetag'})
+
+
+class FakeBulkDelete(FakeConcurrentRequest):
+    """Fake bulk-delete request. Names in fail_once fail the first time with
+    a 503, and record=False doesn't keep the batches of names."""
+
+    def __init__(self, delay=0, fail_once=(), record=True):
+        super(FakeBulkDelete, self).__init__(delay)
+        self.fail_once = set(fail_once)
+        self.record = record
+        self.calls = []
+
+    def __call__(self, url, headers=None, data=None, verify=True):
+        names = data.split(b'\n')
+
+        with self.lock:
+            if self.record:
+                self.calls.append(names)
+            failed = [n for n in names if n in self.fail_once]
+            self.fail_once -= set(failed)
+
+        self.wait()
+
+        errors = [['/' + n.decode(), '503 Service Unavailable'] for n in failed]
+
+        return get_bulk_delete_response(
+            deleted=len(names) - len(failed), errors=errors)
+
+
+class FakeObjectPost(FakeConcurrentRequest):
+    """Fake post_object, failing with a 404 for the names in fail"""
+
+    def __init__(self, delay=0, fail=()):
+        super(FakeObjectPost, self).__init__(delay)
+        self.fail = set(fail)
+        self.headers = {}
+
+    def __call__(self, storage_url, auth_token, container, name, headers=None,
+                 http_conn=None):
+        self.wait()
+
+        with self.lock:
+            if name in self.fail:
+                raise client.ClientException('', http_status=404)
+            self.headers[name] = headers
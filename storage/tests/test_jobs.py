@@ -0,0 +1,446 @@
+# -*- coding: utf-8 -*-
+
+import json
+
+from datetime import timedelta
+from unittest.mock import patch, Mock
+from unittest import TestCase
+
+from swiftclient import client
+
+from django.utils import timezone
+from django.test.utils import override_settings
+
+from storage import jobs
+from storage import views
+from storage.models import StorageJob
+from storage.tests import fakes
+
+from vault.tests.fakes import fake_request
+
+
+def head_object_only_in_trash(storage_url, auth_token, container, name,
+                              http_conn=None):
+    if not container.startswith('.trash'):
+        raise client.ClientException('', http_status=404)
+    return {}
+
+
+class BaseJobTestCase(TestCase):
+
+    def setUp(self):
+        self.request = fake_request()
+        self.project_name = self.request.session.get('project_name')
+        StorageJob.objects.all().delete()
+
+        patch('storage.views.main.actionlog',
+              Mock(return_value=None)).start()
+        patch('storage.capabilities.swift_capabilities.get',
+              Mock(return_value={})).start()
+        patch('vault.utils.project_check', Mock(return_value=True)).start()
+        patch('vault.utils.maybe_update_token').start()
+
+        # the worker authenticates as Vault's Keystone user
+        self.mock_keystone = patch('storage.jobs.KeystoneNoRequest').start()
+        self.mock_keystone.return_value.conn.auth_token = 'worker_token'
+
+    def tearDown(self):
+        StorageJob.objects.all().delete()
+        patch.stopall()
+
+    def submit(self, kind='delete_container', **params):
+        return jobs.submit_job(self.request, kind, **params)
+
+
+class TestStorageJobs(BaseJobTestCase):
+
+    def test_submit_job(self):
+        job = self.submit(container='fakecontainer')
+
+        self.assertEqual(job.status, StorageJob.PENDING)
+        self.assertEqual(job.get_params(), {'container': 'fakecontainer'})
+        self.assertEqual(job.project_id, '1')
+        self.assertEqual(job.username, self.request.user.username)
+        self.assertEqual(job.storage_url, 'https://fake.api.globoi.com/v1/AUTH_1')
+        self.assertFalse(hasattr(job, 'auth_token'))
+
+    def test_job_context_authenticates_as_vault(self):
+        context = jobs.JobContext(self.submit(container='fakecontainer'))
+
+        self.assertEqual(context.get_auth_token(), 'worker_token')
+
+        self.mock_keystone.return_value.conn.auth_token = 'renewed_token'
+        self.assertEqual(context.get_auth_token(), 'renewed_token')
+
+    def test_job_context_keystone_error(self):
+        self.mock_keystone.return_value.conn = None
+        context = jobs.JobContext(self.submit(container='fakecontainer'))
+
+        with self.assertRaises(jobs.JobError):
+            context.get_auth_token()
+
+    def test_claim_next_job_claims_each_job_once(self):
+        first = self.submit(container='container1')
+        second = self.submit(container='container2')
+
+        self.assertEqual(jobs.claim_next_job().id, first.id)
+        self.assertEqual(jobs.claim_next_job().id, second.id)
+        self.assertIsNone(jobs.claim_next_job())
+
+        first.refresh_from_db()
+        self.assertEqual(first.status, StorageJob.RUNNING)
+        self.assertIsNotNone(first.started_at)
+
+    def test_run_job_done(self):
+        def handler(job):
+            job.progress(objects=3, bytes=30)
+            return 'All done'
+
+        self.submit(kind='fake')
+
+        with patch.dict(jobs.JOB_HANDLERS, {'fake': (handler, ())}):
+            job = jobs.run_job(jobs.claim_next_job())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, StorageJob.DONE)
+        self.assertEqual(job.message, 'All done')
+        self.assertEqual(job.objects_processed, 3)
+        self.assertEqual(job.bytes_processed, 30)
+        self.assertIsNotNone(job.finished_at)
+
+    def test_run_job_failed(self):
+        def handler(job):
+            job.progress(errors=1)
+            raise jobs.JobError('Fail')
+
+        self.submit(kind='fake')
+
+        with patch.dict(jobs.JOB_HANDLERS, {'fake': (handler, ())}):
+            job = jobs.run_job(jobs.claim_next_job())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, StorageJob.FAILED)
+        self.assertEqual(job.message, 'Fail')
+        self.assertEqual(job.errors, 1)
+
+    def test_run_job_unknown_kind(self):
+        self.submit(kind='unknown')
+
+        job = jobs.run_job(jobs.claim_next_job())
+
+        self.assertEqual(job.status, StorageJob.FAILED)
+
+    def test_running_job_stops_when_canceled(self):
+        processed = []
+
+        def handler(job):
+            for i in range(100):
+                if i == 5:
+                    jobs.cancel_job(job.job)
+                job.progress(objects=1)
+                job.flush()
+                processed.append(i)
+
+        self.submit(kind='fake')
+
+        with patch.dict(jobs.JOB_HANDLERS, {'fake': (handler, ())}):
+            job = jobs.run_job(jobs.claim_next_job())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, StorageJob.CANCELED)
+        self.assertEqual(len(processed), 5)
+        self.assertEqual(job.objects_processed, 6)
+
+    def test_cancel_pending_job(self):
+        job = jobs.cancel_job(self.submit(container='fakecontainer'))
+
+        self.assertEqual(job.status, StorageJob.CANCELED)
+        self.assertIsNone(jobs.claim_next_job())
+
+    @override_settings(STORAGE_JOB_STALE_TIMEOUT=60)
+    def test_requeue_stale_jobs(self):
+        stale = self.submit(container='container1')
+        alive = self.submit(container='container2')
+        StorageJob.objects.update(status=StorageJob.RUNNING)
+        StorageJob.objects.filter(pk=stale.pk).update(
+            updated_at=timezone.now() - timedelta(seconds=120))
+
+        self.assertEqual(jobs.requeue_stale_jobs(), 1)
+
+        stale.refresh_from_db()
+        alive.refresh_from_db()
+        self.assertEqual(stale.status, StorageJob.PENDING)
+        self.assertEqual(alive.status, StorageJob.RUNNING)
+
+    @patch('storage.views.main.client.delete_container')
+    @patch('requests.Session.post')
+    @patch('storage.views.main.client.get_container')
+    @patch('storage.views.main.client.head_container')
+    def test_delete_container_job_reports_progress(self, mock_head_container,
+                                                   mock_get_container,
+                                                   mock_post,
+                                                   mock_delete_container):
+        mock_head_container.return_value = {'x-container-object-count': 3}
+        mock_get_container.side_effect = [
+            (None, [{'name': 'a', 'bytes': 1}, {'name': 'b', 'bytes': 2},
+                    {'name': 'c', 'bytes': 3}]),
+            (None, []),
+        ]
+        mock_post.return_value = fakes.get_bulk_delete_response(deleted=3)
+        self.submit(container='fakecontainer')
+
+        with patch('storage.views.main.get_info',
+                   Mock(return_value={'bulk_delete': {'max_deletes_per_request': 10}})):
+            job = jobs.run_job(jobs.claim_next_job())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, StorageJob.DONE)
+        self.assertEqual(job.objects_processed, 3)
+        self.assertEqual(job.bytes_processed, 6)
+        self.assertEqual(mock_delete_container.call_args[0][2], 'fakecontainer')
+
+    @patch('storage.views.main.client.delete_container')
+    @patch('storage.views.main.client.post_container')
+    @patch('storage.views.main.client.head_container')
+    def test_disable_versioning_job(self, mock_head_container,
+                                    mock_post_container,
+                                    mock_delete_container):
+        mock_head_container.side_effect = [
+            {'x-versions-location': '_version_fakecontainer'},
+            {'x-container-object-count': 0},
+        ]
+        self.submit(kind='disable_versioning', container='fakecontainer')
+
+        with patch('storage.views.main.actionlog.log') as mock_log:
+            job = jobs.run_job(jobs.claim_next_job())
+
+        self.assertEqual(job.status, StorageJob.DONE)
+        mock_log.assert_called_with(self.request.user.username, 'disable',
+                                    'Versioning. Container: fakecontainer')
+        self.assertEqual(mock_post_container.call_args[1]['headers'],
+                         {'x-versions-location': ''})
+        self.assertEqual(mock_delete_container.call_args[0][2],
+                         '_version_fakecontainer')
+
+    @patch('storage.views.main.client.delete_object')
+    @patch('storage.views.main.client.put_object')
+    @patch('storage.views.main.client.head_object')
+    def test_restore_objects_job(self, mock_head_object, mock_put_object,
+                                 mock_delete_object):
+        mock_head_object.side_effect = head_object_only_in_trash
+        mock_put_object.side_effect = [None, client.ClientException('')]
+        self.submit(kind='restore_objects', container='fakecontainer',
+                    objects=['a', 'b'])
+
+        with override_settings(SWIFT_TRASH_WORKERS=1):
+            job = jobs.run_job(jobs.claim_next_job())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, StorageJob.DONE)
+        self.assertEqual(job.objects_processed, 1)
+        self.assertEqual(job.errors, 1)
+        self.assertEqual(job.message, '1 objects restored, 1 failed')
+        self.assertFalse(mock_delete_object.called)
+
+    @patch('storage.views.main.client.delete_object')
+    @patch('storage.views.main.client.get_container')
+    def test_purge_trash_job(self, mock_get_container, mock_delete_object):
+        mock_get_container.side_effect = [
+            (None, [{'name': 'a', 'bytes': 1}, {'name': 'b', 'bytes': 2}]),
+            (None, []),
+        ]
+        self.submit(kind='purge_trash', container='fakecontainer')
+
+        job = jobs.run_job(jobs.claim_next_job())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, StorageJob.DONE)
+        self.assertEqual(job.objects_processed, 2)
+        self.assertEqual(job.message, '2 objects deleted, 0 failed')
+
+    @patch('storage.utils.client.post_object')
+    @patch('storage.utils.client.head_object')
+    @patch('storage.views.main.client.get_container')
+    def test_update_headers_job(self, mock_get_container, mock_head_object,
+                                mock_post_object):
+        mock_get_container.side_effect = [
+            (None, [{'name': 'a'}, {'name': 'b'}]),
+            (None, []),
+        ]
+        mock_head_object.return_value = {}
+        mock_post_object.side_effect = [None, client.ClientException('', http_status=404)]
+        self.submit(kind='update_headers', container='fakecontainer',
+                    headers={'x-delete-after': '3600'})
+
+        job = jobs.run_job(jobs.claim_next_job())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, StorageJob.DONE)
+        self.assertEqual(job.objects_processed, 1)
+        self.assertEqual(job.errors, 1)
+        self.assertEqual(job.message, '1 objects updated, 1 failed')
+
+
+class TestStorageJobViews(BaseJobTestCase):
+
+    def post(self, data):
+        request = fake_request(method='POST')
+        request._body = json.dumps(data).encode()
+        request.user = self.request.user
+        return request
+
+    def test_submit_job(self):
+        request = self.post({'kind': 'delete_container',
+                             'params': {'container': 'fakecontainer'}})
+
+        response = views.storage_jobs(request, project=self.project_name)
+
+        self.assertEqual(response.status_code, 202)
+        content = json.loads(response.content)
+        self.assertEqual(content['status'], StorageJob.PENDING)
+        self.assertEqual(StorageJob.objects.get().kind, 'delete_container')
+
+    def test_submit_job_unknown_kind(self):
+        request = self.post({'kind': 'unknown', 'params': {}})
+
+        response = views.storage_jobs(request, project=self.project_name)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(StorageJob.objects.exists())
+
+    def test_submit_job_missing_params(self):
+        request = self.post({'kind': 'delete_pseudofolder',
+                             'params': {'container': 'fakecontainer'}})
+
+        response = views.storage_jobs(request, project=self.project_name)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('pseudofolder', json.loads(response.content)['message'])
+
+    def test_list_jobs(self):
+        self.submit(container='fakecontainer')
+
+        response = views.storage_jobs(self.request, project=self.project_name)
+
+        content = json.loads(response.content)
+        self.assertEqual(len(content['jobs']), 1)
+
+    def test_job_status(self):
+        job = self.submit(container='fakecontainer')
+        StorageJob.objects.filter(pk=job.pk).update(
+            status=StorageJob.RUNNING, objects_processed=10)
+
+        response = views.storage_job(self.request, project=self.project_name,
+                                     job_id=job.id)
+
+        content = json.loads(response.content)
+        self.assertEqual(content['status'], StorageJob.RUNNING)
+        self.assertEqual(content['objects_processed'], 10)
+
+    def test_job_status_of_other_project(self):
+        job = self.submit(container='fakecontainer')
+        StorageJob.objects.filter(pk=job.pk).update(project_id='2')
+
+        response = views.storage_job(self.request, project=self.project_name,
+                                     job_id=job.id)
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_cancel_job(self):
+        job = self.submit(container='fakecontainer')
+        request = self.post({})
+
+        response = views.storage_job_cancel(request, project=self.project_name,
+                                            job_id=job.id)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['status'],
+                         StorageJob.CANCELED)
+
+    def test_delete_container_view_async(self):
+        request = fake_request(method='DELETE', extra={'QUERY_STRING': 'async=1'})
+        request.user = self.request.user
+
+        response = views.delete_container_view(request, self.project_name,
+                                               'fakecontainer')
+
+        self.assertEqual(response.status_code, 202)
+        content = json.loads(response.content)
+        job = StorageJob.objects.get(pk=content['job_id'])
+        self.assertEqual(job.kind, 'delete_container')
+        self.assertEqual(content['status_url'], '/p/{}/storage/jobs/{}'.format(
+            self.project_name, job.id))
+
+    def test_delete_pseudofolder_async(self):
+        request = fake_request(extra={'QUERY_STRING': 'async=1'})
+        request.user = self.request.user
+
+        response = views.delete_pseudofolder(request, self.project_name,
+                                             'fakecontainer', 'folder/')
+
+        self.assertEqual(response.status_code, 202)
+        job = StorageJob.objects.get(pk=json.loads(response.content)['job_id'])
+        self.assertEqual(job.get_params(), {'container': 'fakecontainer',
+                                            'pseudofolder': 'folder/'})
+
+    @patch('storage.views.main.actionlog.log')
+    @patch('storage.views.main.client.head_container')
+    def test_disable_versioning_async(self, mock_head_container, mock_log):
+        request = fake_request(method='POST')
+        request.POST = request.POST.copy()
+        request.POST.update({'action': 'disable', 'async': '1'})
+        request.user = self.request.user
+
+        response = views.object_versioning(request, self.project_name,
+                                           'fakecontainer')
+
+        self.assertEqual(response.status_code, 202)
+        job = StorageJob.objects.get(pk=json.loads(response.content)['job_id'])
+        self.assertEqual(job.kind, 'disable_versioning')
+        self.assertEqual(job.status, StorageJob.PENDING)
+        self.assertFalse(mock_head_container.called)
+        self.assertFalse(mock_log.called)
+
+    def test_restore_objects_async(self):
+        request = fake_request(method='POST', extra={'QUERY_STRING': 'async=1'})
+        request._body = json.dumps({'container': 'fakecontainer',
+                                    'prefix': 'folder/'}).encode()
+        request.user = self.request.user
+
+        response = views.restore_objects(request, self.project_name)
+
+        self.assertEqual(response.status_code, 202)
+        job = StorageJob.objects.get(pk=json.loads(response.content)['job_id'])
+        self.assertEqual(job.kind, 'restore_objects')
+        self.assertEqual(job.get_params()['prefix'], 'folder/')
+
+    def test_purge_trash_async(self):
+        request = fake_request(method='POST', extra={'QUERY_STRING': 'async=1'})
+        request._body = json.dumps({'container': 'fakecontainer',
+                                    'older_than': '7'}).encode()
+        request.user = self.request.user
+
+        response = views.purge_trash(request, self.project_name)
+
+        self.assertEqual(response.status_code, 202)
+        job = StorageJob.objects.get(pk=json.loads(response.content)['job_id'])
+        self.assertEqual(job.kind, 'purge_trash')
+        self.assertEqual(job.get_params(), {'container': 'fakecontainer',
+                                            'prefix': None, 'older_than': 7,
+                                            'delete_after': None})
+
+    def test_update_headers_async(self):
+        request = fake_request(method='POST', extra={'QUERY_STRING': 'async=1'})
+        request._body = json.dumps({'container': 'fakecontainer',
+                                    'prefix': 'folder/',
+                                    'headers': {'X-Object-Meta-Owner': 'me'}}).encode()
+        request.user = self.request.user
+
+        response = views.update_headers(request, self.project_name)
+
+        self.assertEqual(response.status_code, 202)
+        job = StorageJob.objects.get(pk=json.loads(response.content)['job_id'])
+        self.assertEqual(job.kind, 'update_headers')
+        self.assertEqual(job.get_params(), {'container': 'fakecontainer',
+                                            'prefix': 'folder/',
+                                            'headers': {'x-object-meta-owner': 'me'}})
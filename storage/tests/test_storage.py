@@ -2,11 +2,19 @@
 
 from unittest.mock import patch, Mock
 from unittest import TestCase
+import gzip
+import json
+import time
 import requests
+import tracemalloc
+
+from datetime import datetime, timedelta
 
 from swiftclient import client
 
+from django.conf import settings
 from django.urls import reverse
+from django.core.cache import cache
 from django.utils.translation import gettext as _
 from django.test.utils import override_settings
 from django.contrib.auth.models import Group, User
@@ -15,7 +23,6 @@ from storage.tests import fakes
 from storage import views
 
 from vault.tests.fakes import fake_request
-from vault import utils
 
 
 class MockRequest:
@@ -30,6 +37,10 @@ class BaseTestCase(TestCase):
         self.anonymous_request = fake_request(user=False)
         patch('storage.views.main.actionlog',
               Mock(return_value=None)).start()
+        # unknown cluster capabilities, without fetching /info
+        patch('storage.capabilities.swift_capabilities.get',
+              Mock(return_value={})).start()
+        cache.clear()
 
     def tearDown(self):
         User.objects.all().delete()
@@ -169,6 +180,24 @@ class TestStorage(BaseTestCase):
         # Botao de views.upload File
         self.assertIn('/p/{}/storage/upload/fakecontainer/'.format(project_name), response.content.decode('UTF-8'))
 
+    @patch('storage.views.main.client.delete_object')
+    @patch('storage.views.main.client.get_container')
+    def test_objectview_listing_is_cached_until_changed(self, mock_get_container,
+                                                        mock_delete_object):
+        mock_get_container.return_value = fakes.get_container()
+        project_name = self.request.session.get('project_name')
+        self.request.META.update({'HTTP_HOST': 'localhost'})
+
+        views.objectview(self.request, project_name, 'fakecontainer')
+        views.objectview(self.request, project_name, 'fakecontainer')
+
+        self.assertEqual(mock_get_container.call_count, 1)
+
+        views.delete_object(self.request, 'fakecontainer', 'ok')
+        views.objectview(self.request, project_name, 'fakecontainer')
+
+        self.assertEqual(mock_get_container.call_count, 2)
+
     @patch('storage.views.main.log.exception')
     @patch('storage.views.main.client.get_container')
     def test_objectview_clientexception(self, mock_get_container, mock_logging):
@@ -284,7 +313,7 @@ class TestStorage(BaseTestCase):
         self.assertTrue(mock_put_container.called)
         self.assertTrue(mock_logging.called)
 
-    @patch('storage.views.main.requests.put')
+    @patch('requests.Session.put')
     def test_create_object_status_201(self, mock_requests_put):
         mock_requests_put.return_value = fakes.FakeRequestResponse(201)
         self.request.FILES['file1'] = fakes.get_temporary_text_file()
@@ -307,7 +336,7 @@ class TestStorage(BaseTestCase):
                                                  'project': project_name})
         self.assertEqual(headers['Location'], expected)
 
-    @patch('storage.views.main.requests.put')
+    @patch('requests.Session.put')
     def test_create_object_status_201_with_prefix(self, mock_requests_put):
         mock_requests_put.return_value = fakes.FakeRequestResponse(201)
         self.request.FILES['file1'] = fakes.get_temporary_text_file()
@@ -336,7 +365,7 @@ class TestStorage(BaseTestCase):
         self.assertEqual(headers['Location'], expected)
 
     @patch('storage.views.main.log.exception')
-    @patch('storage.views.main.requests.put')
+    @patch('requests.Session.put')
     def test_create_object_status_401(self, mock_requests_put, mock_logging):
         mock_requests_put.return_value = fakes.FakeRequestResponse(401)
         self.request.FILES['file1'] = fakes.get_temporary_text_file()
@@ -352,7 +381,7 @@ class TestStorage(BaseTestCase):
         self.assertFalse(mock_logging.called)
 
     @patch('storage.views.main.log.exception')
-    @patch('storage.views.main.requests.put')
+    @patch('requests.Session.put')
     def test_create_object_status_403(self, mock_requests_put, mock_logging):
         mock_requests_put.return_value = fakes.FakeRequestResponse(403)
         self.request.FILES['file1'] = fakes.get_temporary_text_file()
@@ -368,7 +397,7 @@ class TestStorage(BaseTestCase):
         self.assertFalse(mock_logging.called)
 
     @patch('storage.views.main.log.exception')
-    @patch('storage.views.main.requests.put')
+    @patch('requests.Session.put')
     def test_create_object_status_other_than_above(self, mock_requests_put, mock_logging):
         mock_requests_put.return_value = fakes.FakeRequestResponse(404)
         self.request.FILES['file1'] = fakes.get_temporary_text_file()
@@ -813,6 +842,90 @@ class TestStorage(BaseTestCase):
                                                  'project': project_name})
         self.assertEqual(headers['Location'], expected)
 
+    @patch('storage.views.main.client.delete_object')
+    @patch('storage.views.main.client.get_container')
+    def test_delete_pseudofolder_walks_every_page(self, mock_get_container, mock_delete_object):
+        fakepseudofolder = 'fakepseudofolder/'
+        project_name = self.request.session.get('project_name')
+
+        mock_get_container.side_effect = [
+            ({}, [{'name': fakepseudofolder}, {'name': fakepseudofolder + 'obj1'}]),
+            ({}, [{'name': fakepseudofolder + 'obj2'}]),
+            ({}, []),
+        ]
+
+        views.delete_pseudofolder(self.request, project_name, 'fakecontainer', fakepseudofolder)
+
+        msgs = [msg for msg in self.request._messages]
+        self.assertEqual(msgs[0].message, 'Pseudofolder and 2 objects deleted.')
+        self.assertEqual(mock_delete_object.call_count, 3)
+
+        calls = mock_get_container.call_args_list
+        self.assertEqual([c[1]['prefix'] for c in calls], [fakepseudofolder] * 3)
+        self.assertEqual([c[1]['marker'] for c in calls],
+                         [None, fakepseudofolder + 'obj1', fakepseudofolder + 'obj2'])
+
+    @patch('requests.Session.post')
+    @patch('storage.views.main.get_info')
+    @patch('storage.views.main.client.delete_object')
+    @patch('storage.views.main.client.get_container')
+    def test_delete_pseudofolder_bulk_delete(self, mock_get_container, mock_delete_object,
+                                             mock_get_info, mock_post):
+        fakepseudofolder = 'fakepseudofolder/'
+        project_name = self.request.session.get('project_name')
+        page_size, total = 10000, 100000
+
+        # the listing is split in ranges, sampled with marker and limit
+        names = ['{}obj{:06d}'.format(fakepseudofolder, i) for i in range(total)]
+        mock_get_container.side_effect = fakes.FakeContainerListing(
+            names, page_size=page_size)
+        mock_get_info.return_value = {'bulk_delete': {'max_deletes_per_request': 10000}}
+        mock_post.side_effect = lambda url, headers, data, verify: \
+            fakes.get_bulk_delete_response(deleted=len(data.split(b'\n')))
+
+        start = time.time()
+        views.delete_pseudofolder(self.request, project_name, 'fakecontainer', fakepseudofolder)
+
+        self.assertLess(time.time() - start, 10)
+        self.assertFalse(mock_delete_object.called)
+        self.assertEqual(mock_post.call_count, total // 10000)
+
+        msgs = [msg for msg in self.request._messages]
+        self.assertEqual(msgs[0].message, 'Pseudofolder and {} objects deleted.'.format(total - 1))
+
+    @patch('requests.Session.post')
+    @patch('storage.views.main.get_info')
+    @patch('storage.views.main.client.get_container')
+    def test_delete_pseudofolder_bulk_delete_reports_failures(self, mock_get_container,
+                                                              mock_get_info, mock_post):
+        fakepseudofolder = 'fakepseudofolder/'
+        project_name = self.request.session.get('project_name')
+
+        mock_get_container.side_effect = [
+            ({}, [{'name': fakepseudofolder}, {'name': fakepseudofolder + 'obj1'},
+                  {'name': fakepseudofolder + 'obj2'}]),
+            ({}, []),
+        ]
+        mock_get_info.return_value = {'bulk_delete': {'max_deletes_per_request': 10}}
+        mock_post.return_value = fakes.get_bulk_delete_response(
+            deleted=2, errors=[['/fakecontainer/fakepseudofolder/obj2', '401 Unauthorized']])
+
+        views.delete_pseudofolder(self.request, project_name, 'fakecontainer', fakepseudofolder)
+
+        msgs = [msg for msg in self.request._messages]
+        self.assertEqual(msgs[0].message,
+                         '{}: 2 deleted, 1 failed.'.format(_('Could not delete all objects')))
+
+    @patch('storage.views.main.client.get_container')
+    def test_delete_pseudofolder_fail_to_list_objects(self, mock_get_container):
+        project_name = self.request.session.get('project_name')
+        mock_get_container.side_effect = client.ClientException('')
+
+        views.delete_pseudofolder(self.request, project_name, 'fakecontainer', 'fakepseudofolder/')
+
+        msgs = [msg for msg in self.request._messages]
+        self.assertEqual(msgs[0].message, _('Fail to delete pseudofolder'))
+
     @patch('storage.views.main.client.delete_object')
     @patch('storage.views.main.client.get_container')
     def test_delete_pseudofolder_fail(self, mock_get_container, mock_delete_object):
@@ -902,7 +1015,27 @@ class TestStorage(BaseTestCase):
                                                  'project': project_name})
         self.assertEqual(headers['Location'], expected)
 
-    @patch('storage.views.main.requests.get')
+    @patch('storage.views.main.listing_cache.bypass')
+    @patch('storage.views.main.get_temp_key')
+    @patch('storage.views.main.get_info')
+    def test_upload_view_bypasses_listing_cache(self, mock_get_info,
+                                                mock_get_temp_key,
+                                                mock_bypass):
+        mock_get_info.return_value = {}
+        mock_get_temp_key.return_value = 'fakekey'
+        project_name = self.request.session.get('project_name')
+
+        self.request.META.update({
+            'HTTP_HOST': 'localhost'
+        })
+
+        views.upload(self.request, project_name, 'fakecontainer')
+
+        storage_url, container, seconds = mock_bypass.call_args[0]
+        self.assertEqual(container, 'fakecontainer')
+        self.assertGreater(seconds, 14 * 60)
+
+    @patch('requests.Session.get')
     def test_download(self, mock_get):
         content = b'ola'
         headers = {'Content-Type': 'fake/object'}
@@ -913,10 +1046,159 @@ class TestStorage(BaseTestCase):
 
         computed_headers = dict([i for i in response.items()])
 
-        self.assertEqual(response.content, content)
+        self.assertEqual(b''.join(response.streaming_content), content)
         self.assertEqual(headers, computed_headers)
+        self.assertTrue(mock_get.return_value.closed)
+
+    @patch('requests.Session.get')
+    def test_download_relays_encoded_body(self, mock_get):
+        content = gzip.compress(b'ola' * 100)
+        headers = {'Content-Type': 'text/plain',
+                   'Content-Encoding': 'gzip',
+                   'Content-Length': str(len(content))}
+        project_name = self.request.session.get('project_name')
+        mock_get.return_value = fakes.FakeRequestResponse(content=content,
+                                                          headers=headers)
+
+        response = views.download(self.request, project_name, 'fakecontainer', 'fakeobject')
+
+        # The body is sent as stored, matching its length and encoding
+        self.assertEqual(b''.join(response.streaming_content), content)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Length'], str(len(content)))
+        self.assertIs(mock_get.return_value.raw.decode_content, False)
+
+    @patch('requests.Session.get')
+    def test_download_passes_range_and_conditional_headers(self, mock_get):
+        headers = {'Content-Type': 'fake/object',
+                   'Content-Range': 'bytes 0-1/3',
+                   'Content-Length': '2'}
+        project_name = self.request.session.get('project_name')
+        mock_get.return_value = fakes.FakeRequestResponse(206, content=b'ol',
+                                                          headers=headers)
+        self.request.META.update({
+            'HTTP_RANGE': 'bytes=0-1',
+            'HTTP_IF_NONE_MATCH': '"fakeetag"',
+        })
+
+        response = views.download(self.request, project_name, 'fakecontainer', 'fakeobject')
+
+        _, kargs = mock_get.call_args
+        self.assertEqual(kargs['headers']['Range'], 'bytes=0-1')
+        self.assertEqual(kargs['headers']['If-None-Match'], '"fakeetag"')
+        self.assertNotIn('If-Modified-Since', kargs['headers'])
+        self.assertTrue(kargs['stream'])
+        self.assertEqual(kargs['timeout'], settings.SWIFT_REQUESTS_TIMEOUT)
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 0-1/3')
+        self.assertEqual(b''.join(response.streaming_content), b'ol')
+
+    @patch('requests.Session.get')
+    def test_download_not_modified(self, mock_get):
+        project_name = self.request.session.get('project_name')
+        mock_get.return_value = fakes.FakeRequestResponse(304, content=b'',
+                                                          headers={'ETag': '"fakeetag"'})
+        self.request.META.update({'HTTP_IF_NONE_MATCH': '"fakeetag"'})
+
+        response = views.download(self.request, project_name, 'fakecontainer', 'fakeobject')
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], '"fakeetag"')
+        self.assertEqual(b''.join(response.streaming_content), b'')
+
+    @override_settings(SWIFT_DOWNLOAD_TEMPURL=True)
+    @patch('requests.Session.get')
+    @patch('storage.views.main.get_temp_key')
+    def test_download_redirects_to_temp_url(self, mock_get_temp_key, mock_get):
+        mock_get_temp_key.return_value = 'fakekey'
+        project_name = self.request.session.get('project_name')
+
+        response = views.download(self.request, project_name, 'fakecontainer', 'fakeobject')
 
-    @patch('storage.views.main.requests.head')
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response.url.startswith(
+            'http://fake.s3.glbimg.com/v1/AUTH_1/fakecontainer/fakeobject?temp_url_sig='))
+        self.assertFalse(mock_get.called)
+
+    @override_settings(SWIFT_DOWNLOAD_TEMPURL=True)
+    @patch('storage.views.main.get_info')
+    @patch('storage.views.main.get_temp_key')
+    def test_download_temp_url_uses_strongest_digest(self, mock_get_temp_key,
+                                                     mock_get_info):
+        mock_get_temp_key.return_value = 'fakekey'
+        mock_get_info.return_value = {'tempurl': {
+            'methods': ['GET', 'HEAD'], 'allowed_digests': ['sha1', 'sha256']}}
+        project_name = self.request.session.get('project_name')
+
+        response = views.download(self.request, project_name, 'fakecontainer', 'fakeobject')
+
+        self.assertEqual(response.status_code, 302)
+        signature = response.url.split('temp_url_sig=')[1].split('&')[0]
+        self.assertEqual(len(signature), 64)
+
+    @override_settings(SWIFT_DOWNLOAD_TEMPURL=True)
+    @patch('requests.Session.get')
+    @patch('storage.views.main.get_info')
+    @patch('storage.views.main.get_temp_key')
+    def test_download_streams_when_cluster_has_no_tempurl(self, mock_get_temp_key,
+                                                          mock_get_info, mock_get):
+        mock_get_info.return_value = {'swift': {}}
+        mock_get.return_value = fakes.FakeRequestResponse(content=b'ola',
+            headers={'Content-Type': 'fake/object'})
+        project_name = self.request.session.get('project_name')
+
+        response = views.download(self.request, project_name, 'fakecontainer', 'fakeobject')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'ola')
+        self.assertFalse(mock_get_temp_key.called)
+
+    @override_settings(SWIFT_DOWNLOAD_TEMPURL=True)
+    @patch('requests.Session.get')
+    @patch('storage.views.main.get_temp_key')
+    def test_download_without_temp_key_streams_object(self, mock_get_temp_key, mock_get):
+        mock_get_temp_key.return_value = None
+        mock_get.return_value = fakes.FakeRequestResponse(content=b'ola',
+            headers={'Content-Type': 'fake/object'})
+        project_name = self.request.session.get('project_name')
+
+        response = views.download(self.request, project_name, 'fakecontainer', 'fakeobject')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'ola')
+
+    @override_settings(SWIFT_DOWNLOAD_CHUNK_SIZE=1024 * 1024)
+    @patch('requests.Session.get')
+    def test_download_memory_does_not_grow_with_object_size(self, mock_get):
+        chunk_size = 1024 * 1024
+        chunks = 64
+        project_name = self.request.session.get('project_name')
+        upstream = fakes.FakeStreamedResponse(chunks, chunk_size,
+            headers={'Content-Type': 'fake/object',
+                     'Content-Length': str(chunks * chunk_size)})
+        mock_get.return_value = upstream
+
+        response = views.download(self.request, project_name, 'fakecontainer', 'fakeobject')
+
+        # Nothing is read from Swift before the body is consumed
+        self.assertEqual(upstream.produced, 0)
+
+        tracemalloc.start()
+        total = 0
+        for chunk in response.streaming_content:
+            total += len(chunk)
+            # Each chunk is relayed as soon as it arrives
+            self.assertEqual(total, upstream.produced * chunk_size)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        self.assertEqual(total, chunks * chunk_size)
+        # A 64MiB object is relayed holding no more than a few chunks
+        self.assertLess(peak, 4 * chunk_size)
+        self.assertTrue(upstream.closed)
+
+    @patch('requests.Session.head')
     def test_metadataview_return_headers_from_container(self, mock_head):
         headers = {'content-type': 'fake/container'}
         project_name = self.request.session.get('project_name')
@@ -926,7 +1208,7 @@ class TestStorage(BaseTestCase):
 
         self.assertIn('fake/container', response.content.decode('UTF-8'))
 
-    @patch('storage.views.main.requests.head')
+    @patch('requests.Session.head')
     def test_metadataview_return_headers_from_object(self, mock_head):
         headers = {'content-type': 'fake/object'}
         mock_head.return_value = fakes.FakeRequestResponse(content='',
@@ -1084,11 +1366,11 @@ class TestStorage(BaseTestCase):
         kargs = mock_render.mock_calls[0][1]
         computed = kargs[2]
 
-        expected = {'objects': utils.generic_pagination([], 1),
+        expected = {'objects': [],
                     'container': 'fakecontainer',
                     'version_location': None}
 
-        self.assertEqual(str(computed['objects']), str(expected['objects']))
+        self.assertEqual(computed['objects'], expected['objects'])
         self.assertEqual(computed['container'], expected['container'])
         self.assertEqual(computed['version_location'], expected['version_location'])
 
@@ -1108,13 +1390,103 @@ class TestStorage(BaseTestCase):
         kargs = mock_render.mock_calls[0][1]
         computed = kargs[2]
 
-        expected = {'objects': utils.generic_pagination([], 1),
+        expected = {'objects': [],
                     'container': 'fakecontainer',
                     'version_location': 'abc'}
 
-        self.assertEqual(str(computed['objects']), str(expected['objects']))
+        self.assertEqual(computed['objects'], expected['objects'])
         self.assertEqual(computed['container'], expected['container'])
         self.assertEqual(computed['version_location'], expected['version_location'])
+        self.assertIsNone(computed['marker'])
+
+    @patch('storage.views.main.render')
+    @patch('storage.views.main.client.get_container')
+    @patch('storage.views.main.client.head_container')
+    def test_object_versioning_view_paginates_with_marker(self,
+                                                         mock_head_container,
+                                                         mock_get_container,
+                                                         mock_render):
+        mock_head_container.return_value = {'x-versions-location': 'abc'}
+        mock_get_container.return_value = (None, [
+            {'subdir': '{:03x}obj{:03}/'.format(6, i)} for i in range(50)])
+        get = self.request.GET.copy()
+        get.update({'marker': '006obj049/'})
+        self.request.GET = get
+        project_name = self.request.session.get('project_name')
+
+        views.object_versioning(self.request, project_name, 'fakecontainer')
+
+        kwargs = mock_get_container.call_args[1]
+        self.assertEqual(kwargs['marker'], '006obj049/')
+        self.assertEqual(kwargs['limit'], 50)
+        self.assertFalse(kwargs['full_listing'])
+
+        computed = mock_render.mock_calls[0][1][2]
+        self.assertEqual(len(computed['objects']), 50)
+        self.assertEqual(computed['marker'], '006obj049/')
+
+    def test_object_history_needs_authentication(self):
+        response = views.object_history(self.anonymous_request)
+
+        self.assertEqual(response.status_code, 302)
+
+    @patch('storage.views.main.render')
+    @patch('storage.views.main.client.get_container')
+    @patch('storage.views.main.client.head_container')
+    def test_object_history_lists_versions_of_object(self,
+                                                     mock_head_container,
+                                                     mock_get_container,
+                                                     mock_render):
+        mock_head_container.return_value = {'x-versions-location': '_version_fakecontainer'}
+        mock_get_container.return_value = (None, [
+            {'name': '00bdir/obj.txt/1600000000.00000', 'bytes': 10},
+            {'name': '00bdir/obj.txt/1600000001.00000', 'bytes': 20}])
+        project_name = self.request.session.get('project_name')
+
+        views.object_history(self.request, project_name, 'fakecontainer', 'dir/obj.txt')
+
+        args, kwargs = mock_get_container.call_args
+        self.assertEqual(args[2], '_version_fakecontainer')
+        self.assertEqual(kwargs['prefix'], '00bdir/obj.txt/')
+        self.assertNotIn('delimiter', kwargs)
+
+        computed = mock_render.mock_calls[0][1][2]
+        self.assertEqual([v['timestamp'] for v in computed['versions']],
+                         ['1600000000.00000', '1600000001.00000'])
+        self.assertEqual(computed['version_location'], '_version_fakecontainer')
+        self.assertIsNone(computed['marker'])
+
+    @patch('storage.views.main.render')
+    @patch('storage.views.main.client.get_container')
+    @patch('storage.views.main.client.head_container')
+    def test_object_history_uses_utf8_length_in_prefix(self,
+                                                       mock_head_container,
+                                                       mock_get_container,
+                                                       mock_render):
+        mock_head_container.return_value = {'x-versions-location': 'abc'}
+        mock_get_container.return_value = (None, [])
+        project_name = self.request.session.get('project_name')
+
+        views.object_history(self.request, project_name, 'fakecontainer', 'ação')
+
+        self.assertEqual(mock_get_container.call_args[1]['prefix'], '006ação/')
+
+    @patch('storage.views.main.render')
+    @patch('storage.views.main.client.get_container')
+    @patch('storage.views.main.client.head_container')
+    def test_object_history_versioning_disabled(self,
+                                                mock_head_container,
+                                                mock_get_container,
+                                                mock_render):
+        mock_head_container.return_value = {}
+        project_name = self.request.session.get('project_name')
+
+        views.object_history(self.request, project_name, 'fakecontainer', 'obj.txt')
+
+        self.assertFalse(mock_get_container.called)
+        computed = mock_render.mock_calls[0][1][2]
+        self.assertEqual(computed['versions'], [])
+        self.assertIsNone(computed['version_location'])
 
     @patch('storage.views.main.enable_versioning')
     def test_object_versioning_view_enabling_versioning(self, mock_enable):
@@ -1173,15 +1545,15 @@ class TestStorage(BaseTestCase):
         self.assertEqual(response.status_code, 200)
         self.assertNotIn('/storage/objects/.container4/', response.content.decode('UTF-8'))
 
-    @patch('json.loads')
-    @patch('requests.get')
-    def test_get_info(self, mock_get, mock_json_loads):
-        expect_url = 'https://fake.api.globoi.com/info'
+    @patch('storage.views.main.swift_capabilities.get')
+    def test_get_info(self, mock_get):
         url = "https://fake.api.globoi.com/v1/AUTH_12314"
+        mock_get.return_value = {'bulk_delete': {}}
 
-        views.main.get_info(url)
-        mock_json_loads.assert_called()
-        mock_get.assert_called_with(expect_url)
+        computed = views.main.get_info(url)
+
+        self.assertEqual(computed, {'bulk_delete': {}})
+        mock_get.assert_called_with(url)
 
     def test_prepare_data_name(self):
         fakecontainer = 'fakecontainer'
@@ -1196,7 +1568,7 @@ class TestStorage(BaseTestCase):
     @patch('storage.views.main.client.get_container')
     @patch('storage.views.main.get_info')
     @patch('storage.views.main.prepare_data_name')
-    @patch('requests.post')
+    @patch('requests.Session.post')
     @patch("storage.views.main.actionlog.log")
     @patch('storage.views.main.client.delete_container')
     def test_delete_container_bulk_delete(self, mock_delete_container,
@@ -1208,12 +1580,13 @@ class TestStorage(BaseTestCase):
                                           mock_head_container):
         fakecontainer = 'fakecontainer'
         fake_obj_name = 'fakename'
-        headers = {"X-Auth-Token": None}
+        headers = {"X-Auth-Token": "fake_token", "Accept": "application/json"}
         expected_data = fakecontainer.encode() + b"/" + fake_obj_name.encode()
         mock_head_container.return_value = ({'x-container-object-count': 1})
         mock_get_container.return_value = (None, [{'name': 'object1'}])
         mock_get_info.return_value = {'bulk_delete': {'max_deletes_per_request': 1}}
         mock_prepare_data_name.return_value = expected_data
+        mock_post.return_value = fakes.get_bulk_delete_response(deleted=1)
 
         resp = views.delete_container(self.request, fakecontainer, force=True)
         self.assertTrue(resp)
@@ -1222,10 +1595,38 @@ class TestStorage(BaseTestCase):
         mock_get_info.assert_called()
         mock_prepare_data_name.assert_called()
         mock_post.assert_called_with('https://fake.api.globoi.com/v1/AUTH_1?bulk-delete=true', headers=headers,
-                                     data=expected_data)
+                                     data=expected_data, verify=True)
         mock_delete_container.assert_called()
         mock_action_log.assert_called()
 
+    @patch('storage.views.main.client.head_container')
+    @patch('storage.views.main.client.get_container')
+    @patch('storage.views.main.get_info')
+    @patch('requests.Session.post')
+    @patch("storage.views.main.actionlog.log")
+    @patch('storage.views.main.client.delete_container')
+    def test_delete_container_bulk_delete_failure(self, mock_delete_container,
+                                                  mock_action_log,
+                                                  mock_post,
+                                                  mock_get_info,
+                                                  mock_get_container,
+                                                  mock_head_container):
+        mock_head_container.return_value = ({'x-container-object-count': 2})
+        mock_get_container.side_effect = [
+            (None, [{'name': 'object1'}, {'name': 'object2'}]),
+            (None, []),
+        ]
+        mock_get_info.return_value = {'bulk_delete': {'max_deletes_per_request': 10}}
+        mock_post.return_value = fakes.get_bulk_delete_response(
+            deleted=1, errors=[['/fakecontainer/object2', '401 Unauthorized']])
+
+        resp = views.delete_container(self.request, 'fakecontainer', force=True)
+
+        self.assertFalse(resp)
+        self.assertEqual(mock_post.call_count, 1)
+        self.assertFalse(mock_delete_container.called)
+        self.assertFalse(mock_action_log.called)
+
 
 class TestStorageAcls(BaseTestCase):
 
@@ -1612,3 +2013,512 @@ class TestStorageCORS(BaseTestCase):
 
         # Verifica se a chamada para a API estava com os argumentos corretos
         self.assertEqual(expected_json, kargs)
+
+
+class TestStorageTrash(BaseTestCase):
+
+    def trash_request(self, query=''):
+        request = fake_request(extra={'QUERY_STRING': query})
+        request.user = self.request.user
+        return request
+
+    def trash_page(self, names):
+        return {}, [{'name': name, 'bytes': len(name),
+                     'last_modified': '2024-01-0{}T00:00:00'.format(i + 1)}
+                    for i, name in enumerate(names)]
+
+    @patch('storage.views.main.client.get_container')
+    def test_deleted_objects_page(self, mock_get_container):
+        mock_get_container.return_value = self.trash_page(['folder/a', 'folder/bb'])
+        project_name = self.request.session.get('project_name')
+        request = self.trash_request('marker=folder/0&limit=2')
+
+        response = views.get_deleted_objects(request, project_name,
+                                             'fakecontainer', 'folder/')
+
+        self.assertEqual(response.status_code, 200)
+        content = json.loads(response.content)
+        self.assertEqual([o['name'] for o in content['deleted_objects']],
+                         ['folder/a', 'folder/bb'])
+        self.assertEqual(content['next_marker'], 'folder/bb')
+        self.assertEqual(content['trash_container'], '.trash-fakecontainer')
+
+        kargs = mock_get_container.call_args[1]
+        self.assertEqual(kargs['prefix'], 'folder/')
+        self.assertEqual(kargs['marker'], 'folder/0')
+        self.assertEqual(kargs['limit'], 2)
+        self.assertFalse(kargs['full_listing'])
+
+    @patch('storage.views.main.client.get_container')
+    def test_deleted_objects_last_page(self, mock_get_container):
+        mock_get_container.return_value = self.trash_page(['a'])
+        project_name = self.request.session.get('project_name')
+
+        response = views.get_deleted_objects(self.trash_request('limit=2'),
+                                             project_name, 'fakecontainer')
+
+        self.assertIsNone(json.loads(response.content)['next_marker'])
+
+    @patch('storage.views.main.client.get_container')
+    def test_deleted_objects_with_delimiter(self, mock_get_container):
+        mock_get_container.return_value = ({}, [{'subdir': 'folder/'},
+                                                {'name': 'a', 'bytes': 1}])
+        project_name = self.request.session.get('project_name')
+
+        response = views.get_deleted_objects(
+            self.trash_request('delimiter=/'), project_name, 'fakecontainer')
+
+        content = json.loads(response.content)
+        self.assertEqual(content['pseudofolders'], ['folder/'])
+        self.assertEqual(len(content['deleted_objects']), 1)
+        self.assertEqual(mock_get_container.call_args[1]['delimiter'], '/')
+
+    @patch('storage.views.main.client.get_container')
+    def test_deleted_objects_without_trash_container(self, mock_get_container):
+        mock_get_container.side_effect = client.ClientException('', http_status=404)
+        project_name = self.request.session.get('project_name')
+
+        response = views.get_deleted_objects(self.trash_request(),
+                                             project_name, 'fakecontainer')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['deleted_objects'], [])
+
+    @patch('storage.views.main.client.get_container')
+    def test_deleted_objects_bad_parameters(self, mock_get_container):
+        project_name = self.request.session.get('project_name')
+
+        for query in ('limit=abc', 'limit=0'):
+            response = views.get_deleted_objects(self.trash_request(query),
+                                                 project_name, 'fakecontainer')
+            self.assertEqual(response.status_code, 400)
+
+        self.assertFalse(mock_get_container.called)
+
+    def restore_request(self, data, query=''):
+        request = fake_request(method='POST', extra={'QUERY_STRING': query})
+        request._body = json.dumps(data).encode()
+        request.user = self.request.user
+        return request
+
+    @patch('storage.views.main.client.delete_object')
+    @patch('storage.views.main.client.put_object')
+    @patch('storage.views.main.client.head_object')
+    def test_restore_objects(self, mock_head_object, mock_put_object,
+                             mock_delete_object):
+        def head_object(storage_url, auth_token, container, name, http_conn=None):
+            if container == 'fakecontainer' and name != 'taken.txt':
+                raise client.ClientException('', http_status=404)
+            return {'x-object-meta-owner': 'me'}
+
+        mock_head_object.side_effect = head_object
+        project_name = self.request.session.get('project_name')
+        request = self.restore_request({'container': 'fakecontainer',
+                                        'objects': ['a.txt', 'taken.txt'],
+                                        'remove_from_trash': True})
+
+        response = views.restore_objects(request, project_name)
+
+        self.assertEqual(response.status_code, 200)
+        content = json.loads(response.content)
+        self.assertEqual(content['restored'], 2)
+        results = {r['name']: r['restored_as'] for r in content['results']}
+        self.assertEqual(results['a.txt'], 'a.txt')
+        self.assertTrue(results['taken.txt'].startswith('taken_'))
+        self.assertTrue(results['taken.txt'].endswith('.txt'))
+
+        headers = {c[1]['headers']['X-Copy-From']: c[1]['headers']
+                   for c in mock_put_object.call_args_list}
+        self.assertEqual(headers['/.trash-fakecontainer/a.txt']['x-object-meta-owner'], 'me')
+        self.assertEqual(sorted(c[0][3] for c in mock_delete_object.call_args_list),
+                         ['a.txt', 'taken.txt'])
+
+    @patch('storage.views.main.client.delete_object')
+    @patch('storage.views.main.client.put_object')
+    @patch('storage.views.main.client.head_object')
+    def test_restore_objects_reports_failures(self, mock_head_object,
+                                              mock_put_object, mock_delete_object):
+        def put_object(storage_url, auth_token, container, name, **kwargs):
+            if name == 'b':
+                raise client.ClientException('Forbidden', http_status=403)
+
+        mock_head_object.side_effect = [client.ClientException('', http_status=404),
+                                        {}] * 3
+        mock_put_object.side_effect = put_object
+        project_name = self.request.session.get('project_name')
+        request = self.restore_request({'container': 'fakecontainer',
+                                        'objects': ['a', 'b', 'c']})
+
+        with override_settings(SWIFT_TRASH_WORKERS=1):
+            response = views.restore_objects(request, project_name)
+
+        content = json.loads(response.content)
+        self.assertEqual(content['restored'], 2)
+        self.assertEqual(content['failed'], 1)
+        failed = [r for r in content['results'] if 'error' in r]
+        self.assertEqual(failed[0]['name'], 'b')
+        self.assertEqual(failed[0]['status'], 403)
+        self.assertFalse(mock_delete_object.called)
+
+    @patch('storage.views.main.client.delete_object')
+    @patch('storage.views.main.client.put_object')
+    @patch('storage.views.main.client.head_object')
+    @patch('storage.views.main.client.get_container')
+    def test_restore_objects_by_prefix(self, mock_get_container, mock_head_object,
+                                       mock_put_object, mock_delete_object):
+        mock_get_container.side_effect = [
+            ({}, [{'name': 'folder/a'}, {'name': 'folder/b'}]),
+            ({}, []),
+        ]
+        mock_head_object.side_effect = client.ClientException('', http_status=404)
+        project_name = self.request.session.get('project_name')
+        request = self.restore_request({'container': 'fakecontainer',
+                                        'prefix': 'folder/'})
+
+        response = views.restore_objects(request, project_name)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mock_get_container.call_args[0][2], '.trash-fakecontainer')
+        self.assertEqual(mock_get_container.call_args[1]['prefix'], 'folder/')
+
+    def test_restore_objects_bad_parameters(self):
+        project_name = self.request.session.get('project_name')
+
+        for data in ({'objects': ['a']}, {'container': 'fakecontainer'},
+                     {'container': 'fakecontainer', 'objects': 'a'}):
+            response = views.restore_objects(self.restore_request(data),
+                                             project_name)
+            self.assertEqual(response.status_code, 400)
+
+    def purge_request(self, data, query=''):
+        return self.restore_request(data, query)
+
+    @patch('storage.views.main.client.delete_object')
+    @patch('storage.views.main.client.get_container')
+    def test_purge_trash(self, mock_get_container, mock_delete_object):
+        mock_get_container.side_effect = [
+            ({}, [{'name': 'a'}, {'name': 'b'}]),
+            ({}, []),
+        ]
+        project_name = self.request.session.get('project_name')
+        request = self.purge_request({'container': 'fakecontainer'})
+
+        response = views.purge_trash(request, project_name)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content), {'deleted': 2, 'failed': 0})
+        self.assertEqual(mock_get_container.call_args[0][2], '.trash-fakecontainer')
+        self.assertEqual([c[1]['container'] for c in mock_delete_object.call_args_list],
+                         ['.trash-fakecontainer'] * 2)
+
+    @patch('storage.views.main.client.delete_object')
+    @patch('storage.views.main.client.get_container')
+    def test_purge_trash_older_than(self, mock_get_container, mock_delete_object):
+        recent = datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S.%f')
+        mock_get_container.side_effect = [
+            ({}, [{'name': 'folder/old', 'last_modified': '2020-01-01T00:00:00.000000'},
+                  {'name': 'folder/new', 'last_modified': recent}]),
+            ({}, []),
+        ]
+        project_name = self.request.session.get('project_name')
+        request = self.purge_request({'container': 'fakecontainer',
+                                      'prefix': 'folder/', 'older_than': 30})
+
+        response = views.purge_trash(request, project_name)
+
+        self.assertEqual(json.loads(response.content), {'deleted': 1, 'failed': 0})
+        self.assertEqual(mock_delete_object.call_args[1]['name'], 'folder/old')
+        self.assertEqual(mock_get_container.call_args[1]['prefix'], 'folder/')
+
+    @patch('requests.Session.post')
+    @patch('storage.views.main.client.get_container')
+    def test_purge_trash_bulk_delete(self, mock_get_container, mock_post):
+        mock_get_container.side_effect = [
+            ({}, [{'name': 'a'}, {'name': 'b'}, {'name': 'c'}]),
+            ({}, []),
+        ]
+        mock_post.return_value = fakes.get_bulk_delete_response(deleted=3)
+        project_name = self.request.session.get('project_name')
+        request = self.purge_request({'container': 'fakecontainer'})
+
+        with patch('storage.views.main.get_info',
+                   Mock(return_value={'bulk_delete': {'max_deletes_per_request': 10}})):
+            response = views.purge_trash(request, project_name)
+
+        self.assertEqual(json.loads(response.content), {'deleted': 3, 'failed': 0})
+        self.assertEqual(mock_post.call_args[1]['data'],
+                         b'.trash-fakecontainer/a\n.trash-fakecontainer/b\n.trash-fakecontainer/c')
+
+    @patch('storage.views.main.client.post_object')
+    @patch('storage.views.main.client.head_object')
+    @patch('storage.views.main.client.get_container')
+    def test_purge_trash_delete_after(self, mock_get_container, mock_head_object,
+                                      mock_post_object):
+        mock_get_container.side_effect = [({}, [{'name': 'a'}]), ({}, [])]
+        mock_head_object.return_value = {'x-object-meta-owner': 'me',
+                                         'content-type': 'text/plain',
+                                         'content-length': '10',
+                                         'x-delete-at': '1700000000'}
+        project_name = self.request.session.get('project_name')
+        request = self.purge_request({'container': 'fakecontainer',
+                                      'delete_after': 86400})
+
+        response = views.purge_trash(request, project_name)
+
+        self.assertEqual(json.loads(response.content), {'expiring': 1, 'failed': 0})
+        args, kargs = mock_post_object.call_args
+        self.assertEqual(args[2:4], ('.trash-fakecontainer', 'a'))
+        self.assertEqual(kargs['headers'], {'x-object-meta-owner': 'me',
+                                            'content-type': 'text/plain',
+                                            'x-delete-after': '86400'})
+
+    def test_purge_trash_bad_parameters(self):
+        project_name = self.request.session.get('project_name')
+
+        for data in ({}, {'container': 'fakecontainer', 'older_than': 'abc'},
+                     {'container': 'fakecontainer', 'delete_after': -1}):
+            response = views.purge_trash(self.purge_request(data), project_name)
+            self.assertEqual(response.status_code, 400)
+
+
+class TestStorageVersionRetention(BaseTestCase):
+
+    def versions(self, name, count, days_ago=0):
+        """Listing entries of count versions of name, archived days_ago."""
+
+        last_modified = (datetime.utcnow() - timedelta(days=days_ago)).strftime(
+            '%Y-%m-%dT%H:%M:%S.%f')
+
+        return [{'name': '{:03x}{}/16000000{:02}.00000'.format(len(name), name, i),
+                 'bytes': 10, 'last_modified': last_modified}
+                for i in range(count)]
+
+    def prune(self, headers, versions, dry_run=True):
+        with patch('storage.views.main.client.head_container',
+                   Mock(return_value=headers)), \
+             patch('storage.views.main.iter_container_objects_parallel',
+                   Mock(return_value=iter(versions))):
+            return views.prune_versions('https://fake.api.globoi.com/v1/AUTH_1',
+                                        'token', None, 'fakecontainer',
+                                        dry_run=dry_run, report=self.expired.append)
+
+    def setUp(self):
+        super().setUp()
+        self.expired = []
+
+    def test_prune_versions_without_policy_lists_nothing(self):
+        with patch('storage.views.main.iter_container_objects_parallel') as mock_list:
+            result = self.prune({'x-versions-location': '_version_fakecontainer'}, [])
+
+        self.assertFalse(mock_list.called)
+        self.assertIsNone(result['keep_last'])
+        self.assertIsNone(result['keep_days'])
+        self.assertEqual(result['expired'], 0)
+
+    def test_prune_versions_keep_last(self):
+        versions = self.versions('a.txt', 4) + self.versions('b.txt', 1)
+        headers = {'x-versions-location': '_version_fakecontainer',
+                   'x-container-meta-versions-keep-last': '2'}
+
+        result = self.prune(headers, versions)
+
+        self.assertEqual(self.expired, versions[:2])
+        self.assertEqual(result['expired'], 2)
+        self.assertEqual(result['bytes'], 20)
+
+    def test_prune_versions_keep_days(self):
+        versions = self.versions('a.txt', 2, days_ago=40) + self.versions('a.txt', 2, days_ago=1)
+        headers = {'x-versions-location': '_version_fakecontainer',
+                   'x-container-meta-versions-keep-days': '30'}
+
+        self.prune(headers, versions)
+
+        self.assertEqual(self.expired, versions[:2])
+
+    def test_prune_versions_keeps_versions_kept_by_any_rule(self):
+        old = self.versions('a.txt', 3, days_ago=40)
+        recent = self.versions('b.txt', 3, days_ago=1)
+        headers = {'x-versions-location': '_version_fakecontainer',
+                   'x-container-meta-versions-keep-last': '1',
+                   'x-container-meta-versions-keep-days': '30'}
+
+        self.prune(headers, old + recent)
+
+        self.assertEqual(self.expired, old[:2])
+
+    def test_prune_versions_ignores_bad_policy(self):
+        headers = {'x-versions-location': '_version_fakecontainer',
+                   'x-container-meta-versions-keep-last': 'abc',
+                   'x-container-meta-versions-keep-days': '-1'}
+
+        result = self.prune(headers, self.versions('a.txt', 3))
+
+        self.assertEqual(result['expired'], 0)
+
+    @patch('storage.views.main._delete_objects')
+    def test_prune_versions_dry_run_deletes_nothing(self, mock_delete):
+        headers = {'x-versions-location': '_version_fakecontainer',
+                   'x-container-meta-versions-keep-last': '1'}
+
+        result = self.prune(headers, self.versions('a.txt', 3))
+
+        self.assertFalse(mock_delete.called)
+        self.assertEqual(result['expired'], 2)
+        self.assertEqual(result['deleted'], 0)
+
+    @patch('storage.views.main._delete_objects')
+    def test_prune_versions_deletes_expired_versions(self, mock_delete):
+        versions = self.versions('a.txt', 3)
+        headers = {'x-versions-location': '_version_fakecontainer',
+                   'x-container-meta-versions-keep-last': '1'}
+        deleted = []
+
+        def delete(storage_url, auth_token, http_conn, container, objects):
+            deleted.extend(objects)
+            return len(deleted), 0
+
+        mock_delete.side_effect = delete
+
+        result = self.prune(headers, versions, dry_run=False)
+
+        self.assertEqual(mock_delete.call_args[0][3], '_version_fakecontainer')
+        self.assertEqual(deleted, versions[:2])
+        self.assertEqual((result['deleted'], result['failed']), (2, 0))
+
+    @patch('storage.views.main.client.post_container')
+    def test_object_versioning_view_sets_retention(self, mock_post_container):
+        self.request.method = 'POST'
+        post = self.request.POST.copy()
+        post.update({'action': 'retention', 'keep_last': '5', 'keep_days': ''})
+        self.request.POST = post
+        project_name = self.request.session.get('project_name')
+
+        views.object_versioning(self.request, project_name, 'fakecontainer')
+
+        self.assertEqual(mock_post_container.call_args[1]['headers'], {
+            'x-container-meta-versions-keep-last': '5',
+            'x-container-meta-versions-keep-days': '',
+        })
+
+    @patch('storage.views.main.client.post_container')
+    def test_object_versioning_view_rejects_bad_retention(self, mock_post_container):
+        self.request.method = 'POST'
+        post = self.request.POST.copy()
+        post.update({'action': 'retention', 'keep_last': 'abc'})
+        self.request.POST = post
+        project_name = self.request.session.get('project_name')
+
+        views.object_versioning(self.request, project_name, 'fakecontainer')
+
+        self.assertFalse(mock_post_container.called)
+
+
+class TestStorageHeadersUpdate(BaseTestCase):
+
+    def update_request(self, data):
+        request = fake_request(method='POST')
+        request._body = json.dumps(data).encode()
+        request.user = self.request.user
+        return request
+
+    @patch('storage.utils.client.post_object')
+    @patch('storage.utils.client.head_object')
+    @patch('storage.views.main.client.get_container')
+    def test_update_headers_under_prefix(self, mock_get_container, mock_head_object,
+                                         mock_post_object):
+        mock_get_container.side_effect = [
+            ({}, [{'name': 'folder/a'}, {'name': 'folder/b'}]),
+            ({}, []),
+        ]
+        mock_head_object.return_value = {'x-object-meta-owner': 'me',
+                                         'content-length': '10'}
+        project_name = self.request.session.get('project_name')
+        request = self.update_request({
+            'container': 'fakecontainer',
+            'prefix': 'folder/',
+            'headers': {'Cache-Control': 'public, max-age=60'},
+        })
+
+        response = views.update_headers(request, project_name)
+
+        self.assertEqual(json.loads(response.content), {'updated': 2, 'failed': 0})
+        self.assertEqual(mock_get_container.call_args_list[0][1]['prefix'], 'folder/')
+        self.assertEqual(sorted(c[0][3] for c in mock_post_object.call_args_list),
+                         ['folder/a', 'folder/b'])
+        self.assertEqual(mock_post_object.call_args[1]['headers'], {
+            'x-object-meta-owner': 'me',
+            'cache-control': 'public, max-age=60',
+        })
+
+    def test_update_headers_bad_parameters(self):
+        project_name = self.request.session.get('project_name')
+
+        for data in ({'headers': {'cache-control': 'no-cache'}},
+                     {'container': 'fakecontainer'},
+                     {'container': 'fakecontainer', 'headers': {'etag': 'abc'}},
+                     {'container': 'fakecontainer', 'headers': {'x-delete-at': 'tomorrow'}}):
+            response = views.update_headers(self.update_request(data), project_name)
+            self.assertEqual(response.status_code, 400)
+
+
+class TestStorageContainerSummary(BaseTestCase):
+
+    def test_container_summary_needs_authentication(self):
+        response = views.container_summary(self.anonymous_request)
+
+        self.assertEqual(response.status_code, 302)
+
+    @patch('storage.views.main.get_current_backup')
+    @patch('storage.views.main.client.head_container')
+    def test_container_summary(self, mock_head_container, mock_get_backup):
+        mock_head_container.return_value = {
+            'x-undelete-enabled': 'True',
+            'x-container-read': '.r:*,.rlistings',
+            'x-container-meta-access-control-allow-origin': 'http://a.com',
+            'x-versions-location': '_version_fakecontainer',
+            'x-container-meta-quota-bytes': '1024',
+            'x-container-object-count': '3',
+            'x-container-bytes-used': '30',
+        }
+        mock_get_backup.return_value = Mock()
+        project_name = self.request.session.get('project_name')
+
+        response = views.container_summary(self.request, project_name, 'fakecontainer')
+
+        self.assertEqual(mock_head_container.call_count, 1)
+        mock_get_backup.assert_called_once_with('fakecontainer', '1')
+        self.assertEqual(json.loads(response.content), {
+            'container': 'fakecontainer',
+            'trash': 'enabled',
+            'acl': 'enabled',
+            'cors': 'http://a.com',
+            'versioning': '_version_fakecontainer',
+            'quota': {'bytes': 1024, 'count': None},
+            'objects': 3,
+            'bytes': 30,
+            'backup': 'enabled',
+        })
+
+    @patch('storage.views.main.get_current_backup')
+    @patch('storage.views.main.client.head_container')
+    def test_container_summary_defaults(self, mock_head_container, mock_get_backup):
+        mock_head_container.return_value = {'x-undelete-enabled': 'False'}
+        mock_get_backup.return_value = None
+        project_name = self.request.session.get('project_name')
+
+        response = views.container_summary(self.request, project_name, 'fakecontainer')
+        computed = json.loads(response.content)
+
+        self.assertEqual(computed['trash'], 'disabled')
+        self.assertEqual(computed['acl'], 'disabled')
+        self.assertEqual(computed['backup'], 'disabled')
+        self.assertIsNone(computed['versioning'])
+
+    @patch('storage.views.main.client.head_container')
+    def test_container_summary_access_denied(self, mock_head_container):
+        mock_head_container.side_effect = client.ClientException('', http_status=403)
+        project_name = self.request.session.get('project_name')
+
+        response = views.container_summary(self.request, project_name, 'fakecontainer')
+
+        self.assertEqual(response.status_code, 500)
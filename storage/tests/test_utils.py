@@ -1,12 +1,26 @@
 # -*- coding: utf-8 -*-
 
+import hmac
+import json
+import threading
 import requests
+import tracemalloc
+from hashlib import sha1
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import patch
 from unittest import TestCase
 
 from swiftclient import client
 
+from django.core.cache import cache
+from django.test.utils import override_settings
+
 from storage import utils
+from storage.connection import SwiftConnectionPool
+from storage.capabilities import SwiftCapabilities
+from storage.listing_cache import ListingCache
+from storage.head_cache import HeadCache
+from storage.middleware import HeadCacheMiddleware
 
 from vault.tests.fakes import fake_request
 from storage.tests import fakes
@@ -14,6 +28,9 @@ from storage.tests import fakes
 
 class TestStorageUtils(TestCase):
 
+    def setUp(self):
+        cache.clear()
+
     def test_remove_duplicates_from_acl(self):
         given = 'projectfake:userfake,projectfake2:userfake2,projectfake:userfake'
         computed = utils.remove_duplicates_from_acl(given)
@@ -34,6 +51,39 @@ class TestStorageUtils(TestCase):
         self.assertIn('projectfake:userfake', computed)
         self.assertIn('projectfake2:userfake2', computed)
 
+    def test_pseudofolder_object_list(self):
+        objects = [
+            {'name': 'folder/a.txt', 'bytes': 1},
+            {'subdir': 'folder/b/'},
+            {'name': 'folder/c/', 'content_type': 'application/directory'},
+            {'name': 'folder/d.txt', 'bytes': 2},
+            {'subdir': 'folder/c/'},
+            {'subdir': 'folder/'},
+        ]
+
+        computed = utils.pseudofolder_object_list(
+            objects, 'folder/', 'https://s3.fakeurl/v1/AUTH_1/container')
+
+        self.assertEqual(list(computed), [
+            {'prefix': 'folder/b/', 'name': 'folder/b/'},
+            {'prefix': 'folder/c/', 'name': 'folder/c/'},
+            {'name': 'folder/a.txt', 'bytes': 1,
+             'public_url': 'https://s3.fakeurl/v1/AUTH_1/container/folder/a.txt'},
+            {'name': 'folder/d.txt', 'bytes': 2,
+             'public_url': 'https://s3.fakeurl/v1/AUTH_1/container/folder/d.txt'},
+        ])
+
+    def test_pseudofolder_object_list_internal_container(self):
+        objects = [{'name': 'a.txt'}, {'name': 'b.txt'}]
+
+        computed = utils.pseudofolder_object_list(
+            objects, None, 'https://s3.fakeurl/v1/AUTH_1/internal_container')
+
+        self.assertEqual([obj['public_url'] for obj in computed], [
+            'https://i.s3.fakeurl/v1/AUTH_1/internal_container/a.txt',
+            'https://i.s3.fakeurl/v1/AUTH_1/internal_container/b.txt',
+        ])
+
     def test_replace_hyphens(self):
         fake_dict = {'content-length': '147', 'content-type': 'application/json'}
         expected = {'content_length': '147', 'content_type': 'application/json'}
@@ -79,6 +129,35 @@ class TestStorageUtils(TestCase):
 
         self.assertIsNone(computed_key)
 
+    @patch('storage.utils.client.get_account')
+    def test_get_temp_key_is_cached_per_account(self, mock_get_account):
+        mock_get_account.return_value = [
+            {'x-account-meta-temp-url-key': 'fakekey'}
+        ]
+
+        first = utils.get_temp_key('http://fakeurl/v1/AUTH_1', 'faketoken', False)
+        second = utils.get_temp_key('http://fakeurl/v1/AUTH_1', 'faketoken', False)
+
+        self.assertEqual(first, 'fakekey')
+        self.assertEqual(second, 'fakekey')
+        self.assertEqual(mock_get_account.call_count, 1)
+
+        utils.get_temp_key('http://fakeurl/v1/AUTH_2', 'faketoken', False)
+        self.assertEqual(mock_get_account.call_count, 2)
+
+    @patch('storage.utils.time.time')
+    def test_get_temp_url(self, mock_time):
+        mock_time.return_value = 1000
+        computed = utils.get_temp_url('http://fakeurl/v1/AUTH_1', 'fakekey',
+                                      'fakecontainer', 'fake object', seconds=60)
+
+        hmac_body = 'GET\n1060\n/v1/AUTH_1/fakecontainer/fake object'
+        signature = hmac.new(b'fakekey', hmac_body.encode(), sha1).hexdigest()
+        expected = ('http://fakeurl/v1/AUTH_1/fakecontainer/fake%20object'
+                    '?temp_url_sig={}&temp_url_expires=1060'.format(signature))
+
+        self.assertEqual(computed, expected)
+
     def test_get_storage_endpoint_urls(self):
         user = fakes.FakeUser(1, 'user')
         request = fake_request(user=user)
@@ -109,3 +188,974 @@ class TestStorageUtils(TestCase):
 
         endpoint = utils.get_storage_endpoint(request, 'internalURL')
         self.assertEqual(endpoint, None)
+
+
+class TestStorageUpload(TestCase):
+
+    def setUp(self):
+        self.mock_info = patch('storage.utils.swift_capabilities.get').start()
+        self.mock_info.return_value = {}
+        self.mock_delete = patch('requests.Session.delete').start()
+
+    def tearDown(self):
+        patch.stopall()
+
+    def deleted_urls(self):
+        return sorted(c[0][0] for c in self.mock_delete.call_args_list)
+
+    @patch('requests.Session.put')
+    def test_upload_object_streams_small_files(self, mock_put):
+        fake_put = fakes.FakeSwiftPut()
+        mock_put.side_effect = fake_put
+        fileobj = fakes.get_temporary_big_file(2 * 1024 * 1024)
+
+        status = utils.upload_object('http://fakeurl/v1/AUTH_1', 'faketoken',
+                                     'fakecontainer', 'big.bin', fileobj,
+                                     'application/octet-stream')
+
+        self.assertEqual(status, 201)
+        self.assertEqual(len(fake_put.calls), 1)
+
+        url, size, _ = fake_put.calls[0]
+        self.assertEqual(url, 'http://fakeurl/v1/AUTH_1/fakecontainer/big.bin')
+        self.assertEqual(size, 2 * 1024 * 1024)
+
+    @override_settings(SWIFT_SLO_THRESHOLD=1024 * 1024,
+                       SWIFT_SLO_SEGMENT_SIZE=1024 * 1024,
+                       SWIFT_SLO_WORKERS=4)
+    def test_upload_object_big_files_as_slo(self):
+        segment_size = 1024 * 1024
+        fake_put = fakes.FakeSwiftPut()
+        fileobj = fakes.get_temporary_big_file(8 * segment_size)
+
+        # The fake replaces Session.put without a mock, which would keep
+        # every segment in its call_args_list
+        with patch('requests.Session.put', new=fake_put):
+            tracemalloc.start()
+            status = utils.upload_object('http://fakeurl/v1/AUTH_1',
+                                         'faketoken', 'fakecontainer',
+                                         'big.bin', fileobj,
+                                         'application/octet-stream')
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+        self.assertEqual(status, 201)
+
+        # segments container + 8 segments + manifest
+        self.assertEqual(len(fake_put.calls), 10)
+        self.assertEqual(fake_put.calls[0][0],
+                         'http://fakeurl/v1/AUTH_1/fakecontainer_segments')
+
+        url, _, manifest = fake_put.calls[-1]
+        self.assertEqual(url, 'http://fakeurl/v1/AUTH_1/fakecontainer/big.bin'
+                              '?multipart-manifest=put')
+
+        manifest = json.loads(manifest)
+        self.assertEqual(len(manifest), 8)
+        for index, segment in enumerate(manifest):
+            self.assertTrue(segment['path'].startswith('/fakecontainer_segments/big.bin/slo/'))
+            self.assertTrue(segment['path'].endswith('/{:08d}'.format(index)))
+            self.assertEqual(segment['size_bytes'], segment_size)
+            self.assertEqual(segment['etag'], 'fakeetag')
+
+        # About one segment in memory per worker
+        self.assertLess(peak, 6 * segment_size)
+        self.assertFalse(self.mock_delete.called)
+
+    @override_settings(SWIFT_SLO_THRESHOLD=1024 * 1024,
+                       SWIFT_SLO_SEGMENT_SIZE=1024 * 1024)
+    @patch('requests.Session.put')
+    def test_upload_slo_sends_up_to_workers_segments_at_once(self, mock_put):
+        for workers in (1, 4):
+            fake_put = fakes.FakeSwiftPut(delay=0.05)
+            mock_put.side_effect = fake_put
+            fileobj = fakes.get_temporary_big_file(8 * 1024 * 1024)
+
+            with override_settings(SWIFT_SLO_WORKERS=workers):
+                status = utils.upload_object('http://fakeurl/v1/AUTH_1',
+                                             'faketoken', 'fakecontainer',
+                                             'big.bin', fileobj,
+                                             'application/octet-stream')
+
+            self.assertEqual(status, 201)
+            self.assertEqual(fake_put.max_running, workers)
+
+    @override_settings(SWIFT_SLO_THRESHOLD=1024 * 1024,
+                       SWIFT_SLO_SEGMENT_SIZE=1024 * 1024,
+                       SWIFT_SLO_WORKERS=1)
+    @patch('requests.Session.put')
+    def test_upload_slo_segment_failure_skips_manifest(self, mock_put):
+        mock_put.side_effect = [
+            fakes.FakeRequestResponse(202, headers={}),
+            fakes.FakeRequestResponse(201, headers={'etag': 'fakeetag'}),
+            fakes.FakeRequestResponse(503, headers={}),
+        ]
+        fileobj = fakes.get_temporary_big_file(2 * 1024 * 1024)
+
+        status = utils.upload_object('http://fakeurl/v1/AUTH_1',
+                                     'faketoken', 'fakecontainer',
+                                     'big.bin', fileobj,
+                                     'application/octet-stream')
+
+        self.assertEqual(status, 503)
+        self.assertEqual(mock_put.call_count, 3)
+
+        # The segment already stored is removed
+        urls = self.deleted_urls()
+        self.assertEqual(len(urls), 1)
+        self.assertTrue(urls[0].endswith('/00000000'))
+
+    @override_settings(SWIFT_SLO_THRESHOLD=1024 * 1024,
+                       SWIFT_SLO_SEGMENT_SIZE=1024 * 1024,
+                       SWIFT_SLO_WORKERS=2)
+    @patch('requests.Session.put')
+    def test_upload_slo_segment_failure_stops_upload(self, mock_put):
+        fake_put = fakes.FakeSwiftPut(fail_segments={1: 503})
+        mock_put.side_effect = fake_put
+        fileobj = fakes.get_temporary_big_file(16 * 1024 * 1024)
+
+        status = utils.upload_object('http://fakeurl/v1/AUTH_1',
+                                     'faketoken', 'fakecontainer',
+                                     'big.bin', fileobj,
+                                     'application/octet-stream')
+
+        self.assertEqual(status, 503)
+
+        # Only the segments submitted before the failure was seen were sent
+        # and no manifest was created
+        segments = [url for url, _, _ in fake_put.calls[1:]]
+        self.assertLessEqual(len(segments), 4)
+        self.assertFalse(any('multipart-manifest' in url for url in segments))
+
+        uploaded = sorted(url for url in segments
+                          if not url.endswith('/00000001'))
+        self.assertEqual(self.deleted_urls(), uploaded)
+
+    @override_settings(SWIFT_SLO_THRESHOLD=1024 * 1024,
+                       SWIFT_SLO_SEGMENT_SIZE=1024 * 1024,
+                       SWIFT_SLO_WORKERS=1)
+    @patch('requests.Session.put')
+    def test_upload_slo_segment_exception(self, mock_put):
+        fake_put = fakes.FakeSwiftPut(
+            fail_segments={2: requests.exceptions.ConnectionError()})
+        mock_put.side_effect = fake_put
+        fileobj = fakes.get_temporary_big_file(4 * 1024 * 1024)
+
+        status = utils.upload_object('http://fakeurl/v1/AUTH_1',
+                                     'faketoken', 'fakecontainer',
+                                     'big.bin', fileobj,
+                                     'application/octet-stream')
+
+        self.assertEqual(status, 500)
+
+        # segments container + segments 0, 1 and 2
+        self.assertEqual(len(fake_put.calls), 4)
+        urls = self.deleted_urls()
+        self.assertEqual(len(urls), 2)
+        self.assertTrue(urls[0].endswith('/00000000'))
+        self.assertTrue(urls[1].endswith('/00000001'))
+
+    @override_settings(SWIFT_SLO_THRESHOLD=1024 * 1024,
+                       SWIFT_SLO_SEGMENT_SIZE=1024 * 1024,
+                       SWIFT_SLO_WORKERS=1)
+    @patch('requests.Session.put')
+    def test_upload_slo_manifest_failure_deletes_segments(self, mock_put):
+        mock_put.side_effect = [
+            fakes.FakeRequestResponse(202, headers={}),
+            fakes.FakeRequestResponse(201, headers={'etag': 'fakeetag'}),
+            fakes.FakeRequestResponse(201, headers={'etag': 'fakeetag'}),
+            fakes.FakeRequestResponse(400, headers={}),
+        ]
+        fileobj = fakes.get_temporary_big_file(2 * 1024 * 1024)
+
+        status = utils.upload_object('http://fakeurl/v1/AUTH_1',
+                                     'faketoken', 'fakecontainer',
+                                     'big.bin', fileobj,
+                                     'application/octet-stream')
+
+        self.assertEqual(status, 400)
+        self.assertEqual(len(self.deleted_urls()), 2)
+
+    @override_settings(SWIFT_SLO_THRESHOLD=1024 * 1024)
+    @patch('requests.Session.put')
+    def test_upload_object_without_slo_support(self, mock_put):
+        self.mock_info.return_value = {'swift': {'max_file_size': 5 * 1024 ** 3}}
+        mock_put.return_value = fakes.FakeRequestResponse(201)
+        fileobj = fakes.get_temporary_big_file(2 * 1024 * 1024)
+
+        status = utils.upload_object('http://fakeurl/v1/AUTH_1', 'faketoken',
+                                     'fakecontainer', 'big.bin', fileobj,
+                                     'application/octet-stream')
+
+        self.assertEqual(status, 201)
+        self.assertEqual(mock_put.call_count, 1)
+
+    @override_settings(SWIFT_SLO_SEGMENT_SIZE=1024 * 1024)
+    @patch('requests.Session.put')
+    def test_upload_slo_follows_cluster_limits(self, mock_put):
+        self.mock_info.return_value = {
+            'swift': {'max_file_size': 4 * 1024 * 1024},
+            'slo': {'max_manifest_segments': 2, 'min_segment_size': 1}}
+        fake_put = fakes.FakeSwiftPut()
+        mock_put.side_effect = fake_put
+        fileobj = fakes.get_temporary_big_file(8 * 1024 * 1024)
+
+        status = utils.upload_object('http://fakeurl/v1/AUTH_1', 'faketoken',
+                                     'fakecontainer', 'big.bin', fileobj,
+                                     'application/octet-stream')
+
+        self.assertEqual(status, 201)
+
+        # Above max_file_size, in 2 segments of 4 MiB
+        manifest = json.loads(fake_put.calls[-1][2])
+        self.assertEqual([s['size_bytes'] for s in manifest],
+                         [4 * 1024 * 1024] * 2)
+
+
+class TestSwiftConnectionPool(TestCase):
+
+    def setUp(self):
+        self.pool = SwiftConnectionPool()
+
+    def tearDown(self):
+        self.pool.close()
+
+    def test_session_is_reused_per_endpoint(self):
+        session = self.pool.session('https://fakeurl/v1/AUTH_1')
+
+        self.assertIs(session, self.pool.session('https://fakeurl/v1/AUTH_2/container'))
+        self.assertIsNot(session, self.pool.session('https://otherurl/v1/AUTH_1'))
+        self.assertIsNot(session, self.pool.session('http://fakeurl/v1/AUTH_1'))
+
+    @override_settings(SWIFT_POOL_MAXSIZE=7)
+    def test_session_pool_size(self):
+        session = self.pool.session('https://fakeurl/v1/AUTH_1')
+        adapter = session.get_adapter('https://fakeurl/v1/AUTH_1')
+
+        self.assertEqual(adapter._pool_maxsize, 7)
+
+    @override_settings(SWIFT_POOL_IDLE_TIMEOUT=50)
+    @patch('storage.connection.time.monotonic')
+    def test_idle_session_is_recycled(self, mock_monotonic):
+        mock_monotonic.return_value = 100
+        session = self.pool.session('https://fakeurl/v1/AUTH_1')
+
+        mock_monotonic.return_value = 140
+        self.assertIs(session, self.pool.session('https://fakeurl/v1/AUTH_1'))
+
+        with patch.object(session, 'close') as mock_close:
+            mock_monotonic.return_value = 200
+            new_session = self.pool.session('https://fakeurl/v1/AUTH_1')
+
+        mock_close.assert_called_once()
+        self.assertIsNot(session, new_session)
+
+    def test_http_connection_uses_pooled_session(self):
+        url = 'https://fakeurl/v1/AUTH_1'
+        parsed_url, conn = self.pool.http_connection(url, timeout=5)
+
+        self.assertIsInstance(conn, client.HTTPConnection)
+        self.assertEqual(parsed_url.netloc, 'fakeurl')
+        self.assertEqual(conn.requests_args['timeout'], 5)
+        self.assertIs(conn.request_session, self.pool.session(url))
+
+    def test_http_connection_is_not_shared_between_calls(self):
+        url = 'https://fakeurl/v1/AUTH_1'
+        _, conn1 = self.pool.http_connection(url)
+        _, conn2 = self.pool.http_connection(url)
+
+        self.assertIsNot(conn1, conn2)
+        self.assertIs(conn1.request_session, conn2.request_session)
+
+    def test_session_is_thread_safe(self):
+        sessions = []
+
+        def get_session():
+            sessions.append(self.pool.session('https://fakeurl/v1/AUTH_1'))
+
+        threads = [threading.Thread(target=get_session) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(set(map(id, sessions))), 1)
+
+
+class TestStorageBulkDelete(TestCase):
+
+    storage_url = 'https://fakeurl/v1/AUTH_1'
+
+    @patch('storage.utils.client.get_container')
+    def test_iter_container_objects_pages_with_markers(self, mock_get_container):
+        mock_get_container.side_effect = [
+            ({}, [{'name': 'a'}, {'name': 'b'}]),
+            ({}, [{'name': 'c'}]),
+            ({}, []),
+        ]
+
+        objects = utils.iter_container_objects(self.storage_url, 'token',
+                                               'container', None)
+
+        self.assertEqual([o['name'] for o in objects], ['a', 'b', 'c'])
+
+        markers = [c[1]['marker'] for c in mock_get_container.call_args_list]
+        self.assertEqual(markers, [None, 'b', 'c'])
+
+    @patch('storage.utils.client.get_container')
+    def test_iter_container_objects_stops_when_page_repeats(self, mock_get_container):
+        mock_get_container.return_value = ({}, [{'name': 'a'}])
+
+        objects = utils.iter_container_objects(self.storage_url, 'token',
+                                               'container', None)
+
+        self.assertEqual([o['name'] for o in objects], ['a'])
+        self.assertEqual(mock_get_container.call_count, 2)
+
+    @override_settings(SWIFT_BULK_DELETE_WORKERS=3)
+    @patch('requests.Session.post')
+    def test_bulk_delete_sends_concurrent_batches(self, mock_post):
+        fake_post = fakes.FakeBulkDelete(delay=0.02)
+        mock_post.side_effect = fake_post
+        names = ('container/obj{}'.format(i).encode() for i in range(95))
+
+        result = utils.bulk_delete(self.storage_url, 'token', names, 10)
+
+        self.assertEqual(result, {'deleted': 95, 'not_found': 0, 'failed': 0})
+        self.assertEqual(len(fake_post.calls), 10)
+        self.assertEqual(sorted(len(c) for c in fake_post.calls), [5] + [10] * 9)
+        self.assertLessEqual(fake_post.max_running, 3)
+        self.assertGreater(fake_post.max_running, 1)
+
+        _, kwargs = mock_post.call_args
+        self.assertEqual(kwargs['headers']['Accept'], 'application/json')
+
+    @override_settings(SWIFT_BULK_DELETE_WORKERS=1)
+    @patch('requests.Session.post')
+    def test_bulk_delete_reads_token_for_each_batch(self, mock_post):
+        mock_post.side_effect = fakes.FakeBulkDelete()
+        tokens = iter(['token1', 'token2', 'token3'])
+        names = ['container/obj{}'.format(i).encode() for i in range(25)]
+
+        utils.bulk_delete(self.storage_url, lambda: next(tokens), names, 10)
+
+        sent = [c[1]['headers']['X-Auth-Token'] for c in mock_post.call_args_list]
+        self.assertEqual(sent, ['token1', 'token2', 'token3'])
+
+    @patch('storage.utils.time.sleep')
+    @patch('requests.Session.post')
+    def test_bulk_delete_retries_failed_names(self, mock_post, mock_sleep):
+        fake_post = fakes.FakeBulkDelete(fail_once=[b'container/obj3'])
+        mock_post.side_effect = fake_post
+        names = ['container/obj{}'.format(i).encode() for i in range(5)]
+
+        result = utils.bulk_delete(self.storage_url, 'token', names, 10)
+
+        self.assertEqual(result, {'deleted': 5, 'not_found': 0, 'failed': 0})
+        self.assertEqual(fake_post.calls[1], [b'container/obj3'])
+
+    @override_settings(SWIFT_BULK_DELETE_RETRIES=2)
+    @patch('storage.utils.time.sleep')
+    @patch('requests.Session.post')
+    def test_bulk_delete_gives_up_after_retries(self, mock_post, mock_sleep):
+        mock_post.return_value = fakes.FakeRequestResponse(503)
+        names = [b'container/obj1', b'container/obj2']
+
+        result = utils.bulk_delete(self.storage_url, 'token', names, 10)
+
+        self.assertEqual(result, {'deleted': 0, 'not_found': 0, 'failed': 2})
+        self.assertEqual(mock_post.call_count, 3)
+
+    @patch('requests.Session.post')
+    def test_bulk_delete_does_not_retry_permanent_errors(self, mock_post):
+        mock_post.return_value = fakes.get_bulk_delete_response(
+            deleted=1, errors=[['/container/obj2', '401 Unauthorized']])
+        names = [b'container/obj1', b'container/obj2']
+
+        result = utils.bulk_delete(self.storage_url, 'token', names, 10)
+
+        self.assertEqual(result, {'deleted': 1, 'not_found': 0, 'failed': 1})
+        self.assertEqual(mock_post.call_count, 1)
+
+    @override_settings(SWIFT_BULK_DELETE_WORKERS=2)
+    def test_bulk_delete_memory_does_not_grow_with_listing(self):
+        total = 200000
+        names = ('container/object-name-{:012d}'.format(i).encode()
+                 for i in range(total))
+
+        # The fake replaces Session.post without a mock, which would keep
+        # every batch in its call_args_list
+        with patch('requests.Session.post', new=fakes.FakeBulkDelete(record=False)):
+            tracemalloc.start()
+            result = utils.bulk_delete(self.storage_url, 'token', names, 1000)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+        self.assertEqual(result['deleted'], total)
+
+        # A few batches in memory, far from the whole listing (~14 MB)
+        self.assertLess(peak, 2 * 1024 * 1024)
+
+
+class TestSwiftCapabilities(TestCase):
+
+    storage_url = 'https://fakeurl/v1/AUTH_1'
+
+    def setUp(self):
+        self.capabilities = SwiftCapabilities()
+
+    @patch('requests.Session.get')
+    def test_get_fetches_info_once(self, mock_get):
+        mock_get.return_value = fakes.FakeRequestResponse(200)
+        mock_get.return_value.text = json.dumps({'slo': {}})
+
+        self.assertEqual(self.capabilities.get(self.storage_url), {'slo': {}})
+        self.assertEqual(self.capabilities.get('https://fakeurl/v1/AUTH_2'), {'slo': {}})
+
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertEqual(mock_get.call_args[0][0], 'https://fakeurl/info')
+
+    @override_settings(SWIFT_INFO_CACHE_TIME=60)
+    @patch('storage.capabilities.threading.Thread')
+    @patch('storage.capabilities.time.monotonic')
+    @patch('requests.Session.get')
+    def test_get_refreshes_expired_info_in_background(self, mock_get,
+                                                      mock_monotonic,
+                                                      mock_thread):
+        mock_get.return_value = fakes.FakeRequestResponse(200)
+        mock_get.return_value.text = json.dumps({'slo': {}})
+        mock_monotonic.return_value = 100
+        self.capabilities.get(self.storage_url)
+
+        mock_monotonic.return_value = 200
+        mock_get.return_value.text = json.dumps({'tempurl': {}})
+
+        # The expired entry is still returned while refreshed
+        self.assertEqual(self.capabilities.get(self.storage_url), {'slo': {}})
+        self.assertEqual(self.capabilities.get(self.storage_url), {'slo': {}})
+        self.assertEqual(mock_thread.call_count, 1)
+
+        _, kwargs = mock_thread.call_args
+        kwargs['target'](*kwargs['args'])
+
+        self.assertEqual(self.capabilities.get(self.storage_url), {'tempurl': {}})
+        self.assertEqual(mock_get.call_count, 2)
+
+    @patch('requests.Session.get')
+    def test_get_falls_back_when_info_is_unreachable(self, mock_get):
+        mock_get.side_effect = requests.exceptions.ConnectionError()
+
+        self.assertEqual(self.capabilities.get(self.storage_url), {})
+
+        # Not fetched again before retry_time
+        self.assertEqual(self.capabilities.get(self.storage_url), {})
+        self.assertEqual(mock_get.call_count, 1)
+
+    @patch('storage.capabilities.time.monotonic')
+    @patch('requests.Session.get')
+    def test_refresh_failure_keeps_last_known_info(self, mock_get, mock_monotonic):
+        mock_get.return_value = fakes.FakeRequestResponse(200)
+        mock_get.return_value.text = json.dumps({'slo': {}})
+        mock_monotonic.return_value = 100
+        info_url = 'https://fakeurl/info'
+        self.capabilities._refresh(info_url)
+
+        mock_get.side_effect = requests.exceptions.ConnectionError()
+
+        self.assertEqual(self.capabilities._refresh(info_url), {'slo': {}})
+        self.assertEqual(self.capabilities.get(self.storage_url), {'slo': {}})
+
+
+class FakeAccountListing:
+    """Fake account listing that honors marker, end_marker and limit"""
+
+    def __init__(self, names):
+        self.names = sorted(names)
+        self.calls = []
+
+    def __call__(self, storage_url, auth_token, full_listing=False,
+                 http_conn=None, limit=None, marker=None, end_marker=None):
+        self.calls.append((marker, end_marker, limit))
+        names = [n for n in self.names
+                 if (marker is None or n > marker)
+                 if (end_marker is None or n < end_marker)]
+
+        return ({'x-account-container-count': str(len(self.names))},
+                [{'name': n, 'count': 0, 'bytes': 0} for n in names[:limit]])
+
+
+class TestStorageVisibleContainers(TestCase):
+
+    def setUp(self):
+        self.hide_prefixes = override_settings(
+            SWIFT_HIDE_PREFIXES=['_version_', '.trash'])
+        self.hide_prefixes.enable()
+        cache.clear()
+        hidden = ['_version_{:04}'.format(i) for i in range(1000)]
+        hidden += ['.trash-{:04}'.format(i) for i in range(1000)]
+        self.visible = ['container{:03}'.format(i) for i in range(120)]
+        self.visible += ['A-container', 'Z-container']
+        self.listing = FakeAccountListing(hidden + self.visible)
+
+    def tearDown(self):
+        self.hide_prefixes.disable()
+
+    def list_pages(self, limit):
+        pages, marker = [], None
+
+        while True:
+            _, containers = utils.get_visible_containers(
+                'http://fakeurl', 'faketoken', None, limit, marker=marker)
+            pages.append([c['name'] for c in containers])
+            if len(containers) < limit:
+                return pages
+            marker = containers[-1]['name']
+
+    def test_pages_are_full_of_visible_containers(self):
+        with patch('storage.utils.client.get_account', self.listing):
+            pages = self.list_pages(50)
+
+        self.assertEqual([len(page) for page in pages], [50, 50, 22])
+        self.assertEqual(sum(pages, []), sorted(self.visible))
+
+    def test_hidden_containers_are_not_listed_from_swift(self):
+        with patch('storage.utils.client.get_account', self.listing):
+            utils.get_visible_containers('http://fakeurl', 'faketoken',
+                                         None, 50)
+
+        self.assertEqual(self.listing.calls, [
+            (None, '.trash', 50),
+            ('.trash\U0010ffff', '_version_', 50),
+            ('_version_\U0010ffff', None, 48),
+        ])
+
+    def test_marker_inside_hidden_range(self):
+        with patch('storage.utils.client.get_account', self.listing):
+            _, containers = utils.get_visible_containers(
+                'http://fakeurl', 'faketoken', None, 2,
+                marker='_version_0010')
+
+        self.assertEqual([c['name'] for c in containers],
+                         ['container000', 'container001'])
+        self.assertEqual(self.listing.calls, [('_version_\U0010ffff', None, 2)])
+
+    @override_settings(SWIFT_HIDE_PREFIXES=['.', '.trash'])
+    def test_nested_hidden_prefixes(self):
+        self.assertEqual(utils._hidden_prefixes(), ['.'])
+
+    @patch('storage.utils.client.get_account')
+    def test_listing_that_does_not_move_forward_ends(self, mock_get_account):
+        mock_get_account.return_value = fakes.get_account()
+
+        _, containers = utils.get_visible_containers(
+            'http://fakeurl', 'faketoken', None, 50)
+
+        self.assertEqual([c['name'] for c in containers],
+                         ['container1', 'container2', 'container3'])
+        self.assertEqual(mock_get_account.call_count, 3)
+
+
+class TestListingCache(TestCase):
+
+    storage_url = 'https://fakeurl/v1/AUTH_1'
+
+    def setUp(self):
+        cache.clear()
+        self.listing_cache = ListingCache()
+
+    def get_container(self, **kwargs):
+        return self.listing_cache.get_container(
+            self.storage_url, 'faketoken', 'container', None, **kwargs)
+
+    @patch('storage.listing_cache.client.get_container')
+    def test_hit_skips_swift(self, mock_get_container):
+        mock_get_container.return_value = fakes.get_container()
+
+        first = self.get_container(prefix='folder/', marker=None, limit=50)
+        second = self.get_container(prefix='folder/', marker=None, limit=50)
+
+        self.assertEqual(first, second)
+        self.assertEqual(mock_get_container.call_count, 1)
+        self.assertEqual(self.listing_cache.stats(),
+                         {'hits': 1, 'misses': 1, 'hit_rate': 0.5})
+
+    @patch('storage.listing_cache.client.get_container')
+    def test_key_has_listing_arguments(self, mock_get_container):
+        mock_get_container.return_value = fakes.get_container()
+
+        self.get_container(prefix='folder/', marker=None, limit=50)
+        self.get_container(prefix='folder/', marker='obj', limit=50)
+        self.get_container(prefix='other/', marker=None, limit=50)
+
+        self.assertEqual(mock_get_container.call_count, 3)
+
+    @patch('storage.listing_cache.client.get_account')
+    @patch('storage.listing_cache.client.get_container')
+    def test_invalidate_container(self, mock_get_container, mock_get_account):
+        mock_get_container.return_value = fakes.get_container()
+        mock_get_account.return_value = fakes.get_account()
+
+        self.get_container(limit=50)
+        self.listing_cache.get_account(self.storage_url, 'faketoken', None,
+                                       limit=50)
+        self.listing_cache.invalidate(self.storage_url, 'container')
+        self.get_container(limit=50)
+        self.listing_cache.get_account(self.storage_url, 'faketoken', None,
+                                       limit=50)
+
+        self.assertEqual(mock_get_container.call_count, 2)
+        self.assertEqual(mock_get_account.call_count, 2)
+
+    @patch('storage.listing_cache.client.get_account')
+    @patch('storage.listing_cache.client.get_container')
+    def test_bypass_reads_from_swift(self, mock_get_container, mock_get_account):
+        mock_get_container.return_value = fakes.get_container()
+        mock_get_account.return_value = fakes.get_account()
+
+        self.listing_cache.bypass(self.storage_url, 'container', 60)
+        for _ in range(2):
+            self.get_container(limit=50)
+            self.listing_cache.get_account(self.storage_url, 'faketoken',
+                                           None, limit=50)
+
+        self.assertEqual(mock_get_container.call_count, 2)
+        self.assertEqual(mock_get_account.call_count, 2)
+
+        # Other containers are still cached
+        for _ in range(2):
+            self.listing_cache.get_container(self.storage_url, 'faketoken',
+                                             'other', None, limit=50)
+
+        self.assertEqual(mock_get_container.call_count, 3)
+
+    @patch('storage.listing_cache.client.get_container')
+    def test_invalidate_account_keeps_container_listings(self, mock_get_container):
+        mock_get_container.return_value = fakes.get_container()
+
+        self.get_container(limit=50)
+        self.listing_cache.invalidate(self.storage_url)
+        self.get_container(limit=50)
+
+        self.assertEqual(mock_get_container.call_count, 1)
+
+    @patch('storage.listing_cache.client.get_container')
+    def test_errors_are_not_cached(self, mock_get_container):
+        mock_get_container.side_effect = [client.ClientException(''),
+                                          fakes.get_container()]
+
+        with self.assertRaises(client.ClientException):
+            self.get_container(limit=50)
+
+        self.assertEqual(self.get_container(limit=50), fakes.get_container())
+
+    @override_settings(SWIFT_LISTING_CACHE_TIME=0)
+    @patch('storage.listing_cache.client.get_container')
+    def test_disabled(self, mock_get_container):
+        mock_get_container.return_value = fakes.get_container()
+
+        self.get_container(limit=50)
+        self.get_container(limit=50)
+
+        self.assertEqual(mock_get_container.call_count, 2)
+
+
+class TestStorageParallelListing(TestCase):
+
+    storage_url = 'https://fakeurl/v1/AUTH_1'
+
+    def setUp(self):
+        self.workers = override_settings(SWIFT_LISTING_WORKERS=4)
+        self.workers.enable()
+
+        self.names = ['{}/obj{:05}'.format(folder, i)
+                      for folder in ('a', 'b', 'logs', 'x') for i in range(2500)]
+        self.listing = fakes.FakeContainerListing(self.names, page_size=100)
+
+        patch('storage.utils.client.get_container', self.listing).start()
+        patch('storage.utils.swift_capabilities.get',
+              return_value={'swift': {'container_listing_limit': 100}}).start()
+
+    def tearDown(self):
+        patch.stopall()
+        self.workers.disable()
+
+    def list(self, **kwargs):
+        return [obj['name'] for obj in utils.iter_container_objects_parallel(
+            self.storage_url, 'token', 'container', None, **kwargs)]
+
+    def test_ordered(self):
+        self.assertEqual(self.list(), self.names)
+
+    def test_unordered(self):
+        names = self.list(ordered=False)
+
+        self.assertEqual(len(names), len(self.names))
+        self.assertEqual(sorted(names), self.names)
+
+    def test_prefix(self):
+        expected = [n for n in self.names if n.startswith('logs/')]
+
+        self.assertEqual(self.list(prefix='logs/'), expected)
+
+    def test_small_container_is_listed_page_by_page(self):
+        self.listing.names = self.names[:50]
+
+        self.assertEqual(self.list(), self.names[:50])
+        self.assertEqual(self.listing.calls, 2)
+
+    def test_listing_error(self):
+        def get_container(*args, **kwargs):
+            if kwargs.get('end_marker') is not None:
+                raise client.ClientException('')
+            return self.listing(*args, **kwargs)
+
+        with patch('storage.utils.client.get_container', get_container):
+            with self.assertRaises(client.ClientException):
+                self.list()
+
+    def test_stops_listing_when_closed(self):
+        self.list()
+        full_listing_calls = self.listing.calls
+        self.listing.calls = 0
+
+        closed = threading.Event()
+        late_calls = []
+        executors = []
+
+        def get_container(*args, **kwargs):
+            if closed.is_set():
+                late_calls.append(kwargs.get('marker'))
+            return self.listing(*args, **kwargs)
+
+        class Executor(ThreadPoolExecutor):
+            def __init__(self, *args, **kwargs):
+                super(Executor, self).__init__(*args, **kwargs)
+                executors.append(self)
+
+        with patch('storage.utils.client.get_container', get_container), \
+             patch('storage.utils.ThreadPoolExecutor', Executor):
+            objects = utils.iter_container_objects_parallel(
+                self.storage_url, 'token', 'container', None)
+
+            for _ in range(150):
+                next(objects)
+            objects.close()
+            closed.set()
+
+            # Waits for the listing threads to end
+            executors[0].shutdown(wait=True)
+
+        # At most the page each thread was fetching when closed
+        self.assertLessEqual(len(late_calls), 4)
+        self.assertLess(self.listing.calls, full_listing_calls)
+
+
+class TestStorageBulkHeaders(TestCase):
+
+    storage_url = 'https://fakeurl/v1/AUTH_1'
+
+    current = {
+        'content-length': '10',
+        'etag': 'abc',
+        'content-type': 'text/plain',
+        'x-object-meta-owner': 'me',
+        'x-object-meta-old': 'yes',
+        'x-delete-at': '1700000000',
+    }
+
+    @patch('storage.utils.client.post_object')
+    @patch('storage.utils.client.head_object')
+    def test_update_keeps_current_headers(self, mock_head, mock_post):
+        mock_head.return_value = dict(self.current)
+
+        utils.update_object_headers(self.storage_url, 'token', 'container', 'obj', {
+            'cache-control': 'public, max-age=60',
+            'x-object-meta-old': '',
+        })
+
+        self.assertEqual(mock_post.call_args[1]['headers'], {
+            'content-type': 'text/plain',
+            'x-object-meta-owner': 'me',
+            'x-delete-at': '1700000000',
+            'cache-control': 'public, max-age=60',
+        })
+
+    @patch('storage.utils.client.post_object')
+    @patch('storage.utils.client.head_object')
+    def test_delete_after_replaces_delete_at(self, mock_head, mock_post):
+        mock_head.return_value = dict(self.current)
+
+        utils.update_object_headers(self.storage_url, 'token', 'container', 'obj',
+                                    {'x-delete-after': '3600'})
+
+        headers = mock_post.call_args[1]['headers']
+        self.assertNotIn('x-delete-at', headers)
+        self.assertEqual(headers['x-delete-after'], '3600')
+
+    @patch('storage.utils.time.sleep')
+    @patch('storage.utils.client.post_object')
+    @patch('storage.utils.client.head_object')
+    def test_update_retries_transient_errors(self, mock_head, mock_post, mock_sleep):
+        mock_head.return_value = {}
+        mock_post.side_effect = [client.ClientException('', http_status=503), None]
+
+        utils.update_object_headers(self.storage_url, 'token', 'container', 'obj',
+                                    {'cache-control': 'no-cache'})
+
+        self.assertEqual(mock_head.call_count, 2)
+        self.assertEqual(mock_post.call_count, 2)
+
+    @patch('storage.utils.client.post_object')
+    @patch('storage.utils.client.head_object')
+    def test_update_does_not_retry_permanent_errors(self, mock_head, mock_post):
+        mock_head.side_effect = client.ClientException('', http_status=404)
+
+        with self.assertRaises(client.ClientException):
+            utils.update_object_headers(self.storage_url, 'token', 'container',
+                                        'obj', {'cache-control': 'no-cache'})
+
+        self.assertEqual(mock_head.call_count, 1)
+        self.assertFalse(mock_post.called)
+
+    @override_settings(SWIFT_HEADER_UPDATE_WORKERS=3)
+    @patch('storage.utils.client.head_object')
+    def test_bulk_update_headers_is_concurrent(self, mock_head):
+        mock_head.return_value = {}
+        fake_post = fakes.FakeObjectPost(delay=0.01, fail=['obj7'])
+        names = ('obj{}'.format(i) for i in range(30))
+        progress = []
+
+        with patch('storage.utils.client.post_object', fake_post):
+            result = utils.bulk_update_headers(self.storage_url, 'token',
+                'container', names, {'cache-control': 'no-cache'},
+                lambda updated, failed: progress.append((updated, failed)))
+
+        self.assertEqual(result, {'updated': 29, 'failed': 1})
+        self.assertEqual(len(fake_post.headers), 29)
+        self.assertEqual(sorted(progress), [(0, 1)] + [(1, 0)] * 29)
+        self.assertLessEqual(fake_post.max_running, 3)
+        self.assertGreater(fake_post.max_running, 1)
+
+
+class TestHeadCache(TestCase):
+
+    storage_url = 'https://fakeurl/v1/AUTH_1'
+
+    def setUp(self):
+        self.head_cache = HeadCache()
+        self.head_cache.start()
+
+    def tearDown(self):
+        self.head_cache.stop()
+
+    @patch('storage.head_cache.client.head_container')
+    def test_repeated_head_is_served_from_memory(self, mock_head_container):
+        mock_head_container.return_value = {'x-container-read': '.r:*'}
+
+        first = self.head_cache.head_container(self.storage_url, 'token', 'container')
+        first['x-container-read'] = ''
+        second = self.head_cache.head_container(self.storage_url, 'token',
+                                                'container', http_conn=None)
+
+        self.assertEqual(second, {'x-container-read': '.r:*'})
+        self.assertEqual(mock_head_container.call_count, 1)
+
+    @patch('storage.head_cache.client.head_container')
+    def test_not_started(self, mock_head_container):
+        mock_head_container.return_value = {}
+        self.head_cache.stop()
+
+        self.head_cache.head_container(self.storage_url, 'token', 'container')
+        self.head_cache.head_container(self.storage_url, 'token', 'container')
+
+        self.assertEqual(mock_head_container.call_count, 2)
+
+    @patch('storage.head_cache.client.head_object')
+    def test_errors_are_not_cached(self, mock_head_object):
+        mock_head_object.side_effect = [client.ClientException('', http_status=404), {}]
+
+        with self.assertRaises(client.ClientException):
+            self.head_cache.head_object(self.storage_url, 'token', 'container', 'obj')
+
+        self.assertEqual(self.head_cache.head_object(
+            self.storage_url, 'token', 'container', 'obj'), {})
+
+    @patch('storage.head_cache.client.post_container')
+    @patch('storage.head_cache.client.head_container')
+    def test_container_post_updates_cached_head(self, mock_head_container,
+                                                mock_post_container):
+        mock_head_container.return_value = {
+            'x-container-read': '.r:*',
+            'x-container-meta-owner': 'me',
+            'x-versions-location': '_version_container',
+        }
+        self.head_cache.head_container(self.storage_url, 'token', 'container')
+
+        self.head_cache.post_container(self.storage_url, 'token', 'container',
+            headers={'X-Container-Read': '', 'X-Container-Write': 'p:u',
+                     'X-Remove-Container-Meta-Owner': 'x',
+                     'X-Storage-Token': 'token'})
+
+        self.assertEqual(
+            self.head_cache.head_container(self.storage_url, 'token', 'container'),
+            {'x-container-write': 'p:u', 'x-versions-location': '_version_container'})
+        self.assertEqual(mock_head_container.call_count, 1)
+        self.assertEqual(mock_post_container.call_args[1]['headers']['X-Container-Read'], '')
+
+    @patch('storage.head_cache.client.delete_object')
+    @patch('storage.head_cache.client.head_object')
+    @patch('storage.head_cache.client.head_container')
+    def test_object_writes_drop_cached_heads(self, mock_head_container,
+                                             mock_head_object, mock_delete_object):
+        mock_head_container.return_value = {}
+        mock_head_object.return_value = {}
+
+        for name in ('a', 'b'):
+            self.head_cache.head_object(self.storage_url, 'token', 'container', name)
+        self.head_cache.head_container(self.storage_url, 'token', 'container')
+
+        self.head_cache.delete_object(self.storage_url, token='token',
+                                      container='container', name='a')
+
+        for name in ('a', 'b'):
+            self.head_cache.head_object(self.storage_url, 'token', 'container', name)
+        self.head_cache.head_container(self.storage_url, 'token', 'container')
+
+        self.assertEqual(mock_head_object.call_count, 3)
+        self.assertEqual(mock_head_container.call_count, 2)
+        mock_delete_object.assert_called_once_with(
+            self.storage_url, token='token', container='container', name='a')
+
+    @patch('storage.head_cache.client.head_container')
+    def test_cache_is_per_thread(self, mock_head_container):
+        mock_head_container.return_value = {}
+        self.head_cache.head_container(self.storage_url, 'token', 'container')
+
+        thread = threading.Thread(target=self.head_cache.head_container,
+                                  args=(self.storage_url, 'token', 'container'))
+        thread.start()
+        thread.join()
+
+        self.assertEqual(mock_head_container.call_count, 2)
+
+    @patch('storage.head_cache.client.head_container')
+    def test_middleware_scopes_cache_to_request(self, mock_head_container):
+        mock_head_container.return_value = {
+            'x-container-read': '.r:*',
+            'x-container-meta-access-control-allow-origin': 'http://a.com',
+        }
+
+        def view(request):
+            return (utils.get_acls(self.storage_url, 'token', 'container', None),
+                    utils.get_cors(self.storage_url, 'token', 'container', None))
+
+        middleware = HeadCacheMiddleware(view)
+
+        self.assertEqual(middleware(fake_request()), (('.r:*', ''), 'http://a.com'))
+        self.assertEqual(mock_head_container.call_count, 1)
+
+        middleware(fake_request())
+        self.assertEqual(mock_head_container.call_count, 2)
+
+        utils.get_cors(self.storage_url, 'token', 'container', None)
+        self.assertEqual(mock_head_container.call_count, 3)
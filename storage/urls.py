@@ -20,6 +20,9 @@ urlpatterns = [
     re_path(r'^acl-container-update/(?P<container>.+?)$', views.container_acl_update, name="container_acl_update"),
     re_path(r'^acl-container-status/(?P<container>.+?)$', views.container_acl_status, name="container_acl_status"),
 
+    # Trash, ACL, CORS, versioning, quota and backup status at once
+    re_path(r'^container-summary/(?P<container>.+?)$', views.container_summary, name="container_summary"),
+
     # Cache
     re_path(r'^cache/?$', views.storage_cache, name="storage_cache"),
     re_path(r'^cache/remove/?$', views.remove_from_cache, name="remove_from_cache"),
@@ -27,7 +30,9 @@ urlpatterns = [
 
     # Trash
     re_path(r'^trash/restore/', views.restore_object, name="restore_object"),
+    re_path(r'^trash/restore-batch/?$', views.restore_objects, name="restore_objects"),
     re_path(r'^trash/remove/', views.remove_from_trash, name="remove_from_trash"),
+    re_path(r'^trash/purge/?$', views.purge_trash, name="purge_trash"),
     re_path(r'^trash/(?P<container>.+?)/(?P<prefix>(.+)+)?$', views.get_deleted_objects, name="deleted_objects"),
 
     # Storage urls
@@ -49,7 +54,14 @@ urlpatterns = [
     re_path(r'^custom-metadata/(?P<container>.+?)/(?P<objectname>.+?)?$', views.edit_custom_metadata, name="edit_custom_metadata"),
     re_path(r'^cache-control/(?P<container>.+?)/(?P<objectname>.+?)?$', views.cache_control, name="cache_control"),
     re_path(r'^versioning/(?P<container>.+?)/(?P<prefix>(.+)+)?$', views.object_versioning, name="object_versioning"),
+    re_path(r'^versions/(?P<container>.+?)/(?P<objectname>.+?)$', views.object_history, name="object_history"),
     re_path(r'^optional-headers/(?P<container>.+?)/(?P<objectname>.+?)?$', views.optional_headers, name="optional_headers"),
+    re_path(r'^update-headers/?$', views.update_headers, name="update_headers"),
+    # Jobs
+    re_path(r'^jobs/?$', views.storage_jobs, name="storage_jobs"),
+    re_path(r'^jobs/(?P<job_id>\d+)/?$', views.storage_job, name="storage_job"),
+    re_path(r'^jobs/(?P<job_id>\d+)/cancel/?$', views.storage_job_cancel, name="storage_job_cancel"),
+
     # API
     re_path(r'^api/info$', views.info_json, name="info_json"),
     re_path(r'^api/backup-list/?', views.container_backup_list, name="container_backup_list"),
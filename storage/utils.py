@@ -3,22 +3,43 @@
 
 """ Standalone webinterface for Openstack Swift. """
 
+import os
 import re
+import hmac
+import json
+import math
+import time
 import string
 import random
 import logging
+import threading
+import requests
 
-from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from queue import Queue, Full
+import hashlib
+from urllib.parse import urlparse, quote, unquote
 
 from django.conf import settings
 from django.contrib import messages
+from django.core.cache import cache
 from django.utils.translation import gettext
 
 from swiftclient import client
 from identity.keystone import KeystoneNoRequest
+from storage.connection import swift_pool
+from storage.capabilities import swift_capabilities
+from storage.listing_cache import listing_cache
+from storage.head_cache import head_cache
 
 log = logging.getLogger(__name__)
 
+# Rackspace Cloudfiles uses application/directory
+# Cyberduck uses application/x-directory
+_DIRECTORY_CONTENT_TYPES = ('application/directory', 'application/x-directory')
+
+_INTERNAL_CONTAINER = re.compile('^internal_.+')
+
 
 def get_storage_endpoint(request, endpoint_type):
     """
@@ -61,6 +82,12 @@ def get_token_id(request):
     return request.session.get('auth_token')
 
 
+def current_token(auth_token):
+    """ Returns auth_token, or what it returns when it's a function. Storage
+    jobs pass a function, so their requests always use an unexpired token. """
+    return auth_token() if callable(auth_token) else auth_token
+
+
 def replace_hyphens(olddict):
     """ Replaces all hyphens in dict keys with an underscore.
 
@@ -87,42 +114,47 @@ def prefix_list(prefix):
 
 
 def pseudofolder_object_list(objects, prefix, public_url):
-    pseudofolders = []
-    objs = []
-    duplist = []
+    """ Yields the pseudofolders of a delimiter listing, then its objects
+    with their public URL set. objects is read twice, so it must be a list,
+    like the listings returned by swiftclient. """
+
+    # Objects of internal containers are served by i.s3
+    if _INTERNAL_CONTAINER.match(public_url.split('/')[-1]):
+        public_url = public_url.replace('://s3.', '://i.s3.')
+    public_url += '/'
+
+    seen = set()
 
     for obj in objects:
-        # Rackspace Cloudfiles uses application/directory
-        # Cyberduck uses application/x-directory
-        if obj.get('content_type', None) in ('application/directory',
-                                             'application/x-directory'):
+        if obj.get('content_type') in _DIRECTORY_CONTENT_TYPES:
             obj['subdir'] = obj['name']
 
         if 'subdir' in obj:
             # make sure that there is a single slash at the end
             # Cyberduck appends a slash to the name of a pseudofolder
             entry = obj['subdir'].strip('/') + '/'
-            if entry != prefix and entry not in duplist:
-                duplist.append(entry)
-                # pseudofolders.append((entry, obj['subdir']))
-                pseudofolders.append({'prefix': entry, 'name': obj['subdir']})
-        else:
-            # verifico se e um internal folder
-            # se for, preciso redirecionar pra i.s3
-            pattern = re.compile('^internal_.+')
-            if pattern.match(public_url.split('/')[-1]):
-                public_url = public_url.replace('://s3.', '://i.s3.')
-            obj['public_url'] = public_url + '/' + obj['name']
-            objs.append(obj)
+            if entry != prefix and entry not in seen:
+                seen.add(entry)
+                yield {'prefix': entry, 'name': obj['subdir']}
 
-    # return (pseudofolders, objs)
-    return pseudofolders + objs
+    for obj in objects:
+        if 'subdir' not in obj:
+            obj['public_url'] = public_url + obj['name']
+            yield obj
 
 
 def get_temp_key(storage_url, auth_token, http_conn):
     """ Tries to get meta-temp-url key from account.
     If not set, generate tempurl and save it to account.
-    This requires at least account owner rights. """
+    This requires at least account owner rights.
+
+    The key is cached per account for SWIFT_TEMP_KEY_CACHE_TIME seconds. """
+
+    cache_key = 'temp_key:{}'.format(storage_url)
+    key = cache.get(cache_key)
+
+    if key:
+        return key
 
     try:
         account = client.get_account(storage_url, auth_token,
@@ -142,15 +174,666 @@ def get_temp_key(storage_url, auth_token, http_conn):
                                 http_conn=http_conn)
         except client.ClientException:
             return None
+
+    cache.set(cache_key, key, settings.SWIFT_TEMP_KEY_CACHE_TIME)
+
     return key
 
 
+def get_temp_url(storage_url, key, container, objectname, method='GET',
+                 seconds=None, digest='sha1'):
+    """ Returns a Swift TempURL to the given object, signed with the
+    account temp-url key and valid for SWIFT_TEMPURL_EXPIRES seconds.
+    Swift tells the digest (sha1, sha256 or sha512) by the signature size. """
+
+    if seconds is None:
+        seconds = settings.SWIFT_TEMPURL_EXPIRES
+
+    url = urlparse(storage_url)
+    path = '{}/{}/{}'.format(url.path, container, objectname)
+    expires = int(time.time() + seconds)
+
+    hmac_body = '{}\n{}\n{}'.format(method, expires, path)
+    signature = hmac.new(
+        bytes(key, 'utf-8'), bytes(hmac_body, 'utf-8'),
+        getattr(hashlib, digest)).hexdigest()
+
+    return '{}://{}{}?temp_url_sig={}&temp_url_expires={}'.format(
+        url.scheme, url.netloc, quote(path), signature, expires)
+
+
+def upload_object(storage_url, auth_token, container, obj_name, fileobj,
+                  content_type):
+    """ Uploads a file-like object to Swift without reading it whole into
+    memory. Files bigger than SWIFT_SLO_THRESHOLD, or than the cluster's
+    max_file_size, are uploaded as a Static Large Object when the cluster
+    supports it. Returns the HTTP status of the object creation. """
+
+    info = swift_capabilities.get(storage_url)
+    threshold = min(settings.SWIFT_SLO_THRESHOLD,
+                    info.get('swift', {}).get('max_file_size', math.inf))
+
+    if fileobj.size > threshold and (not info or 'slo' in info):
+        return upload_slo_object(storage_url, auth_token, container,
+                                 obj_name, fileobj, content_type)
+
+    url = '{}/{}/{}'.format(storage_url, container, obj_name)
+    res = swift_pool.session(url).put(url,
+        data=fileobj.chunks(settings.SWIFT_UPLOAD_CHUNK_SIZE),
+        headers={'X-Storage-Token': auth_token, 'content-type': content_type},
+        verify=not settings.SWIFT_INSECURE)
+
+    return res.status_code
+
+
+def upload_slo_object(storage_url, auth_token, container, obj_name, fileobj,
+                      content_type):
+    """ Uploads a file-like object as a Static Large Object.
+
+    The file is split in SWIFT_SLO_SEGMENT_SIZE segments (grown if needed
+    to fit the cluster's SLO limits), stored in the "<container>_segments"
+    container by SWIFT_SLO_WORKERS parallel uploads. Each worker holds a
+    single segment in memory. No segment is sent after the first failure,
+    and the segments already stored are deleted when the upload fails.
+    Returns the HTTP status of the first failed request or of the manifest
+    creation. """
+
+    headers = {'X-Storage-Token': auth_token}
+    verify = not settings.SWIFT_INSECURE
+    session = swift_pool.session(storage_url)
+    workers = settings.SWIFT_SLO_WORKERS
+
+    slo = swift_capabilities.get(storage_url).get('slo', {})
+    segment_size = max(settings.SWIFT_SLO_SEGMENT_SIZE,
+                       slo.get('min_segment_size', 1),
+                       math.ceil(fileobj.size / slo.get('max_manifest_segments', 1000)))
+    segment_container = '{}_segments'.format(container)
+    segment_prefix = '{}/slo/{}/{}/{}'.format(
+        obj_name, time.time(), fileobj.size, segment_size)
+    count = math.ceil(fileobj.size / segment_size)
+    lock = threading.Lock()
+
+    res = session.put('{}/{}'.format(storage_url, segment_container),
+                      headers=headers, verify=verify)
+    if res.status_code not in (201, 202):
+        return res.status_code
+
+    def upload_segment(index):
+        with lock:
+            fileobj.seek(index * segment_size)
+            data = fileobj.read(segment_size)
+
+        path = '{}/{:08d}'.format(segment_prefix, index)
+        segment = {'path': '/{}/{}'.format(segment_container, path),
+                   'etag': None, 'size_bytes': len(data)}
+
+        try:
+            res = session.put('{}{}'.format(storage_url, segment['path']),
+                              data=data, headers=headers, verify=verify)
+        except Exception as err:
+            log.exception('Exception: {0}'.format(err))
+            return index, 500, segment
+
+        segment['etag'] = res.headers.get('etag')
+        return index, res.status_code, segment
+
+    def delete_segment(segment):
+        try:
+            session.delete('{}{}'.format(storage_url, segment['path']),
+                           headers=headers, verify=verify)
+        except Exception as err:
+            log.exception('Exception: {0}'.format(err))
+
+    def delete_segments(segments):
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(delete_segment, segments))
+
+    # At most "workers" segments are submitted at once, so a failure stops
+    # the upload instead of letting the queued segments go on
+    results = []
+    failed = False
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for index in range(count):
+            if len(pending) >= workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                results.extend(future.result() for future in done)
+                failed = any(status != 201 for _, status, _ in results)
+            if failed:
+                break
+            pending.add(pool.submit(upload_segment, index))
+
+        results.extend(future.result() for future in wait(pending).done)
+
+    results.sort(key=lambda result: result[0])
+    segments = [segment for _, status, segment in results if status == 201]
+
+    for _, status, segment in results:
+        if status != 201:
+            log.error('Fail to upload segment {} ({})'.format(
+                segment['path'], status))
+            delete_segments(segments)
+            return status
+
+    url = '{}/{}/{}?multipart-manifest=put'.format(
+        storage_url, container, obj_name)
+    try:
+        res = session.put(url,
+            data=json.dumps(segments),
+            headers=dict(headers, **{'content-type': content_type}),
+            verify=verify)
+    except Exception as err:
+        log.exception('Exception: {0}'.format(err))
+        delete_segments(segments)
+        return 500
+
+    if res.status_code not in (200, 201):
+        log.error('Fail to create manifest {} ({})'.format(
+            obj_name, res.status_code))
+        delete_segments(segments)
+
+    return res.status_code
+
+
+def iter_container_objects(storage_url, auth_token, container, http_conn,
+                           prefix=None, marker=None):
+    """ Yields every object of a container (after marker), reading the
+    listing page by page with markers, so the whole listing is never held in
+    memory. """
+
+    while True:
+        _, objects = client.get_container(
+            storage_url, current_token(auth_token), container,
+            marker=marker, prefix=prefix, http_conn=http_conn)
+
+        # An empty page ends the listing. A page that doesn't move past the
+        # marker would repeat forever, so it ends the listing as well
+        if not objects or objects[-1]['name'] == marker:
+            return
+
+        for obj in objects:
+            yield obj
+
+        marker = objects[-1]['name']
+
+
+# Characters after which a container's name space is split into ranges
+LISTING_SPLIT_CHARS = '-./0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz'
+
+
+def _listing_connection(storage_url):
+    # swiftclient connections can't be shared by threads, the pooled
+    # session behind them can
+    return swift_pool.http_connection(storage_url,
+                                      timeout=settings.SWIFT_REQUESTS_TIMEOUT)
+
+
+def _range_boundaries(storage_url, auth_token, container, prefix, start,
+                      names, executor):
+    """ Samples the objects that split the listing after start into ranges.
+
+    Candidates are the listing prefix, and the common prefix of names (the
+    first page), followed by each of LISTING_SPLIT_CHARS. The first object
+    after each candidate is a boundary. """
+
+    bases = {prefix or '', os.path.commonprefix(names)}
+    candidates = sorted({base + char for base in bases
+                         for char in LISTING_SPLIT_CHARS
+                         if base + char > start})
+
+    def sample(candidate):
+        _, objects = client.get_container(
+            storage_url, current_token(auth_token), container,
+            marker=candidate, prefix=prefix, limit=1,
+            http_conn=_listing_connection(storage_url))
+        return objects[0] if objects else None
+
+    boundaries = {}
+    for obj in executor.map(sample, candidates):
+        if obj is not None and obj['name'] > start:
+            boundaries[obj['name']] = obj
+
+    return [boundaries[name] for name in sorted(boundaries)]
+
+
+def _list_range(storage_url, auth_token, container, prefix, marker,
+                end_marker, page_size):
+    """ Yields the pages of objects between marker and end_marker. """
+
+    http_conn = _listing_connection(storage_url)
+
+    while True:
+        _, objects = client.get_container(
+            storage_url, current_token(auth_token), container,
+            marker=marker, end_marker=end_marker, prefix=prefix,
+            http_conn=http_conn)
+
+        if not objects or objects[-1]['name'] == marker:
+            return
+
+        yield objects
+
+        if len(objects) < page_size:
+            return
+
+        marker = objects[-1]['name']
+
+
+def _put(queue, item, stop):
+    while not stop.is_set():
+        try:
+            queue.put(item, timeout=0.1)
+            return True
+        except Full:
+            continue
+    return False
+
+
+def iter_container_objects_parallel(storage_url, auth_token, container,
+                                    http_conn, prefix=None, ordered=True):
+    """ Yields every object of a container, listing key ranges concurrently.
+
+    The first page is read like iter_container_objects does. A short page
+    means a small container, which goes on page by page. After a full page,
+    the rest of the name space is split into ranges by sampled boundary
+    objects, and each range is listed with marker/end_marker by one of
+    SWIFT_LISTING_WORKERS threads.
+
+    Objects come in name order when ordered is True. Otherwise pages are
+    yielded as they arrive, which is faster when the order doesn't matter
+    (e.g. deleting). Only a few pages per range are held in memory. """
+
+    info = swift_capabilities.get(storage_url)
+    page_size = info.get('swift', {}).get('container_listing_limit', 10000)
+
+    _, objects = client.get_container(
+        storage_url, current_token(auth_token), container,
+        marker=None, prefix=prefix, http_conn=http_conn)
+
+    for obj in objects:
+        yield obj
+
+    if not objects:
+        return
+
+    start = objects[-1]['name']
+
+    if len(objects) < page_size:
+        yield from iter_container_objects(storage_url, auth_token, container,
+                                          http_conn, prefix=prefix,
+                                          marker=start)
+        return
+
+    workers = settings.SWIFT_LISTING_WORKERS
+    executor = ThreadPoolExecutor(max_workers=workers)
+    stop = threading.Event()
+
+    try:
+        boundaries = _range_boundaries(
+            storage_url, auth_token, container, prefix, start,
+            [obj['name'] for obj in objects], executor)
+        del objects
+
+        markers = [start] + [obj['name'] for obj in boundaries]
+        end_markers = markers[1:] + [None]
+
+        shared = Queue(maxsize=2 * workers)
+        queues = [Queue(maxsize=2) if ordered else shared for _ in markers]
+
+        def list_range(queue, marker, end_marker):
+            if stop.is_set():
+                return
+            try:
+                for page in _list_range(storage_url, auth_token, container,
+                                        prefix, marker, end_marker, page_size):
+                    if not _put(queue, page, stop):
+                        return
+            except Exception as err:
+                _put(queue, err, stop)
+            _put(queue, None, stop)
+
+        for args in zip(queues, markers, end_markers):
+            executor.submit(list_range, *args)
+
+        if not ordered:
+            for obj in boundaries:
+                yield obj
+
+        remaining = len(markers)
+        index = 0
+
+        while remaining:
+            page = queues[index].get()
+
+            if page is None:
+                remaining -= 1
+                if ordered:
+                    if index < len(boundaries):
+                        yield boundaries[index]
+                    index += 1
+                continue
+
+            if isinstance(page, Exception):
+                raise page
+
+            for obj in page:
+                yield obj
+    finally:
+        stop.set()
+        executor.shutdown(wait=False)
+
+
+def _hidden_prefixes():
+    """ SWIFT_HIDE_PREFIXES sorted, without the ones covered by a shorter
+    prefix, so each one is a separate range of the listing. """
+
+    prefixes = []
+    for prefix in sorted(p for p in settings.SWIFT_HIDE_PREFIXES or [] if p):
+        if not prefixes or not prefix.startswith(prefixes[-1]):
+            prefixes.append(prefix)
+
+    return prefixes
+
+
+def get_visible_containers(storage_url, auth_token, http_conn, limit,
+                           marker=None):
+    """ Returns the account stat and a page of up to limit containers after
+    marker, none of them starting with SWIFT_HIDE_PREFIXES.
+
+    Swift lists containers sorted by name, so each hidden prefix is a range
+    of the listing. Every request stops right before the next hidden range
+    with end_marker, and the following request starts after it with a
+    marker, so hidden containers are never downloaded. Requests go on until
+    the page is full or the listing ends. Pages come from the listing
+    cache when possible. """
+
+    prefixes = _hidden_prefixes()
+    account_stat, containers = None, []
+    cursor = marker or ''
+
+    while len(containers) < limit:
+        # A marker inside a hidden range moves past the range
+        for prefix in prefixes:
+            if cursor.startswith(prefix):
+                cursor = prefix + '\U0010ffff'
+
+        end_marker = next((p for p in prefixes if p > cursor), None)
+        wanted = limit - len(containers)
+
+        stat, page = listing_cache.get_account(storage_url, auth_token,
+            http_conn, full_listing=False, limit=wanted,
+            marker=cursor or None, end_marker=end_marker)
+
+        if account_stat is None:
+            account_stat = stat
+
+        for container in page:
+            name = container['name']
+            # A listing must move forward, anything else was already seen
+            if containers and name <= containers[-1]['name']:
+                continue
+            if not any(name.startswith(p) for p in prefixes):
+                containers.append(container)
+
+        if len(page) >= wanted and page[-1]['name'] > cursor:
+            cursor = page[-1]['name']
+        elif end_marker is not None:
+            # Nothing left before the hidden range, go on after it
+            cursor = end_marker
+        else:
+            break
+
+    return account_stat or {}, containers[:limit]
+
+
+def concurrent_map(func, items, workers):
+    """ Calls func on each of items in up to workers threads, yielding the
+    (item, future) pairs as they complete.
+
+    items is consumed as calls complete, with at most 2 * workers calls
+    queued, so it can be a generator over a listing of any size. """
+
+    pending = {}
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for item in items:
+            if len(pending) >= 2 * workers:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield pending.pop(future), future
+
+            pending[executor.submit(func, item)] = item
+
+        for future in list(pending):
+            future.exception()
+            yield pending.pop(future), future
+
+
+def _status_code(status):
+    """ Returns the code of a "409 Conflict" like status line. """
+    try:
+        return int(str(status).split()[0])
+    except (ValueError, IndexError):
+        return 0
+
+
+def _is_transient_error(status):
+    return status >= 500 or status in (409, 429, 498)
+
+
+def _bulk_delete_batch(session, url, auth_token, lines):
+    """ Sends a batch of "container/object" lines to the bulk-delete
+    middleware, retrying names that failed with a transient error.
+    Returns the (deleted, not_found, failed) counters of the batch. """
+
+    deleted, not_found, failed = 0, 0, 0
+
+    for attempt in range(settings.SWIFT_BULK_DELETE_RETRIES + 1):
+        if attempt:
+            time.sleep(0.5 * 2 ** (attempt - 1))
+
+        headers = {'X-Auth-Token': current_token(auth_token),
+                   'Accept': 'application/json'}
+
+        try:
+            res = session.post(url, headers=headers, data=b'\n'.join(lines),
+                               verify=not settings.SWIFT_INSECURE)
+            if res.status_code == 200:
+                body = res.json()
+            else:
+                body = {'Response Status': str(res.status_code)}
+        except (requests.exceptions.RequestException, ValueError) as err:
+            log.exception('Exception: {0}'.format(err))
+            continue
+
+        deleted += body.get('Number Deleted', 0)
+        not_found += body.get('Number Not Found', 0)
+        errors = body.get('Errors') or []
+        status = _status_code(body.get('Response Status'))
+        retry = []
+
+        if errors:
+            by_name = {unquote(line.decode('utf-8', 'replace')).lstrip('/'): line
+                       for line in lines}
+            for name, error in errors:
+                line = by_name.get(unquote(name).lstrip('/'))
+                if line is not None and _is_transient_error(_status_code(error)):
+                    retry.append(line)
+                else:
+                    log.error('Fail to delete {} ({})'.format(name, error))
+                    failed += 1
+        elif status // 100 != 2:
+            if _is_transient_error(status):
+                retry = lines
+            else:
+                log.error('Fail to bulk delete {} objects ({})'.format(
+                    len(lines), status))
+                failed += len(lines)
+
+        lines = retry
+        if not lines:
+            break
+
+    if lines:
+        log.error('Gave up deleting {} objects after {} retries'.format(
+            len(lines), settings.SWIFT_BULK_DELETE_RETRIES))
+
+    return deleted, not_found, failed + len(lines)
+
+
+def bulk_delete(storage_url, auth_token, lines, max_deletes_per_request,
+                progress=None):
+    """ Deletes objects with the bulk-delete middleware.
+
+    lines is an iterable of b"container/object" names, sent in batches of
+    max_deletes_per_request. Up to SWIFT_BULK_DELETE_WORKERS batches are
+    sent at once; only those batches are held in memory.
+
+    progress, if given, is called with the (done, failed) counts of each
+    batch as it completes, done being the names deleted or not found.
+
+    Returns a dict with the "deleted", "not_found" and "failed" counters. """
+
+    url = storage_url + '?bulk-delete=true'
+    session = swift_pool.session(storage_url)
+    workers = settings.SWIFT_BULK_DELETE_WORKERS
+
+    result = {'deleted': 0, 'not_found': 0, 'failed': 0}
+    pending = set()
+
+    def collect(done):
+        for future in done:
+            deleted, not_found, failed = future.result()
+            result['deleted'] += deleted
+            result['not_found'] += not_found
+            result['failed'] += failed
+            if progress:
+                progress(deleted + not_found, failed)
+
+    def submit(batch):
+        nonlocal pending
+        if len(pending) >= workers:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            collect(done)
+        pending.add(pool.submit(_bulk_delete_batch, session, url,
+                                auth_token, batch))
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        batch = []
+        for line in lines:
+            batch.append(line)
+            if len(batch) == max_deletes_per_request:
+                submit(batch)
+                batch = []
+
+        if batch:
+            submit(batch)
+
+        collect(wait(pending)[0])
+
+    return result
+
+
+# Headers that a POST to an object replaces, so the current ones are sent
+# again to be kept
+_OBJECT_POST_HEADERS = ('content-type', 'content-disposition',
+                        'content-encoding', 'content-language', 'expires',
+                        'cache-control', 'x-delete-at', 'x-object-manifest',
+                        'x-robots-tag')
+
+
+def _updated_headers(current, changes):
+    """ Headers of a POST that applies changes (lowercase names, an empty
+    value removing the header) to an object with the current headers. """
+
+    headers = {key: value for key, value in current.items()
+               if key.startswith('x-object-meta-') or key in _OBJECT_POST_HEADERS}
+
+    if changes.get('x-delete-after'):
+        headers.pop('x-delete-at', None)
+
+    for key, value in changes.items():
+        if value in (None, ''):
+            headers.pop(key, None)
+        else:
+            headers[key] = str(value)
+
+    return headers
+
+
+def update_object_headers(storage_url, auth_token, container, object_name,
+                          changes):
+    """ Applies header changes to an object with a HEAD and a POST, retrying
+    transient errors up to SWIFT_HEADER_UPDATE_RETRIES times. """
+
+    http_conn = swift_pool.http_connection(
+        storage_url, timeout=settings.SWIFT_REQUESTS_TIMEOUT)
+    retries = settings.SWIFT_HEADER_UPDATE_RETRIES
+
+    for attempt in range(retries + 1):
+        if attempt:
+            time.sleep(0.5 * 2 ** (attempt - 1))
+
+        try:
+            token = current_token(auth_token)
+            current = client.head_object(storage_url, token, container,
+                                         object_name, http_conn=http_conn)
+            client.post_object(storage_url, token, container, object_name,
+                               headers=_updated_headers(current, changes),
+                               http_conn=http_conn)
+            return
+        except client.ClientException as err:
+            if not _is_transient_error(err.http_status or 500):
+                raise
+            if attempt == retries:
+                raise
+        except requests.exceptions.RequestException:
+            if attempt == retries:
+                raise
+
+
+def bulk_update_headers(storage_url, auth_token, container, names, changes,
+                        progress=None):
+    """ Applies header changes to objects of a container.
+
+    names is an iterable of object names. Up to SWIFT_HEADER_UPDATE_WORKERS
+    objects are updated at once.
+
+    progress, if given, is called with the (updated, failed) counts of each
+    object as it completes.
+
+    Returns a dict with the "updated" and "failed" counters. """
+
+    result = {'updated': 0, 'failed': 0}
+
+    def update(name):
+        update_object_headers(storage_url, auth_token, container, name, changes)
+
+    for name, future in concurrent_map(update, names,
+                                       settings.SWIFT_HEADER_UPDATE_WORKERS):
+        try:
+            future.result()
+            updated, failed = 1, 0
+        except (client.ClientException,
+                requests.exceptions.RequestException) as err:
+            log.error('Fail to update headers of {}/{} ({})'.format(
+                container, name, err))
+            updated, failed = 0, 1
+
+        result['updated'] += updated
+        result['failed'] += failed
+        if progress:
+            progress(updated, failed)
+
+    return result
+
+
 def get_acls(storage_url, auth_token, container, http_conn):
     """ Returns ACLs of given container. """
-    acls = client.head_container(storage_url,
-                                 auth_token,
-                                 container,
-                                 http_conn=http_conn)
+    acls = head_cache.head_container(storage_url,
+                                     auth_token,
+                                     container,
+                                     http_conn=http_conn)
 
     readers = acls.get('x-container-read', '')
     writers = acls.get('x-container-write', '')
@@ -159,10 +842,10 @@ def get_acls(storage_url, auth_token, container, http_conn):
 
 def get_cors(storage_url, auth_token, container, http_conn):
     """ Returns CORS header of given container. """
-    headers = client.head_container(storage_url,
-                                    auth_token,
-                                    container,
-                                    http_conn=http_conn)
+    headers = head_cache.head_container(storage_url,
+                                        auth_token,
+                                        container,
+                                        http_conn=http_conn)
 
     cors = headers.get('x-container-meta-access-control-allow-origin', '')
 
@@ -190,8 +873,7 @@ def remove_duplicates_from_cors(cors):
 def get_account_containers(storage_url, auth_token):
     """ List all containers in an account"""
     container_list = []
-    http_conn = client.http_connection(storage_url,
-                                       insecure=settings.SWIFT_INSECURE)
+    http_conn = swift_pool.http_connection(storage_url)
 
     _, containers = client.get_account(storage_url, auth_token,
                                        http_conn=http_conn)
@@ -203,24 +885,20 @@ def get_account_containers(storage_url, auth_token):
 
 
 def get_container_objects(container, storage_url, auth_token):
-    object_list = []
-    http_conn = client.http_connection(storage_url, insecure=settings.SWIFT_INSECURE)
-
-    _, objects = client.get_container(storage_url, auth_token, container,
-                                      http_conn=http_conn)
+    """ List the names of all objects in a container """
+    http_conn = swift_pool.http_connection(storage_url)
 
-    for object in objects:
-        object_list.append(object['name'])
+    objects = iter_container_objects_parallel(storage_url, auth_token,
+                                              container, http_conn)
 
-    return object_list
+    return [obj['name'] for obj in objects]
 
 
 def update_swift_account(user, password, project_name, headers):
     keystone = KeystoneNoRequest(user, password, project_name)
     endpoints = keystone.get_endpoints()
     storage_url = endpoints.get("object_store").get("adminURL")
-    http_conn = client.http_connection(
-        storage_url, insecure=settings.SWIFT_INSECURE)
+    http_conn = swift_pool.http_connection(storage_url)
 
     try:
         client.post_account(storage_url,
@@ -237,7 +915,7 @@ def delete_swift_account(storage_url, auth_token):
 
     try:
         # Criar container vazio para garantir que o account existe no swift
-        http_conn = client.http_connection(storage_url, insecure=insecure)
+        http_conn = swift_pool.http_connection(storage_url)
 
         client.put_container(storage_url, auth_token, 'dummy_container',
             http_conn=http_conn)
@@ -249,14 +927,10 @@ def delete_swift_account(storage_url, auth_token):
 
     try:
         # Deletar o account
-        url = urlparse(storage_url)
-        domain = '{}://{}'.format(url.scheme, url.netloc)
-        path = url.path
-
-        http_conn = client.HTTPConnection(domain, insecure=insecure)
         headers = {'X-Auth-Token': auth_token}
 
-        resp = http_conn.request('DELETE', path, headers=headers)
+        resp = swift_pool.session(storage_url).delete(
+            storage_url, headers=headers, verify=not insecure)
 
         if resp.status_code != 204:
             error_msg = resp.json().get('error')
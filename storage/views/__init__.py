@@ -4,3 +4,4 @@ from .main import *
 from .backup import *
 from .account import *
 from .cache import *
+from .jobs import *
@@ -1,12 +1,12 @@
 import logging
 
-from django.conf import settings
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
 
 from swiftclient import client
 
 from storage.utils import get_storage_endpoint
+from storage.connection import swift_pool
 from vault.utils import update_default_context
 
 log = logging.getLogger(__name__)
@@ -20,8 +20,7 @@ def accountview(request, project):
         return
 
     auth_token = request.session.get('auth_token')
-    http_conn = client.http_connection(
-        storage_url, insecure=settings.SWIFT_INSECURE)
+    http_conn = swift_pool.http_connection(storage_url)
 
     head_acc = {}
     try:
@@ -16,6 +16,7 @@ from django.contrib.auth.decorators import login_required
 from keystoneclient import exceptions
 
 from storage.models import BackupContainer
+from storage.connection import swift_pool
 from storage.utils import get_token_id, get_storage_endpoint
 from vault import utils
 from identity.keystone import Keystone, exceptions
@@ -50,12 +51,7 @@ def _check_backup_user(request, project_id):
         log.error('check_backup_user: Undefined backup user')
         return False
 
-    all_roles = keystone.role_list()
-    backup_role = None
-    for role in all_roles:
-        if role.name == settings.BACKUP_USER_ROLE:
-            backup_role = role
-
+    backup_role = keystone.role_get_by_name(settings.BACKUP_USER_ROLE)
     if backup_role is None:
         log.error('check_backup_user: Undefined backup role')
         return False
@@ -199,8 +195,8 @@ def check_backup_conditions(request, container):
 
     url = '{0}/{1}'.format(storage_url, container)
 
-    response = requests.head(url, headers=headers,
-                             verify=not settings.SWIFT_INSECURE)
+    response = swift_pool.session(url).head(
+        url, headers=headers, verify=not settings.SWIFT_INSECURE)
 
     if int(response.headers['X-Container-Object-Count']) >= backup_object_count_value:
         return False, _('Error when activating container backup. Container cannot contain more than {} objects').format(backup_object_count_value)
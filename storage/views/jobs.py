@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+
+""" Storage jobs views. """
+
+import json
+import logging
+
+from django.http import HttpResponse
+from django.utils.translation import gettext_lazy as _
+from django.contrib.auth.decorators import login_required
+
+from storage.models import StorageJob
+from storage.jobs import JOB_HANDLERS, submit_job, cancel_job, missing_job_params
+from vault import utils
+
+
+log = logging.getLogger(__name__)
+
+
+def _json_response(content, status=200):
+    return HttpResponse(json.dumps(content),
+                        content_type='application/json',
+                        status=status)
+
+
+def _get_project_job(request, job_id):
+    try:
+        return StorageJob.objects.get(
+            pk=job_id, project_id=request.session.get('project_id'))
+    except StorageJob.DoesNotExist:
+        return None
+
+
+@utils.project_required
+@login_required
+def storage_jobs(request, project):
+    """Lists the jobs of the project (GET) or submits a new one (POST)."""
+
+    if request.method == 'GET':
+        jobs = StorageJob.objects.filter(
+            project_id=request.session.get('project_id')).order_by('-id')[:50]
+        return _json_response({'jobs': [job.to_dict() for job in jobs]})
+
+    if request.method != 'POST':
+        return _json_response({'message': str(_('Bad parameters'))}, 400)
+
+    try:
+        data = json.loads(request.body)
+        kind = data.get('kind')
+        params = data.get('params') or {}
+    except (ValueError, AttributeError):
+        return _json_response({'message': str(_('Bad parameters'))}, 400)
+
+    if kind not in JOB_HANDLERS or not isinstance(params, dict):
+        return _json_response({'message': str(_('Bad parameters'))}, 400)
+
+    missing = missing_job_params(kind, params)
+    if missing:
+        return _json_response({
+            'message': str(_('Missing parameters: {}')).format(', '.join(missing))
+        }, 400)
+
+    job = submit_job(request, kind, **params)
+
+    return _json_response(job.to_dict(), 202)
+
+
+@utils.project_required
+@login_required
+def storage_job(request, project, job_id):
+    """Returns the status and progress of a job."""
+
+    job = _get_project_job(request, job_id)
+    if job is None:
+        return _json_response({'message': str(_('Job not found'))}, 404)
+
+    return _json_response(job.to_dict())
+
+
+@utils.project_required
+@login_required
+def storage_job_cancel(request, project, job_id):
+    """Cancels a job."""
+
+    if request.method != 'POST':
+        return _json_response({'message': str(_('Bad parameters'))}, 400)
+
+    job = _get_project_job(request, job_id)
+    if job is None:
+        return _json_response({'message': str(_('Job not found'))}, 404)
+
+    job = cancel_job(job)
+    log.info('{} canceled {}'.format(request.user.username, job))
+
+    return _json_response(job.to_dict())
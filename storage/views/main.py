@@ -1,7 +1,6 @@
 # pylint:disable=E1101
 
 """ Standalone webinterface for Openstack Swift. """
-import math
 import os
 import time
 import json
@@ -11,10 +10,11 @@ import requests
 import re
 import ast
 
-from datetime import datetime
+from datetime import datetime, timedelta
+from collections import deque
 
 from hashlib import sha1
-from urllib.parse import urlparse
+from urllib.parse import urlparse, quote
 
 from django.conf import settings
 from django.contrib import messages
@@ -22,7 +22,8 @@ from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponse, Http404, HttpResponseRedirect
+from django.http import (HttpResponse, Http404, HttpResponseRedirect,
+                         StreamingHttpResponse)
 from django.template.defaultfilters import filesizeformat
 
 from swiftclient import client
@@ -30,6 +31,12 @@ from swift_cloud_tools.client import SCTClient
 
 from storage.forms import *
 from storage.utils import *
+from storage.connection import swift_pool
+from storage.capabilities import swift_capabilities
+from storage.listing_cache import listing_cache
+from storage.head_cache import head_cache
+from storage.jobs import job_handler, submit_job, JobError
+from storage.views.backup import get_current_backup
 
 from vault.jsoninfo import JsonInfo
 from vault import utils
@@ -39,12 +46,17 @@ from actionlogger.actionlogger import ActionLogger
 log = logging.getLogger(__name__)
 actionlog = ActionLogger()
 
+# Headers relayed between the browser and Swift on object downloads
+DOWNLOAD_REQUEST_HEADERS = ('Range', 'If-None-Match', 'If-Modified-Since')
+DOWNLOAD_RESPONSE_HEADERS = ('Content-Length', 'Content-Range',
+                             'Content-Encoding', 'Accept-Ranges', 'ETag',
+                             'Last-Modified')
+
 
 def connection(request):
     storage_url = get_storage_endpoint(request, 'adminURL')
-    conn = client.http_connection(storage_url,
-                                  insecure=settings.SWIFT_INSECURE,
-                                  timeout=settings.SWIFT_REQUESTS_TIMEOUT)
+    conn = swift_pool.http_connection(storage_url,
+                                      timeout=settings.SWIFT_REQUESTS_TIMEOUT)
     return storage_url, conn
 
 
@@ -63,18 +75,15 @@ def containerview(request, project):
     marker = request.GET.get('marker')
 
     try:
-        account_stat, containers = client.get_account(storage_url,
-            auth_token, full_listing=False, http_conn=http_conn,
-            limit=(2*limit), marker=marker)
+        account_stat, containers = get_visible_containers(storage_url,
+            auth_token, http_conn, limit, marker=marker)
     except client.ClientException as err:
         log.exception('Exception: {0}'.format(err))
         messages.add_message(request, messages.ERROR,
                              _('Unable to list containers'))
         account_stat, containers = {}, []
 
-    containers = _hide_containers_with_prefixes(containers)
     account_stat = replace_hyphens(account_stat)
-    containers = containers[:limit]
 
     context = {
         'account_stat': account_stat,
@@ -88,18 +97,6 @@ def containerview(request, project):
     return render(request, 'containerview.html', context)
 
 
-def _hide_containers_with_prefixes(containers):
-    """Hide containers that starts with prefixes listed in SWIFT_HIDE_PREFIXES."""
-
-    hide_prefixes = settings.SWIFT_HIDE_PREFIXES
-    if hide_prefixes:
-        for prefix in hide_prefixes:
-            containers = [
-                obj for obj in containers if not obj['name'].startswith(prefix)]
-
-    return containers
-
-
 @utils.project_required
 @login_required
 def create_container(request, project):
@@ -114,8 +111,9 @@ def create_container(request, project):
         project_name = request.session.get('project_name')
 
         try:
-            client.put_container(
+            head_cache.put_container(
                 storage_url, auth_token, container, http_conn=http_conn)
+            listing_cache.invalidate(storage_url)
             messages.add_message(request, messages.SUCCESS,
                                  _("Container created"))
 
@@ -140,57 +138,122 @@ def delete_container(request, container, force=True):
     storage_url, http_conn = connection(request)
 
     try:
-        if force:
-            head = client.head_container(storage_url, auth_token, container, http_conn=http_conn)
-            container_objects = []
-            objects_count = int(head.get('x-container-object-count'))
+        deleted = _delete_container(storage_url, auth_token, http_conn,
+                                    container, request.user.username, force)
+    except client.ClientException as err:
+        log.exception('Exception: {0}'.format(err))
+        return False
 
-            while len(container_objects) < objects_count:
-                meta, objects = client.get_container(
-                    storage_url, auth_token, container, marker=container_objects[-1].get("name") if
-                    len(container_objects) > 0 else None, http_conn=http_conn)
-                container_objects.extend(objects)
+    return deleted
+
+
+def _delete_container(storage_url, auth_token, http_conn, container, username,
+                      force=True, job=None):
+    """Deletes a container, and all its objects first if force is True.
+
+    Progress is reported to job, when run as a storage job."""
+
+    if force:
+        head = head_cache.head_container(storage_url, current_token(auth_token),
+                                         container, http_conn=http_conn)
+        objects_count = int(head.get('x-container-object-count', 0))
+
+        if objects_count > 0:
+            container_objects = iter_container_objects_parallel(
+                storage_url, auth_token, container, http_conn, ordered=False)
 
             info = get_info(storage_url)
 
             if 'bulk_delete' in info:
-                max_deletes_per_request = info.get('bulk_delete').get('max_deletes_per_request')
-                for i in range(math.ceil(len(container_objects) / max_deletes_per_request)):
-
-                    names = b""
-                    start_index = i * max_deletes_per_request
-                    end_index = (i + 1) * max_deletes_per_request if len(container_objects) > (i + 1) * max_deletes_per_request\
-                        else len(container_objects)
-                    for obj in container_objects[start_index:end_index]:
-                        names += prepare_data_name(container, obj['name']) + b"\n"
-
-                    names = names[:-1]
-                    headers = {"X-Auth-Token": auth_token}
-                    r = requests.post(storage_url + "?bulk-delete=true",
-                                      headers=headers, data=names)
+                result = _bulk_delete_objects(storage_url, auth_token,
+                                              container, container_objects,
+                                              info, job)
+
+                if result['failed']:
+                    log.error('Fail to delete {} objects from {}'.format(
+                        result['failed'], container))
+                    listing_cache.invalidate(storage_url, container)
+                    return False
             else:
                 for obj in container_objects:
-                    delete_object(request=request,
-                                  container=container,
-                                  objectname=obj['name'])
-
-        client.delete_container(storage_url, auth_token,
+                    try:
+                        head_cache.delete_object(storage_url,
+                            token=current_token(auth_token),
+                            container=container, name=obj['name'], http_conn=http_conn)
+                        actionlog.log(username, "delete", obj['name'])
+                    except client.ClientException as err:
+                        log.exception('Exception: {0}'.format(err))
+                        if job:
+                            job.progress(errors=1)
+                        continue
+
+                    if job:
+                        job.progress(objects=1, bytes=obj.get('bytes', 0))
+
+    head_cache.delete_container(storage_url, current_token(auth_token),
                                 container, http_conn=http_conn)
-        actionlog.log(request.user.username, "delete", container)
-    except client.ClientException as err:
-        log.exception('Exception: {0}'.format(err))
-        return False
+    listing_cache.invalidate(storage_url, container)
+    actionlog.log(username, "delete", container)
 
     return True
 
 
+def _bulk_delete_objects(storage_url, auth_token, container, objects, info,
+                         job=None):
+    """Deletes objects with the bulk-delete middleware, in parallel batches.
+
+    Returns the "deleted", "not_found" and "failed" counters."""
+
+    max_deletes_per_request = info.get('bulk_delete').get('max_deletes_per_request')
+
+    def names():
+        for obj in objects:
+            if job:
+                job.progress(bytes=obj.get('bytes', 0))
+            yield prepare_data_name(container, obj['name'])
+
+    def progress(done, failed):
+        if job:
+            job.progress(objects=done, errors=failed)
+
+    return bulk_delete(storage_url, auth_token, names(),
+                       max_deletes_per_request, progress)
+
+
+@job_handler('delete_container', params=('container',))
+def delete_container_job(job):
+    container = job.params['container']
+
+    if not _delete_container(job.storage_url, job.get_auth_token,
+                             job.http_conn, container, job.username, job=job):
+        raise JobError('Fail to delete objects of {}'.format(container))
+
+    return 'Container deleted'
+
+
+def _job_response(job, message):
+    """JSON response to a request that started a storage job."""
+
+    content = {
+        'message': str(message),
+        'job_id': job.id,
+        'status_url': reverse('storage_job', kwargs={
+            'project': job.project_name, 'job_id': job.id}),
+    }
+
+    return HttpResponse(json.dumps(content),
+                        content_type='application/json',
+                        status=202)
+
+
 def get_info(storage_url):
-    info_url = storage_url.split("v1")[0] + "info"
-    return json.loads(requests.get(info_url).text)
+    """Returns the cached capabilities (/info) of the Swift cluster."""
+    return swift_capabilities.get(storage_url)
 
 
 def prepare_data_name(container, obj_name):
-    return container.encode() + b"/" + obj_name.encode()
+    """A bulk-delete line: the URL-encoded "container/object" name."""
+    return quote(container).encode() + b"/" + quote(obj_name).encode()
 
 
 @login_required
@@ -202,6 +265,11 @@ def delete_container_view(request, project, container):
                             content_type='application/json',
                             status=400)
 
+    if request.GET.get('async'):
+        return _job_response(submit_job(request, 'delete_container',
+                                        container=container),
+                             _('Container deletion started'))
+
     status, content = 200, {'message': str(_('Container deleted'))}
 
     deleted = delete_container(request, container)
@@ -233,9 +301,9 @@ def objectview(request, project, container, prefix=None):
     marker = request.GET.get('marker')
 
     try:
-        meta, objects = client.get_container(storage_url, auth_token,
-            container, delimiter='/', prefix=prefix, full_listing=False,
-            http_conn=http_conn, limit=limit, marker=marker)
+        meta, objects = listing_cache.get_container(storage_url, auth_token,
+            container, http_conn, delimiter='/', prefix=prefix,
+            full_listing=False, limit=limit, marker=marker)
     except client.ClientException as err:
         log.exception('Exception: {0}'.format(err))
         messages.add_message(request, messages.ERROR, _('Access denied'))
@@ -274,8 +342,8 @@ def object_item(request, project, container, objectname):
     if objectname:
         url = '{0}/{1}'.format(url, str(objectname))
 
-    response = requests.head(url, headers=headers,
-                             verify=not settings.SWIFT_INSECURE)
+    response = swift_pool.session(url).head(
+        url, headers=headers, verify=not settings.SWIFT_INSECURE)
 
     metadata = dict(response.headers)
 
@@ -327,7 +395,8 @@ def upload(request, project, container, prefix=None):
     url_parts = urlparse(swift_url)
     path = url_parts.path
 
-    max_file_size = 5 * 1024 * 1024 * 1024
+    max_file_size = get_info(storage_url).get('swift', {}).get(
+        'max_file_size', 5 * 1024 * 1024 * 1024)
     max_file_count = settings.MAX_FILES_UPLOAD
     expires = int(time.time() + 15 * 60)
     key = get_temp_key(storage_url, auth_token, http_conn)
@@ -339,6 +408,10 @@ def upload(request, project, container, prefix=None):
         else:
             return redirect(objectview, container=container, project=project_name)
 
+    # Files are sent by the browser straight to Swift until the form
+    # expires, so the listings aren't cached meanwhile
+    listing_cache.bypass(storage_url, container, expires - time.time())
+
     hmac_body = '{}\n{}\n{}\n{}\n{}'.format(
         path, '', max_file_size, max_file_count, expires)
     signature = hmac.new(
@@ -370,31 +443,25 @@ def create_object(request, project, container, prefix=None):
     project_name = request.session.get('project_name')
 
     if obj:
-        content = obj.read()
-        content_type = obj.content_type
-
         storage_url = get_storage_endpoint(request, 'adminURL')
         auth_token = get_token_id(request)
 
-        storage_url += '/' + container + '/'
-
+        obj_name = obj.name
         if prefix:
-            storage_url += prefix
-
-        storage_url += obj.name
+            obj_name = prefix + obj_name
 
-        req = requests.put(storage_url, data=content,
-            headers={'X-Storage-Token': auth_token, 'content-type': content_type},
-            verify=not settings.SWIFT_INSECURE)
+        status_code = upload_object(storage_url, auth_token, container,
+                                    obj_name, obj, obj.content_type)
+        listing_cache.invalidate(storage_url, container)
 
-        if req.status_code == 201:
+        if status_code == 201:
             messages.add_message(
                 request, messages.SUCCESS, _('Object created'))
             actionlog.log(request.user.username, "create", obj)
-        elif req.status_code == 401 or req.status_code == 403:
+        elif status_code == 401 or status_code == 403:
             messages.add_message(request, messages.ERROR, _('Access denied'))
         else:
-            msg = 'Fail to create object ({0}).'.format(req.status_code)
+            msg = 'Fail to create object ({0}).'.format(status_code)
             log.error(msg)
             messages.add_message(request, messages.ERROR, msg)
 
@@ -404,22 +471,93 @@ def create_object(request, project, container, prefix=None):
         return redirect(objectview, container=container, project=project_name)
 
 
+def _iter_response(res, chunk_size):
+    """Yields the body of a streamed response as stored in Swift, closing
+    it at the end. The body isn't decoded, so it keeps matching the relayed
+    Content-Encoding and Content-Length."""
+
+    try:
+        for chunk in res.raw.stream(chunk_size, decode_content=False):
+            if chunk:
+                yield chunk
+    finally:
+        res.close()
+
+
+def _tempurl_allows(storage_url, method):
+    """False if the cluster is known not to accept TempURLs for method."""
+
+    info = get_info(storage_url)
+    if not info:
+        return True
+
+    return method in info.get('tempurl', {}).get('methods', [])
+
+
+def _tempurl_digest(storage_url):
+    """The strongest TempURL digest accepted by the cluster."""
+
+    digests = get_info(storage_url).get('tempurl', {}).get('allowed_digests', [])
+    for digest in ('sha512', 'sha256'):
+        if digest in digests:
+            return digest
+
+    return 'sha1'
+
+
 def download(request, project, container, objectname):
-    """Download an object from Swift."""
+    """Download an object from Swift.
 
-    storage_url = get_storage_endpoint(request, 'adminURL')
+    The object is relayed to the client as it arrives from Swift, so the
+    worker never holds the whole body in memory. Range and conditional
+    headers are passed through, allowing 206 and 304 responses.
+
+    If SWIFT_DOWNLOAD_TEMPURL is set, the browser is redirected to a signed
+    TempURL and fetches the object straight from Swift.
+    """
+
+    storage_url, http_conn = connection(request)
     auth_token = get_token_id(request)
 
+    if settings.SWIFT_DOWNLOAD_TEMPURL and _tempurl_allows(storage_url, 'GET'):
+        key = get_temp_key(storage_url, auth_token, http_conn)
+
+        if key:
+            public_url = get_storage_endpoint(request, 'publicURL')
+            temp_url = get_temp_url(public_url, key, container, objectname,
+                                    digest=_tempurl_digest(storage_url))
+            actionlog.log(request.user.username, "download", str(objectname))
+
+            return HttpResponseRedirect(temp_url)
+
+        log.error('Unable to get temp-url key, streaming {}/{}'.format(
+            container, objectname))
+
     headers = {'X-Storage-Token': auth_token}
 
+    for header in DOWNLOAD_REQUEST_HEADERS:
+        value = request.META.get('HTTP_' + header.upper().replace('-', '_'))
+        if value:
+            headers[header] = value
+
     url = '{0}/{1}/{2}'.format(storage_url, container, str(objectname))
 
-    res = requests.get(
-        url, headers=headers, verify=not settings.SWIFT_INSECURE)
+    res = swift_pool.session(url).get(url, headers=headers, stream=True,
+                                      timeout=settings.SWIFT_REQUESTS_TIMEOUT,
+                                      verify=not settings.SWIFT_INSECURE)
 
     actionlog.log(request.user.username, "download", str(objectname))
 
-    return HttpResponse(res.content, content_type=res.headers['Content-Type'])
+    response = StreamingHttpResponse(
+        _iter_response(res, settings.SWIFT_DOWNLOAD_CHUNK_SIZE),
+        status=res.status_code,
+        content_type=res.headers.get('Content-Type'))
+
+    for header in DOWNLOAD_RESPONSE_HEADERS:
+        if res.headers.get(header):
+            response[header] = res.headers.get(header)
+
+    return response
 
 
 @login_required
@@ -450,8 +588,9 @@ def delete_object(request, container, objectname):
     storage_url, http_conn = connection(request)
 
     try:
-        client.delete_object(storage_url, token=auth_token,
+        head_cache.delete_object(storage_url, token=auth_token,
             container=container, name=objectname, http_conn=http_conn)
+        listing_cache.invalidate(storage_url, container)
         actionlog.log(request.user.username, "delete", objectname)
     except client.ClientException as err:
         log.exception('Exception: {0}'.format(err))
@@ -460,40 +599,114 @@ def delete_object(request, container, objectname):
     return True
 
 
-@login_required
-def delete_pseudofolder(request, project, container, pseudofolder):
-    """Deletes an empty object, used as a pseudofolder."""
+def _delete_objects(storage_url, auth_token, http_conn, container, objects,
+                    job=None):
+    """Deletes objects (an iterable of listing entries) from container. Uses
+    bulk delete when the cluster supports it.
 
-    auth_token = get_token_id(request)
-    storage_url, http_conn = connection(request)
+    Returns the number of objects deleted and failed to delete."""
+
+    info = get_info(storage_url)
 
-    objects = client.get_container(storage_url, auth_token,
-        container, prefix=pseudofolder, http_conn=http_conn)[1]
+    if 'bulk_delete' in info:
+        result = _bulk_delete_objects(storage_url, auth_token, container,
+                                      objects, info, job)
+        listing_cache.invalidate(storage_url, container)
+        return result['deleted'] + result['not_found'], result['failed']
 
-    count_deletes = 0
+    count_deletes, count_failures = 0, 0
 
     for obj in objects:
         try:
-            client.delete_object(storage_url, token=auth_token,
+            head_cache.delete_object(storage_url, token=current_token(auth_token),
                 container=container, name=obj['name'], http_conn=http_conn)
             count_deletes += 1
         except client.ClientException as err:
             log.exception('Exception: {0}'.format(err))
+            count_failures += 1
+            if job:
+                job.progress(errors=1)
+            continue
+
+        if job:
+            job.progress(objects=1, bytes=obj.get('bytes', 0))
+
+    listing_cache.invalidate(storage_url, container)
+
+    return count_deletes, count_failures
+
 
+def _delete_pseudofolder(storage_url, auth_token, http_conn, container,
+                         pseudofolder, job=None):
+    """Deletes a pseudofolder and every object under it, walking the whole
+    prefix page by page. Uses bulk delete when the cluster supports it.
+
+    Returns the number of objects deleted and failed to delete."""
+
+    objects = iter_container_objects_parallel(storage_url, auth_token,
+        container, http_conn, prefix=pseudofolder, ordered=False)
+
+    return _delete_objects(storage_url, auth_token, http_conn, container,
+                           objects, job)
+
+
+def _pseudofolder_deleted_message(count_deletes, count_failures):
     # Empty pseudofolder
-    if count_deletes == 1 and count_deletes == len(objects):
-        messages.add_message(request, messages.SUCCESS, _('Pseudofolder deleted'))
+    if count_deletes == 1 and count_failures == 0:
+        return messages.SUCCESS, _('Pseudofolder deleted')
 
     # Non empty pseudofolder
-    elif count_deletes > 1 and count_deletes == len(objects):
-        messages.add_message(request, messages.SUCCESS,
-                             'Pseudofolder and {0} objects deleted.'.format(count_deletes - 1))
-    elif count_deletes > 0 and count_deletes < len(objects):
-        messages.add_message(request, messages.SUCCESS,
-                             _('Could not delete all objects'))
-    else:
-        messages.add_message(request, messages.ERROR,
-                             _('Fail to delete pseudofolder'))
+    if count_deletes > 1 and count_failures == 0:
+        return (messages.SUCCESS,
+                'Pseudofolder and {0} objects deleted.'.format(count_deletes - 1))
+
+    if count_deletes > 0:
+        return (messages.SUCCESS,
+                '{0}: {1} deleted, {2} failed.'.format(
+                    _('Could not delete all objects'), count_deletes, count_failures))
+
+    return messages.ERROR, _('Fail to delete pseudofolder')
+
+
+@job_handler('delete_pseudofolder', params=('container', 'pseudofolder'))
+def delete_pseudofolder_job(job):
+    pseudofolder = job.params['pseudofolder']
+
+    count_deletes, count_failures = _delete_pseudofolder(
+        job.storage_url, job.get_auth_token, job.http_conn,
+        job.params['container'], pseudofolder, job=job)
+
+    level, message = _pseudofolder_deleted_message(count_deletes, count_failures)
+    if level == messages.ERROR:
+        raise JobError(str(message))
+
+    actionlog.log(job.username, "delete", pseudofolder.rstrip('/'))
+
+    return str(message)
+
+
+@login_required
+def delete_pseudofolder(request, project, container, pseudofolder):
+    """Deletes an empty object, used as a pseudofolder."""
+
+    if request.GET.get('async'):
+        return _job_response(submit_job(request, 'delete_pseudofolder',
+                                        container=container,
+                                        pseudofolder=pseudofolder),
+                             _('Pseudofolder deletion started'))
+
+    auth_token = get_token_id(request)
+    storage_url, http_conn = connection(request)
+
+    try:
+        count_deletes, count_failures = _delete_pseudofolder(
+            storage_url, auth_token, http_conn, container, pseudofolder)
+        level, message = _pseudofolder_deleted_message(count_deletes, count_failures)
+    except client.ClientException as err:
+        log.exception('Exception: {0}'.format(err))
+        level, message = messages.ERROR, _('Fail to delete pseudofolder')
+
+    messages.add_message(request, level, message)
 
     if pseudofolder[-1] == '/':  # deleting a pseudofolder, move one level up
         pseudofolder = pseudofolder[:-1]
@@ -534,8 +747,9 @@ def create_pseudofolder(request, project, container, prefix=None):
         project_name = request.session.get('project_name')
 
         try:
-            client.put_object(storage_url, auth_token, container,
+            head_cache.put_object(storage_url, auth_token, container,
                 foldername, obj, content_type=content_type, http_conn=http_conn)
+            listing_cache.invalidate(storage_url, container)
             messages.add_message(request, messages.SUCCESS,
                                  _('Pseudofolder created'))
         except client.ClientException as err:
@@ -588,7 +802,7 @@ def edit_acl(request, project, container):
             headers = {'X-Container-Read': readers,
                        'X-Container-Write': writers}
             try:
-                client.post_container(storage_url,
+                head_cache.post_container(storage_url,
                     auth_token, container, headers=headers, http_conn=http_conn)
 
                 messages.add_message(request, messages.SUCCESS, _('ACLs updated'))
@@ -624,8 +838,8 @@ def edit_acl(request, project, container):
             headers = {'X-Container-Read': new_readers,
                        'X-Container-Write': new_writers}
             try:
-                client.post_container(storage_url, auth_token,
-                                      container, headers=headers, http_conn=http_conn)
+                head_cache.post_container(storage_url, auth_token,
+                                          container, headers=headers, http_conn=http_conn)
 
                 messages.add_message(request, messages.SUCCESS,
                                      _('ACL removed'))
@@ -679,7 +893,7 @@ def make_public(request, container):
     auth_token = get_token_id(request)
     storage_url, http_conn = connection(request)
 
-    headers = client.head_container(
+    headers = head_cache.head_container(
         storage_url, auth_token, container, http_conn=http_conn)
 
     current = headers.get('X-Container-Read')
@@ -691,7 +905,7 @@ def make_public(request, container):
         message = _('Container is now private')
 
     try:
-        client.post_container(storage_url,
+        head_cache.post_container(storage_url,
             auth_token, container, headers=headers, http_conn=http_conn)
 
         content = {"message": str(message)}
@@ -717,7 +931,7 @@ def metadataview(request, project, container, objectname=None):
     if objectname:
         url = '{0}/{1}'.format(url, str(objectname))
 
-    response = requests.head(
+    response = swift_pool.session(url).head(
         url, headers=headers, verify=not settings.SWIFT_INSECURE)
 
     content = json.dumps(dict(response.headers))
@@ -740,10 +954,11 @@ def object_versioning(request, project, container, prefix=None):
 
     objects = []
 
-    page = request.GET.get('page', 1)
+    limit = int(settings.PAGINATION_SIZE)
+    marker = request.GET.get('marker')
 
     if request.method == 'GET':
-        headers = client.head_container(
+        headers = head_cache.head_container(
             storage_url, auth_token, container, http_conn=http_conn)
 
         version_location = headers.get('x-versions-location', None)
@@ -752,21 +967,29 @@ def object_versioning(request, project, container, prefix=None):
             try:
                 meta, objects = client.get_container(
                     storage_url, auth_token, version_location, prefix=prefix,
-                    delimiter='/', full_listing=False, http_conn=http_conn)
+                    delimiter='/', limit=limit, marker=marker,
+                    full_listing=False, http_conn=http_conn)
             except client.ClientException:
                 pass
 
         prefixes = prefix_list(prefix)
         object_list = pseudofolder_object_list(objects, prefix, public_url)
+        keep_last, keep_days = _retention_policy(headers)
 
         context = utils.update_default_context(request, {
             'container': container,
-            'objects': utils.generic_pagination(object_list, page),
+            'objects': list(object_list),
             'version_location': version_location,
+            'keep_last': keep_last,
+            'keep_days': keep_days,
             'prefix': prefix,
             'prefixes': prefixes,
+            'marker': None,
         })
 
+        if len(objects) >= limit:
+            context['marker'] = objects[-1].get('name') or objects[-1].get('subdir')
+
         return render(request, 'container_versioning.html', context)
 
     if request.method == 'POST':
@@ -778,9 +1001,27 @@ def object_versioning(request, project, container, prefix=None):
             actionlog.log(request.user.username, "enable",
                           'Versioning. Container: {}'.format(container))
         elif action == 'disable':
+            if request.POST.get('async'):
+                # The job logs the action once versioning is disabled
+                return _job_response(submit_job(request, 'disable_versioning',
+                                                container=container),
+                                     _('Versioning disable started'))
+
             disable_versioning(request, container)
             actionlog.log(request.user.username, "disable",
                           'Versioning. Container: {}'.format(container))
+        elif action == 'retention':
+            try:
+                keep_last = int(request.POST.get('keep_last') or 0)
+                keep_days = int(request.POST.get('keep_days') or 0)
+            except ValueError:
+                keep_last = keep_days = -1
+
+            if keep_last < 0 or keep_days < 0:
+                messages.add_message(request, messages.ERROR,
+                                     _('Bad parameters'))
+            else:
+                set_version_retention(request, container, keep_last, keep_days)
         else:
             messages.add_message(request, messages.ERROR,
                                  'Action is required.')
@@ -788,6 +1029,62 @@ def object_versioning(request, project, container, prefix=None):
         return redirect(object_versioning, project=project, container=container)
 
 
+def _version_prefix(object_name):
+    """
+    Prefix of the versions of object_name in the versions container, which
+    names them <length of the name, 3 hex digits><name>/<timestamp>.
+    """
+
+    return '{:03x}{}/'.format(len(object_name.encode('utf-8')), object_name)
+
+
+@utils.project_required
+@login_required
+def object_history(request, project, container, objectname):
+    """Lists the previous versions of an object, oldest first."""
+
+    auth_token = get_token_id(request)
+    storage_url, http_conn = connection(request)
+
+    limit = int(settings.PAGINATION_SIZE)
+    marker = request.GET.get('marker')
+    versions = []
+
+    headers = head_cache.head_container(
+        storage_url, auth_token, container, http_conn=http_conn)
+
+    version_location = headers.get('x-versions-location', None)
+
+    if version_location:
+        prefix = _version_prefix(objectname)
+
+        try:
+            meta, versions = client.get_container(
+                storage_url, auth_token, version_location, prefix=prefix,
+                limit=limit, marker=marker, full_listing=False,
+                http_conn=http_conn)
+        except client.ClientException as err:
+            log.exception('Exception: {0}'.format(err))
+            messages.add_message(request, messages.ERROR, _('Access denied'))
+
+        for version in versions:
+            version['timestamp'] = version['name'][len(prefix):]
+
+    context = utils.update_default_context(request, {
+        'container': container,
+        'objectname': objectname,
+        'versions': versions,
+        'version_location': version_location,
+        'prefixes': prefix_list(objectname),
+        'marker': None,
+    })
+
+    if len(versions) >= limit:
+        context['marker'] = versions[-1]['name']
+
+    return render(request, 'object_history.html', context)
+
+
 def enable_versioning(request, container):
     """Enable/Disable versioning in container."""
 
@@ -798,7 +1095,7 @@ def enable_versioning(request, container):
         settings.SWIFT_VERSION_PREFIX, container)
 
     try:
-        client.put_container(
+        head_cache.put_container(
             storage_url, auth_token, version_location, http_conn=http_conn)
         actionlog.log(request.user.username, "create", version_location)
     except client.ClientException as err:
@@ -808,7 +1105,7 @@ def enable_versioning(request, container):
 
     try:
         header = {'x-versions-location': version_location}
-        client.post_container(storage_url,
+        head_cache.post_container(storage_url,
             auth_token, container, headers=header, http_conn=http_conn)
         actionlog.log(request.user.username, "update", version_location)
     except client.ClientException as err:
@@ -828,7 +1125,7 @@ def disable_versioning(request, container):
     storage_url, http_conn = connection(request)
 
     try:
-        headers = client.head_container(
+        headers = head_cache.head_container(
             storage_url, auth_token, container, http_conn=http_conn)
     except client.ClientException as err:
         log.exception('Exception: {0}'.format(err))
@@ -839,7 +1136,7 @@ def disable_versioning(request, container):
 
     if version_location:
         try:
-            client.post_container(storage_url, auth_token, container,
+            head_cache.post_container(storage_url, auth_token, container,
                 headers={'x-versions-location': ''}, http_conn=http_conn)
             actionlog.log(request.user.username, "update", container)
         except client.ClientException as err:
@@ -856,6 +1153,161 @@ def disable_versioning(request, container):
     return True
 
 
+@job_handler('disable_versioning', params=('container',))
+def disable_versioning_job(job):
+    container = job.params['container']
+
+    headers = head_cache.head_container(
+        job.storage_url, job.get_auth_token(), container,
+        http_conn=job.http_conn)
+    version_location = headers.get('x-versions-location', None)
+
+    if version_location:
+        head_cache.post_container(job.storage_url, job.get_auth_token(), container,
+            headers={'x-versions-location': ''}, http_conn=job.http_conn)
+        actionlog.log(job.username, "update", container)
+
+        if not _delete_container(job.storage_url, job.get_auth_token,
+                                 job.http_conn, version_location,
+                                 job.username, job=job):
+            raise JobError('Fail to delete objects of {}'.format(version_location))
+
+    actionlog.log(job.username, "disable",
+                  'Versioning. Container: {}'.format(container))
+
+    return 'Versioning disabled'
+
+
+# Container metadata of the version retention policy
+VERSIONS_KEEP_LAST_META = 'x-container-meta-versions-keep-last'
+VERSIONS_KEEP_DAYS_META = 'x-container-meta-versions-keep-days'
+
+
+def _retention_policy(headers):
+    """Returns the (keep_last, keep_days) retention policy in the headers of a
+    versioned container, None for the rules that are not set."""
+
+    policy = []
+
+    for key in (VERSIONS_KEEP_LAST_META, VERSIONS_KEEP_DAYS_META):
+        try:
+            value = int(headers.get(key))
+        except (TypeError, ValueError):
+            value = 0
+        policy.append(value if value > 0 else None)
+
+    return tuple(policy)
+
+
+def _last_modified_cutoff(days):
+    """days ago, in the format of last_modified in Swift listings."""
+
+    # Swift lists last_modified in UTC
+    return (datetime.utcnow() - timedelta(days=days)).strftime(
+        '%Y-%m-%dT%H:%M:%S.%f')
+
+
+def _expired_versions(versions, keep_last=None, keep_days=None):
+    """Streams the entries of a versions container listing that the retention
+    policy no longer keeps: those older than the last keep_last versions of
+    their object and archived more than keep_days days ago.
+
+    The listing must be in name order, which groups the versions of each
+    object (<length><name>/<timestamp>) from oldest to newest."""
+
+    cutoff = None
+    if keep_days:
+        # last_modified is the archiving time of versions
+        cutoff = _last_modified_cutoff(keep_days)
+
+    current, newest = None, deque()
+
+    for version in versions:
+        object_prefix = version['name'].rpartition('/')[0]
+        if object_prefix != current:
+            current, newest = object_prefix, deque()
+
+        if keep_last:
+            newest.append(version)
+            if len(newest) <= keep_last:
+                continue
+            version = newest.popleft()
+
+        if cutoff is None or version.get('last_modified', '') < cutoff:
+            yield version
+
+
+def prune_versions(storage_url, auth_token, http_conn, container,
+                   dry_run=False, report=None):
+    """Deletes the versions of container that its retention policy no longer
+    keeps, streaming the versions container and bulk deleting in parallel.
+    With dry_run, the expired versions are only counted. report, if given,
+    is called with each expired version.
+
+    Returns a dict with the policy and the "expired", "bytes", "deleted"
+    and "failed" counters."""
+
+    headers = head_cache.head_container(
+        storage_url, current_token(auth_token), container, http_conn=http_conn)
+
+    keep_last, keep_days = _retention_policy(headers)
+    version_location = headers.get('x-versions-location', None)
+
+    result = {'container': container, 'version_location': version_location,
+              'keep_last': keep_last, 'keep_days': keep_days,
+              'expired': 0, 'bytes': 0, 'deleted': 0, 'failed': 0}
+
+    if not version_location or (keep_last is None and keep_days is None):
+        return result
+
+    versions = iter_container_objects_parallel(storage_url, auth_token,
+        version_location, http_conn)
+
+    def expired():
+        for version in _expired_versions(versions, keep_last, keep_days):
+            result['expired'] += 1
+            result['bytes'] += version.get('bytes', 0)
+            if report:
+                report(version)
+            yield version
+
+    if dry_run:
+        for _version in expired():
+            pass
+    else:
+        result['deleted'], result['failed'] = _delete_objects(
+            storage_url, auth_token, http_conn, version_location, expired())
+
+    return result
+
+
+def set_version_retention(request, container, keep_last=None, keep_days=None):
+    """Stores the version retention policy of container in its metadata.
+    Rules that are not given are removed."""
+
+    auth_token = get_token_id(request)
+    storage_url, http_conn = connection(request)
+
+    headers = {
+        VERSIONS_KEEP_LAST_META: str(keep_last) if keep_last else '',
+        VERSIONS_KEEP_DAYS_META: str(keep_days) if keep_days else '',
+    }
+
+    try:
+        head_cache.post_container(storage_url, auth_token, container,
+            headers=headers, http_conn=http_conn)
+        actionlog.log(request.user.username, "update", container)
+    except client.ClientException as err:
+        log.exception('Exception: {0}'.format(err))
+        messages.add_message(request, messages.ERROR, _('Access denied'))
+        return False
+
+    messages.add_message(request, messages.SUCCESS,
+                         _('Version retention updated'))
+
+    return True
+
+
 @login_required
 def edit_cors(request, project, container):
     """Edit CORS on given container."""
@@ -881,7 +1333,7 @@ def edit_cors(request, project, container):
                 }
 
                 try:
-                    client.post_container(storage_url,
+                    head_cache.post_container(storage_url,
                         auth_token, container, headers=headers, http_conn=http_conn)
 
                     messages.add_message(request, messages.SUCCESS, _('CORS updated'))
@@ -914,7 +1366,7 @@ def edit_cors(request, project, container):
             }
 
             try:
-                client.post_container(storage_url,
+                head_cache.post_container(storage_url,
                     auth_token, container, headers=headers, http_conn=http_conn)
 
                 messages.add_message(request, messages.SUCCESS, _('CORS removed'))
@@ -952,7 +1404,7 @@ def edit_custom_metadata(request, project, container, objectname):
     custom_headers = request.POST.dict()
     system_headers = {}
 
-    headers = client.head_object(storage_url,
+    headers = head_cache.head_object(storage_url,
         auth_token, container, objectname, http_conn=http_conn)
 
     for item in headers:
@@ -962,7 +1414,7 @@ def edit_custom_metadata(request, project, container, objectname):
     system_headers.update(custom_headers)
 
     try:
-        client.post_object(storage_url, auth_token, container,
+        head_cache.post_object(storage_url, auth_token, container,
             objectname, headers=system_headers, http_conn=http_conn)
 
         content = {"message": _("Custom Metadata updated")}
@@ -990,12 +1442,12 @@ def cache_control(request, project, container, objectname):
         return HttpResponse(
             json.dumps(content), content_type='application/json', status=status)
 
-    headers = client.head_object(storage_url,
+    headers = head_cache.head_object(storage_url,
         auth_token, container, objectname, http_conn=http_conn)
     headers["cache-control"] = "public, max-age={}".format(maxage)
 
     try:
-        client.post_object(storage_url, auth_token,
+        head_cache.post_object(storage_url, auth_token,
             container, objectname, headers=headers, http_conn=http_conn)
         content = {"message": str(
             _("Cache-Control updated")), "cache_control": headers["cache-control"]}
@@ -1018,7 +1470,7 @@ def optional_headers(request, project, container, objectname):
 
     content, status = {}, 200
 
-    headers = client.head_object(storage_url,
+    headers = head_cache.head_object(storage_url,
         auth_token, container, objectname, http_conn=http_conn)
 
     body_dict = ast.literal_eval(request.body.decode())
@@ -1030,8 +1482,8 @@ def optional_headers(request, project, container, objectname):
     content = {"message": str(_("Optional headers updated")),
                "x-delete-at": headers.get("x-delete-at")}
     try:
-        client.post_object(storage_url, auth_token, container, objectname,
-                           headers=headers, http_conn=http_conn)
+        head_cache.post_object(storage_url, auth_token, container, objectname,
+                               headers=headers, http_conn=http_conn)
     except Exception as e:
         log.error(e)
         content, status = {"message": str(
@@ -1042,20 +1494,166 @@ def optional_headers(request, project, container, objectname):
                         status=status)
 
 
+# Headers that can be changed on many objects at once
+BULK_HEADERS = ('cache-control', 'content-disposition', 'x-delete-at',
+                'x-delete-after')
+
+
+def _header_changes(headers):
+    """Validated, lowercase header changes of a bulk update request, or None.
+    An empty value removes the header."""
+
+    if not isinstance(headers, dict) or not headers:
+        return None
+
+    changes = {}
+
+    for key, value in headers.items():
+        key = str(key).strip().lower()
+        value = '' if value is None else str(value).strip()
+
+        if not (key.startswith('x-object-meta-') or key in BULK_HEADERS):
+            return None
+
+        if key in ('x-delete-at', 'x-delete-after') and value:
+            try:
+                if int(value) < 0:
+                    return None
+            except ValueError:
+                return None
+
+        changes[key] = value
+
+    return changes
+
+
+def _update_headers(storage_url, auth_token, http_conn, container, changes,
+                    prefix=None, job=None):
+    """Applies header changes to every object of container, or under prefix,
+    streaming the listing into bulk_update_headers.
+
+    Returns the number of objects updated and failed to update."""
+
+    names = (obj['name'] for obj in iter_container_objects_parallel(
+        storage_url, auth_token, container, http_conn, prefix=prefix,
+        ordered=False))
+
+    def progress(updated, failed):
+        if job:
+            job.progress(objects=updated, errors=failed)
+
+    result = bulk_update_headers(storage_url, auth_token, container, names,
+                                 changes, progress)
+
+    return result['updated'], result['failed']
+
+
+@job_handler('update_headers', params=('container', 'headers'))
+def update_headers_job(job):
+    params = job.params
+
+    changes = _header_changes(params['headers'])
+    if changes is None:
+        raise JobError('Bad headers')
+
+    done, failed = _update_headers(job.storage_url, job.get_auth_token,
+        job.http_conn, params['container'], changes, params.get('prefix'),
+        job=job)
+    message = '{} objects updated, {} failed'.format(done, failed)
+
+    if failed and not done:
+        raise JobError(message)
+
+    actionlog.log(job.username, "update", 'Headers of {}/{}'.format(
+        params['container'], params.get('prefix') or ''))
+
+    return message
+
+
+@utils.project_required
+@login_required
+def update_headers(request, project):
+    """Changes headers of every object of a container, or under a prefix.
+
+    Takes a JSON body with the "container", an optional "prefix" and the
+    "headers" to set, which can be custom metadata (X-Object-Meta-*),
+    Cache-Control, Content-Disposition, X-Delete-At or X-Delete-After. An
+    empty value removes the header. Starts a storage job with the async
+    parameter."""
+
+    if request.method != 'POST':
+        return HttpResponse(status=405)
+
+    try:
+        data = json.loads(request.body)
+        container = data.get('container')
+        prefix = data.get('prefix') or None
+        changes = _header_changes(data.get('headers'))
+    except (ValueError, AttributeError):
+        container, changes = None, None
+
+    if not container or changes is None:
+        return HttpResponse(json.dumps({"error": str(_('Bad parameters'))}),
+            content_type='application/json', status=400)
+
+    if request.GET.get('async'):
+        job = submit_job(request, 'update_headers', container=container,
+                         prefix=prefix, headers=changes)
+        return _job_response(job, _('Headers update started'))
+
+    auth_token = get_token_id(request)
+    storage_url, http_conn = connection(request)
+
+    try:
+        done, failed = _update_headers(storage_url, auth_token, http_conn,
+                                       container, changes, prefix)
+    except client.ClientException as err:
+        log.exception('Exception: {0}'.format(err))
+        return HttpResponse(json.dumps({"error": err.msg}),
+            content_type='application/json', status=err.http_status or 500)
+
+    actionlog.log(request.user.username, "update",
+                  'Headers of {}/{}'.format(container, prefix or ''))
+
+    return HttpResponse(json.dumps({"updated": done, "failed": failed}),
+        content_type='application/json', status=200)
+
+
 @utils.project_required
 @login_required
 def get_deleted_objects(request, project, container, prefix=None):
-    """Return all deleted objects from a given container."""
+    """Returns a page of deleted objects from a given container.
+
+    The page starts after the "marker" query parameter and holds up to
+    "limit" objects (PAGINATION_SIZE by default). With a "delimiter", objects
+    in pseudofolders are grouped in "pseudofolders". "next_marker" is the
+    marker of the next page, or null on the last one. Objects come in name
+    order, as Swift lists them."""
 
     auth_token = get_token_id(request)
     storage_url, http_conn = connection(request)
-    public_url = get_storage_endpoint(request, 'publicURL')
     trash_container = "{}-{}".format(settings.SWIFT_TRASH_PREFIX, container)
+
+    marker = request.GET.get('marker') or None
+    delimiter = request.GET.get('delimiter') or None
+
+    try:
+        limit = min(int(request.GET.get('limit', settings.PAGINATION_SIZE)),
+                    10000)
+    except ValueError:
+        limit = 0
+
+    if limit <= 0:
+        return HttpResponse(json.dumps({"error": str(_('Bad parameters'))}),
+            content_type='application/json', status=400)
+
     objects = None
 
     try:
-        meta, objects = client.get_container(storage_url,
-            auth_token, trash_container, delimiter='', http_conn=http_conn)
+        meta, objects = client.get_container(storage_url, auth_token,
+            trash_container, prefix=prefix, delimiter=delimiter,
+            marker=marker, limit=limit, full_listing=False,
+            http_conn=http_conn)
     except client.ClientException as err:
         if err.http_status == 404:
             log.info("Not found: {}".format(trash_container))
@@ -1066,20 +1664,27 @@ def get_deleted_objects(request, project, container, prefix=None):
             content = {"error": err.msg}
 
     if objects is not None:
-        object_list = pseudofolder_object_list(objects, prefix, public_url)
+        deleted, pseudofolders = [], []
 
-        deleted = []
-        for item in object_list:
-            if 'prefix' not in item:
-                name = item.get('name')
+        for item in objects:
+            if 'subdir' in item:
+                pseudofolders.append(item['subdir'])
+            else:
                 deleted.append({
-                    "name": name,
-                    "size": item.get('bytes')
+                    "name": item.get('name'),
+                    "size": item.get('bytes'),
+                    "deleted_at": item.get('last_modified')
                 })
 
+        next_marker = None
+        if len(objects) >= limit:
+            next_marker = objects[-1].get('name') or objects[-1].get('subdir')
+
         status = 200
         content = {
             "deleted_objects": deleted,
+            "pseudofolders": pseudofolders,
+            "next_marker": next_marker,
             "prefix": prefix,
             "storage_url": storage_url,
             "original_container": container,
@@ -1112,29 +1717,22 @@ def restore_object(request, project):
     # valida se objeto a ser restaurado da lixeira já existe no container.
     try:
         if object_new_name != '':
-            client.head_object(storage_url,
+            head_cache.head_object(storage_url,
                 auth_token, container, object_new_name, http_conn=http_conn)
         else:
-            client.head_object(storage_url,
+            head_cache.head_object(storage_url,
                 auth_token, container, object_name, http_conn=http_conn)
 
         status = 409
 
-        # Novo nome será o nome original + timestamp + extensão
-        new_object_name = object_name.rsplit('.', 1)
-        orignal_name = new_object_name[0] + '_'
-        time_stamp = datetime.isoformat(datetime.now()).replace(':', '.')
-        extension_object = '.' + new_object_name[1]
-
-        final_new_object_name = orignal_name + time_stamp + extension_object
         content = {
             'original_object_name': object_name,
-            'new_object_name': final_new_object_name
+            'new_object_name': _trash_restore_name(object_name)
         }
 
     except client.ClientException as err:
         # Segue o fluxo normal se objeto a ser restaurado não foi localizado no container
-        obj_headers = client.head_object(storage_url,
+        obj_headers = head_cache.head_object(storage_url,
             auth_token, trash_container, object_name, http_conn=http_conn)
         custom_headers = {
             "X-Fresh-Metadata": "True",
@@ -1147,11 +1745,12 @@ def restore_object(request, project):
         # Upload do objeto para o container de origem
         try:
             if object_new_name != '':
-                client.put_object(storage_url, auth_token, container, object_new_name,
+                head_cache.put_object(storage_url, auth_token, container, object_new_name,
                     content_length=0, headers=custom_headers, http_conn=http_conn)
             else:
-                client.put_object(storage_url, auth_token, container, object_name,
+                head_cache.put_object(storage_url, auth_token, container, object_name,
                     content_length=0, headers=custom_headers, http_conn=http_conn)
+            listing_cache.invalidate(storage_url, container)
             messages.add_message(request, messages.SUCCESS,
                                  _('Object restored'))
             actionlog.log(request.user.username, "restore", object_name)
@@ -1164,6 +1763,379 @@ def restore_object(request, project):
         content_type='application/json', status=status)
 
 
+def _trash_restore_name(object_name):
+    """Name suggested when restoring an object over an existing one: the
+    original name + timestamp + extension."""
+
+    name, dot, extension = object_name.rpartition('.')
+    if not dot:
+        name, extension = object_name, ''
+
+    time_stamp = datetime.isoformat(datetime.now()).replace(':', '.')
+
+    return '{}_{}{}{}'.format(name, time_stamp, dot, extension)
+
+
+def _restore_from_trash(storage_url, auth_token, container, trash_container,
+                        object_name, remove=False):
+    """Restores an object from trash with a server-side copy, under a new
+    name if the container already has an object with its name. The trash
+    copy is kept, unless remove is True.
+
+    Returns the name the object was restored as."""
+
+    http_conn = swift_pool.http_connection(
+        storage_url, timeout=settings.SWIFT_REQUESTS_TIMEOUT)
+    auth_token = current_token(auth_token)
+    restored_name = object_name
+
+    try:
+        head_cache.head_object(storage_url, auth_token, container, object_name,
+                               http_conn=http_conn)
+        restored_name = _trash_restore_name(object_name)
+    except client.ClientException as err:
+        if err.http_status != 404:
+            raise
+
+    obj_headers = head_cache.head_object(storage_url, auth_token,
+        trash_container, object_name, http_conn=http_conn)
+    custom_headers = {
+        "X-Fresh-Metadata": "True",
+        "X-Copy-From": "/{}/{}".format(trash_container, object_name)
+    }
+    for key, value in obj_headers.items():
+        if "x-object-meta" in key:
+            custom_headers[key] = value
+
+    head_cache.put_object(storage_url, auth_token, container, restored_name,
+        content_length=0, headers=custom_headers, http_conn=http_conn)
+
+    if remove:
+        head_cache.delete_object(storage_url, auth_token, trash_container,
+                                 object_name, http_conn=http_conn)
+
+    return restored_name
+
+
+def _restore_objects(storage_url, auth_token, container, names, remove=False,
+                     done=None):
+    """Restores objects from the trash of container, running up to
+    SWIFT_TRASH_WORKERS copies at once.
+
+    names is an iterable of names in the trash. done is called with the
+    (name, restored name, error) of each object."""
+
+    trash_container = "{}-{}".format(settings.SWIFT_TRASH_PREFIX, container)
+
+    def restore(name):
+        return _restore_from_trash(storage_url, auth_token, container,
+                                   trash_container, name, remove)
+
+    try:
+        for name, future in concurrent_map(restore, names,
+                                           settings.SWIFT_TRASH_WORKERS):
+            restored_name, error = None, None
+
+            try:
+                restored_name = future.result()
+            except (client.ClientException,
+                    requests.exceptions.RequestException) as err:
+                log.exception('Exception: {0}'.format(err))
+                error = err
+
+            if done:
+                done(name, restored_name, error)
+    finally:
+        listing_cache.invalidate(storage_url, container)
+
+
+def _trash_names(storage_url, auth_token, http_conn, container, prefix):
+    """Names of the objects under prefix in the trash of container."""
+
+    trash_container = "{}-{}".format(settings.SWIFT_TRASH_PREFIX, container)
+    objects = iter_container_objects(storage_url, auth_token, trash_container,
+                                     http_conn, prefix=prefix)
+
+    return (obj['name'] for obj in objects)
+
+
+@job_handler('restore_objects', params=('container',))
+def restore_objects_job(job):
+    container = job.params['container']
+    names = job.params.get('objects')
+
+    if names is None:
+        names = _trash_names(job.storage_url, job.get_auth_token, job.http_conn,
+                             container, job.params.get('prefix'))
+
+    counts = {'restored': 0, 'failed': 0}
+
+    def done(name, restored_name, error):
+        if error:
+            counts['failed'] += 1
+            job.progress(errors=1)
+        else:
+            counts['restored'] += 1
+            job.progress(objects=1)
+            actionlog.log(job.username, "restore", name)
+
+    _restore_objects(job.storage_url, job.get_auth_token, container, names,
+                     remove=bool(job.params.get('remove_from_trash')),
+                     done=done)
+
+    message = '{restored} objects restored, {failed} failed'.format(**counts)
+    if counts['failed'] and not counts['restored']:
+        raise JobError(message)
+
+    return message
+
+
+@utils.project_required
+@login_required
+def restore_objects(request, project):
+    """Restores a batch of objects from trash.
+
+    Takes a JSON body with the "container" and either the "objects" names in
+    its trash or a "prefix" to restore everything under it. Objects whose
+    name is taken in the container are restored under a timestamped name.
+    Restored objects stay in trash, unless "remove_from_trash" is set. Returns the result
+    of each object, or starts a storage job with the async parameter."""
+
+    if request.method != 'POST':
+        return HttpResponse(status=405)
+
+    try:
+        data = json.loads(request.body)
+        container = data.get('container')
+        names = data.get('objects')
+        prefix = data.get('prefix')
+        remove_from_trash = bool(data.get('remove_from_trash'))
+    except (ValueError, AttributeError):
+        container = None
+
+    if not container or (names is None and prefix is None) or \
+       not isinstance(names, (list, type(None))):
+        return HttpResponse(json.dumps({"error": str(_('Bad parameters'))}),
+            content_type='application/json', status=400)
+
+    if request.GET.get('async'):
+        return _job_response(submit_job(request, 'restore_objects',
+                                        container=container, objects=names,
+                                        prefix=prefix,
+                                        remove_from_trash=remove_from_trash),
+                             _('Restore started'))
+
+    auth_token = get_token_id(request)
+    storage_url, http_conn = connection(request)
+
+    if names is None:
+        names = _trash_names(storage_url, auth_token, http_conn, container,
+                             prefix)
+
+    results = []
+
+    def done(name, restored_name, error):
+        if error:
+            results.append({"name": name, "error": str(error),
+                            "status": getattr(error, 'http_status', None)})
+        else:
+            results.append({"name": name, "restored_as": restored_name})
+            actionlog.log(request.user.username, "restore", name)
+
+    try:
+        _restore_objects(storage_url, auth_token, container, names,
+                         remove=remove_from_trash, done=done)
+    except client.ClientException as err:
+        log.exception('Exception: {0}'.format(err))
+        return HttpResponse(json.dumps({"error": err.msg}),
+            content_type='application/json', status=err.http_status or 500)
+
+    failed = len([result for result in results if 'error' in result])
+    content = {
+        "results": results,
+        "restored": len(results) - failed,
+        "failed": failed
+    }
+
+    return HttpResponse(json.dumps(content),
+        content_type='application/json', status=200)
+
+
+def _trash_objects(storage_url, auth_token, http_conn, trash_container,
+                   prefix=None, older_than=None):
+    """Streams the objects of a trash container, under prefix and deleted
+    more than older_than days ago when given."""
+
+    objects = iter_container_objects_parallel(storage_url, auth_token,
+        trash_container, http_conn, prefix=prefix, ordered=False)
+
+    if older_than is None:
+        return objects
+
+    # last_modified is the deletion time of trash copies
+    cutoff = _last_modified_cutoff(older_than)
+
+    return (obj for obj in objects if obj.get('last_modified', '') < cutoff)
+
+
+def _purge_trash(storage_url, auth_token, http_conn, container, prefix=None,
+                 older_than=None, job=None):
+    """Deletes objects from the trash of container with bulk delete, all of
+    them or those under prefix and/or deleted more than older_than days ago.
+
+    Returns the number of objects deleted and failed to delete."""
+
+    trash_container = "{}-{}".format(settings.SWIFT_TRASH_PREFIX, container)
+    objects = _trash_objects(storage_url, auth_token, http_conn,
+                             trash_container, prefix, older_than)
+
+    return _delete_objects(storage_url, auth_token, http_conn,
+                           trash_container, objects, job)
+
+
+def _expire_trash_object(storage_url, auth_token, trash_container,
+                         object_name, delete_after):
+    # Keeps the object's content-type and other headers a POST replaces
+    update_object_headers(storage_url, auth_token, trash_container,
+                          object_name, {'x-delete-after': delete_after})
+
+
+def _expire_trash(storage_url, auth_token, http_conn, container, delete_after,
+                  prefix=None, older_than=None, job=None):
+    """Sets X-Delete-After on objects of the trash of container, so the
+    Swift object expirer deletes them, SWIFT_TRASH_WORKERS at once.
+
+    Returns the number of objects set to expire and failed to set."""
+
+    trash_container = "{}-{}".format(settings.SWIFT_TRASH_PREFIX, container)
+    names = (obj['name'] for obj in _trash_objects(
+        storage_url, auth_token, http_conn, trash_container, prefix,
+        older_than))
+
+    def expire(name):
+        _expire_trash_object(storage_url, auth_token, trash_container, name,
+                             delete_after)
+
+    count_expiring, count_failures = 0, 0
+
+    for name, future in concurrent_map(expire, names,
+                                       settings.SWIFT_TRASH_WORKERS):
+        try:
+            future.result()
+            count_expiring += 1
+            if job:
+                job.progress(objects=1)
+        except (client.ClientException,
+                requests.exceptions.RequestException) as err:
+            log.exception('Exception: {0}'.format(err))
+            count_failures += 1
+            if job:
+                job.progress(errors=1)
+
+    return count_expiring, count_failures
+
+
+def _trash_params(data):
+    """Validated container, prefix, older_than and delete_after of a trash
+    purge request, or None."""
+
+    try:
+        params = {
+            'container': data.get('container'),
+            'prefix': data.get('prefix') or None,
+            'older_than': data.get('older_than'),
+            'delete_after': data.get('delete_after'),
+        }
+        for key in ('older_than', 'delete_after'):
+            if params[key] is not None:
+                params[key] = int(params[key])
+                if params[key] < 0:
+                    return None
+    except (ValueError, TypeError, AttributeError):
+        return None
+
+    if not params['container']:
+        return None
+
+    return params
+
+
+@job_handler('purge_trash', params=('container',))
+def purge_trash_job(job):
+    params = job.params
+    delete_after = params.get('delete_after')
+
+    if delete_after is not None:
+        done, failed = _expire_trash(job.storage_url, job.get_auth_token,
+            job.http_conn, params['container'], delete_after,
+            params.get('prefix'), params.get('older_than'), job=job)
+        message = '{} objects set to expire, {} failed'.format(done, failed)
+    else:
+        done, failed = _purge_trash(job.storage_url, job.get_auth_token,
+            job.http_conn, params['container'], params.get('prefix'),
+            params.get('older_than'), job=job)
+        message = '{} objects deleted, {} failed'.format(done, failed)
+
+    if failed and not done:
+        raise JobError(message)
+
+    actionlog.log(job.username, "purge_trash", params['container'])
+
+    return message
+
+
+@utils.project_required
+@login_required
+def purge_trash(request, project):
+    """Empties the trash of a container.
+
+    Takes a JSON body with the "container", and optionally a "prefix" and an
+    "older_than" number of days, to purge only the objects under the prefix
+    and/or deleted before that. Objects are deleted with bulk delete, or,
+    with "delete_after", set to be deleted by Swift after that many seconds.
+    Starts a storage job with the async parameter."""
+
+    if request.method != 'POST':
+        return HttpResponse(status=405)
+
+    try:
+        params = _trash_params(json.loads(request.body))
+    except ValueError:
+        params = None
+
+    if params is None:
+        return HttpResponse(json.dumps({"error": str(_('Bad parameters'))}),
+            content_type='application/json', status=400)
+
+    if request.GET.get('async'):
+        return _job_response(submit_job(request, 'purge_trash', **params),
+                             _('Trash purge started'))
+
+    auth_token = get_token_id(request)
+    storage_url, http_conn = connection(request)
+    container = params['container']
+
+    try:
+        if params['delete_after'] is not None:
+            done, failed = _expire_trash(storage_url, auth_token, http_conn,
+                container, params['delete_after'], params['prefix'],
+                params['older_than'])
+            content = {"expiring": done, "failed": failed}
+        else:
+            done, failed = _purge_trash(storage_url, auth_token, http_conn,
+                container, params['prefix'], params['older_than'])
+            content = {"deleted": done, "failed": failed}
+    except client.ClientException as err:
+        log.exception('Exception: {0}'.format(err))
+        return HttpResponse(json.dumps({"error": err.msg}),
+            content_type='application/json', status=err.http_status or 500)
+
+    actionlog.log(request.user.username, "purge_trash", container)
+
+    return HttpResponse(json.dumps(content),
+        content_type='application/json', status=200)
+
+
 @utils.project_required
 @login_required
 def remove_from_trash(request, project):
@@ -1210,7 +2182,7 @@ def config_trash_container(request, project, container):
                 '{} "{}"'.format(_('Trash enabled for container'), container)
             )
 
-        client.put_container(storage_url, auth_token, container,
+        head_cache.put_container(storage_url, auth_token, container,
             headers={'X-Storage-Token': auth_token, 'X-Undelete-Enabled': str(enable)},
             http_conn=http_conn)
 
@@ -1233,7 +2205,7 @@ def container_trash_status(request, project, container):
 
     status, content = 200, {'status': 'enabled'}
     try:
-        headers = client.head_container(storage_url,
+        headers = head_cache.head_container(storage_url,
             auth_token, container, http_conn=http_conn)
 
         undelete_enabled = headers.get('x-undelete-enabled')
@@ -1256,7 +2228,7 @@ def container_acl_update(request, project, container):
     auth_token = get_token_id(request)
     storage_url, http_conn = connection(request)
 
-    headers = client.head_container(storage_url,
+    headers = head_cache.head_container(storage_url,
         auth_token, container, http_conn=http_conn)
 
     msg = ''
@@ -1272,7 +2244,7 @@ def container_acl_update(request, project, container):
     status, content = 200, {'message': str(msg)}
 
     try:
-        client.post_container(storage_url,
+        head_cache.post_container(storage_url,
             auth_token, container, headers=headers, http_conn=http_conn)
         if public:
             actionlog.log(request.user.username, "set_public", container)
@@ -1299,7 +2271,7 @@ def container_acl_status(request, project, container):
 
     status, content = 200, {'status': 'disabled'}
     try:
-        headers = client.head_container(storage_url,
+        headers = head_cache.head_container(storage_url,
             auth_token, container, http_conn=http_conn)
 
         acl_header = headers.get('x-container-read', '')
@@ -1315,6 +2287,57 @@ def container_acl_status(request, project, container):
         content_type='application/json', status=status)
 
 
+@utils.project_required
+@login_required
+def container_summary(request, project, container):
+    """
+    Returns the trash, ACL (public), CORS, versioning, quota, usage and
+    backup status of a container, from a single HEAD and a single database
+    lookup
+    """
+
+    auth_token = get_token_id(request)
+    storage_url, http_conn = connection(request)
+
+    try:
+        headers = head_cache.head_container(storage_url,
+            auth_token, container, http_conn=http_conn)
+    except client.ClientException as err:
+        log.exception('Exception: {0}'.format(err))
+        return HttpResponse(json.dumps({'message': 'Access denied'}),
+            content_type='application/json', status=500)
+
+    def enabled(value):
+        return 'enabled' if value else 'disabled'
+
+    def number(key):
+        try:
+            return int(headers.get(key))
+        except (TypeError, ValueError):
+            return None
+
+    undelete_enabled = headers.get('x-undelete-enabled')
+    backup = get_current_backup(container, request.session.get('project_id'))
+
+    content = {
+        'container': container,
+        'trash': enabled(undelete_enabled not in (None, 'False')),
+        'acl': enabled('.r:*' in headers.get('x-container-read', '')),
+        'cors': headers.get('x-container-meta-access-control-allow-origin', ''),
+        'versioning': headers.get('x-versions-location'),
+        'quota': {
+            'bytes': number('x-container-meta-quota-bytes'),
+            'count': number('x-container-meta-quota-count'),
+        },
+        'objects': number('x-container-object-count'),
+        'bytes': number('x-container-bytes-used'),
+        'backup': enabled(backup),
+    }
+
+    return HttpResponse(json.dumps(content),
+        content_type='application/json', status=200)
+
+
 class SwiftJsonInfo(JsonInfo):
 
     def generate_menu_info(self):
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+
+""" Generation of the access of teams to projects.
+
+The generation is kept in Django's cache. Only processes sharing a cache
+backend (VAULT_CACHE_BACKEND) see each other's changes at once: with the
+default per-process cache, other processes keep their cached decisions until
+PROJECT_CHECK_TTL or PROJECT_LIST_CACHE_TIME end. """
+
+import uuid
+
+from django.core.cache import cache
+from django.contrib.auth.models import Group, User
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from vault.models import GroupProjects
+
+GENERATION_KEY = 'vault:access:generation'
+
+
+def access_generation():
+    """
+    Returns the current generation of the access of teams to projects.
+    Decisions cached with an older generation must not be used.
+    """
+
+    generation = cache.get(GENERATION_KEY)
+
+    if generation is None:
+        cache.add(GENERATION_KEY, uuid.uuid4().hex, None)
+        generation = cache.get(GENERATION_KEY)
+
+    return generation
+
+
+def invalidate_access():
+    """Starts a new generation, after teams, their projects or Keystone
+    projects change."""
+    cache.set(GENERATION_KEY, uuid.uuid4().hex, None)
+
+
+@receiver(post_save, sender=GroupProjects)
+@receiver(post_delete, sender=GroupProjects)
+@receiver(post_delete, sender=Group)
+def _group_projects_changed(sender, **kwargs):
+    invalidate_access()
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def _group_members_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_access()
@@ -7,3 +7,7 @@ from django.utils.translation import gettext_lazy as _
 class VaultConfig(AppConfig):
     name = 'vault'
     verbose_name = _("Vault")
+
+    def ready(self):
+        # Connects the signals that invalidate cached access to projects
+        from vault import access  # noqa
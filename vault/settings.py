@@ -52,6 +52,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "storage.middleware.HeadCacheMiddleware",
 ]
 
 TEMPLATES = [
@@ -139,6 +140,24 @@ DATABASES = {
     }
 }
 
+# Listing cache and access generations, and other cached state, are shared by
+# every Vault process (web workers and storage_worker) only through a shared
+# backend. The default local memory cache is per process and only suits a
+# single process. A shared one is, e.g., VAULT_CACHE_BACKEND set to
+# django.core.cache.backends.db.DatabaseCache with VAULT_CACHE_LOCATION set to
+# vault_cache (after "manage.py createcachetable")
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv("VAULT_CACHE_BACKEND",
+                             "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.getenv("VAULT_CACHE_LOCATION", ""),
+    }
+}
+
+# Listings and project access checks are only cached by default with a shared
+# cache backend, as processes can't invalidate each other's local memory
+CACHE_SHARED = not CACHES["default"]["BACKEND"].endswith(".LocMemCache")
+
 MAX_FILES_UPLOAD = os.getenv("MAX_FILES_UPLOAD", 15)
 
 # Help url
@@ -171,6 +190,69 @@ SWIFT_INSECURE = os.getenv("VAULT_SWIFT_INSECURE", "False") == "True"
 # Timeout for requests made with swiftclient
 SWIFT_REQUESTS_TIMEOUT = os.getenv("VAULT_SWIFT_REQUESTS_TIMEOUT", 60)
 
+# Connections to each Swift endpoint are kept alive and reused: at most
+# SWIFT_POOL_MAXSIZE idle connections per host, recycled after
+# SWIFT_POOL_IDLE_TIMEOUT seconds without use
+SWIFT_POOL_MAXSIZE = int(os.getenv("VAULT_SWIFT_POOL_MAXSIZE", 10))
+SWIFT_POOL_IDLE_TIMEOUT = int(os.getenv("VAULT_SWIFT_POOL_IDLE_TIMEOUT", 50))
+
+# Size (in bytes) of each chunk relayed to the browser on object downloads
+SWIFT_DOWNLOAD_CHUNK_SIZE = int(os.getenv("VAULT_SWIFT_DOWNLOAD_CHUNK_SIZE",
+                                          64 * 1024))
+
+# When True, downloads redirect the browser to a signed Swift TempURL
+# instead of passing the object through Vault
+SWIFT_DOWNLOAD_TEMPURL = os.getenv("VAULT_SWIFT_DOWNLOAD_TEMPURL", "False") == "True"
+SWIFT_TEMPURL_EXPIRES = int(os.getenv("VAULT_SWIFT_TEMPURL_EXPIRES", 300))
+
+# Seconds the capabilities of a Swift cluster (/info) are kept in cache
+SWIFT_INFO_CACHE_TIME = int(os.getenv("VAULT_SWIFT_INFO_CACHE_TIME", 3600))
+
+# Seconds an account's temp-url key is kept in cache
+SWIFT_TEMP_KEY_CACHE_TIME = int(os.getenv("VAULT_SWIFT_TEMP_KEY_CACHE_TIME", 600))
+
+# Seconds account and container listing pages are kept in cache (0 disables).
+# Views that change a listing invalidate it
+SWIFT_LISTING_CACHE_TIME = int(os.getenv("VAULT_SWIFT_LISTING_CACHE_TIME",
+                                         10 if CACHE_SHARED else 0))
+
+# Uploads are sent to Swift in chunks of SWIFT_UPLOAD_CHUNK_SIZE bytes. Files
+# bigger than SWIFT_SLO_THRESHOLD are split in segments of SWIFT_SLO_SEGMENT_SIZE
+# bytes, uploaded by SWIFT_SLO_WORKERS threads and joined by a Static Large
+# Object manifest
+SWIFT_UPLOAD_CHUNK_SIZE = int(os.getenv("VAULT_SWIFT_UPLOAD_CHUNK_SIZE", 64 * 1024))
+SWIFT_SLO_THRESHOLD = int(os.getenv("VAULT_SWIFT_SLO_THRESHOLD", 1024 ** 3))
+SWIFT_SLO_SEGMENT_SIZE = int(os.getenv("VAULT_SWIFT_SLO_SEGMENT_SIZE", 100 * 1024 ** 2))
+SWIFT_SLO_WORKERS = int(os.getenv("VAULT_SWIFT_SLO_WORKERS", 4))
+
+# Container removal sends up to SWIFT_BULK_DELETE_WORKERS bulk-delete requests
+# at once, retrying names that failed with a transient error up to
+# SWIFT_BULK_DELETE_RETRIES times
+SWIFT_BULK_DELETE_WORKERS = int(os.getenv("VAULT_SWIFT_BULK_DELETE_WORKERS", 4))
+SWIFT_BULK_DELETE_RETRIES = int(os.getenv("VAULT_SWIFT_BULK_DELETE_RETRIES", 3))
+
+# Listings of big containers are split in key ranges, listed by up to
+# SWIFT_LISTING_WORKERS threads at once
+SWIFT_LISTING_WORKERS = int(os.getenv("VAULT_SWIFT_LISTING_WORKERS", 8))
+
+# Batch restores from trash, and expiration of trash objects, handle up to
+# SWIFT_TRASH_WORKERS objects at once
+SWIFT_TRASH_WORKERS = int(os.getenv("VAULT_SWIFT_TRASH_WORKERS", 8))
+
+# Bulk header updates (metadata, Cache-Control, expiration) handle up to
+# SWIFT_HEADER_UPDATE_WORKERS objects at once, retrying each object up to
+# SWIFT_HEADER_UPDATE_RETRIES times on transient errors
+SWIFT_HEADER_UPDATE_WORKERS = int(os.getenv("VAULT_SWIFT_HEADER_UPDATE_WORKERS", 8))
+SWIFT_HEADER_UPDATE_RETRIES = int(os.getenv("VAULT_SWIFT_HEADER_UPDATE_RETRIES", 3))
+
+# Storage jobs (e.g. deleting big containers) are run by the storage_worker
+# command, STORAGE_JOB_WORKERS at a time, looking for new jobs every
+# STORAGE_JOB_POLL_INTERVAL seconds. A running job that stops reporting for
+# STORAGE_JOB_STALE_TIMEOUT seconds is queued again
+STORAGE_JOB_WORKERS = int(os.getenv("VAULT_STORAGE_JOB_WORKERS", 4))
+STORAGE_JOB_POLL_INTERVAL = int(os.getenv("VAULT_STORAGE_JOB_POLL_INTERVAL", 2))
+STORAGE_JOB_STALE_TIMEOUT = int(os.getenv("VAULT_STORAGE_JOB_STALE_TIMEOUT", 300))
+
 # Keystone
 KEYSTONE_USERNAME = os.getenv("VAULT_KEYSTONE_USERNAME", "u_vault")
 KEYSTONE_PASSWORD = os.getenv("VAULT_KEYSTONE_PASSWORD", "u_vault")
@@ -184,6 +266,30 @@ KEYSTONE_TIMEOUT = os.getenv("VAULT_KEYSTONE_TIMEOUT", 3)
 # KEYSTONE_INSECURE = False
 KEYSTONE_ROLE = os.getenv("VAULT_KEYSTONE_ROLE")  # swiftoperator role ID
 
+# Keystone tokens are reused by every connection of the same identity, and
+# renewed in background KEYSTONE_TOKEN_REFRESH seconds before they expire
+KEYSTONE_TOKEN_REFRESH = int(os.getenv("VAULT_KEYSTONE_TOKEN_REFRESH", 300))
+
+# Keystone connections kept per process, one per identity (LRU). They are
+# dropped when their token is about to be renewed
+KEYSTONE_CLIENT_CACHE_SIZE = int(os.getenv("VAULT_KEYSTONE_CLIENT_CACHE_SIZE", 32))
+
+# Seconds the Keystone projects, users and roles are indexed by name and id
+# before being listed again (in background). 0 lists them on every lookup
+KEYSTONE_DIRECTORY_TTL = int(os.getenv("VAULT_KEYSTONE_DIRECTORY_TTL", 60))
+
+# Seconds a user keeps being allowed to use the project in session without
+# checking it again. Changes to teams or their projects end it sooner, in the
+# processes that share the cache (see CACHES)
+PROJECT_CHECK_TTL = int(os.getenv("VAULT_PROJECT_CHECK_TTL",
+                                  60 if CACHE_SHARED else 0))
+
+# Seconds the projects each user has access to (project switcher) are cached.
+# Changes to teams, their projects or Keystone projects end it sooner, in the
+# processes that share the cache (see CACHES)
+PROJECT_LIST_CACHE_TIME = int(os.getenv("VAULT_PROJECT_LIST_CACHE_TIME",
+                                        60 if CACHE_SHARED else 0))
+
 # Cache
 CACHE_APIS_ENABLED = os.getenv("CACHE_APIS_ENABLED", "False") == "True"
 CACHESWEEP_API = os.getenv("CACHESWEEP_API", "")
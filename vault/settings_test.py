@@ -9,3 +9,11 @@ DATABASES = {
         'NAME': os.getenv('DATABASES_DEFAULT_NAME', 'vault_test.db'),
     }
 }
+
+# Each test mocks its own Keystone listings
+KEYSTONE_DIRECTORY_TTL = 0
+
+# Tests run in a single process, which can cache in local memory
+SWIFT_LISTING_CACHE_TIME = 10
+PROJECT_CHECK_TTL = 60
+PROJECT_LIST_CACHE_TIME = 60
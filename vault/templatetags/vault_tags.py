@@ -1,8 +1,7 @@
 from urllib.parse import urlencode
 from django import template
 from django.conf import settings
-from vault.models import GroupProjects
-from identity.keystone import KeystoneNoRequest
+from vault.utils import accessible_projects
 
 register = template.Library()
 
@@ -24,27 +23,12 @@ def get_vault_env(context):
 @register.inclusion_tag('vault/set_project.html', takes_context=True)
 def set_project(context):
     user = context.get('user')
-    groups = user.groups.all()
-    keystone = KeystoneNoRequest()
-    group_projects = []
-
-    for group in groups:
-        gps = GroupProjects.objects.filter(group=group.id)
-        gps_ks = [x for x in
-                filter(lambda x: x.enabled, keystone.project_list())]
-        gp_projs = []
-
-        for gp in gps:
-            for gp_ks in gps_ks:
-                if gp.project == gp_ks.id:
-                    gp_projs.append(gp_ks)
-                    break
-
-        gp_projs.sort(key=lambda x: x.name.lower())
-        group_projects.append({
-            'team': group.name,
-            'projects': gp_projs
-        })
+    teams = accessible_projects(user)
+
+    group_projects = [{
+        'team': team['team'],
+        'projects': [x for x in team['projects'] if x['enabled']]
+    } for team in teams]
 
     current_project = {'id': context.get('project_id'),
                        'name': context.get('project_name')}
@@ -57,7 +41,7 @@ def set_project(context):
     return {
         'current_project': current_project,
         'group_projects': group_projects,
-        'has_group': user.groups.count() > 0
+        'has_group': len(teams) > 0
     }
 
 
@@ -71,6 +71,7 @@ def fake_request(path='/', method='GET', user=True, extra={}):
 def build_fake_session():
     fake_session = SessionStore()
     fake_session['token_time'] = timedelta(minutes=15) + datetime.utcnow()
+    fake_session['auth_token'] = 'fake_token'
     fake_session['project_id'] = '1'
     fake_session['project_name'] = 'fake_project'
     fake_session['service_catalog'] = {
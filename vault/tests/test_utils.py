@@ -4,17 +4,21 @@
 Unit tests for utils functions
 """
 
+import time
 import datetime
 
 from unittest import TestCase
-from unittest.mock import patch
+from unittest.mock import Mock, patch
 
 from keystoneclient.v3.projects import Project
 
 from vault import utils
-from vault.models import CurrentProject
+from identity.keystone import keystone_clients
+from vault.models import CurrentProject, GroupProjects
 from django.core.paginator import PageNotAnInteger, EmptyPage
-from vault.tests.fakes import fake_request, UserFactory
+from vault.tests.fakes import fake_request, UserFactory, GroupFactory
+from vault.templatetags import vault_tags
+from identity.tests.fakes import FakeResource
 
 
 class TestVaultUtils(TestCase):
@@ -25,6 +29,7 @@ class TestVaultUtils(TestCase):
 
     def tearDown(self):
         patch.stopall()
+        keystone_clients.invalidate()
 
     def test_generic_pagination(self):
         items = [1, 2, 3, 4, 5, 6]
@@ -121,7 +126,7 @@ class TestVaultUtils(TestCase):
 
         self.assertEqual(result_project, None)
 
-    @patch('identity.keystone.Keystone._create_keystone_connection')
+    @patch('identity.keystone.KeystoneNoRequest._create_keystone_connection')
     def test_maybe_update_token_without_time_token_value(self, keystone_conn_mock):
         conn_mock = keystone_conn_mock.return_value
         conn_mock.auth_token = '12345678'
@@ -132,7 +137,7 @@ class TestVaultUtils(TestCase):
 
         self.assertTrue(result)
 
-    @patch('identity.keystone.Keystone._create_keystone_connection')
+    @patch('identity.keystone.KeystoneNoRequest._create_keystone_connection')
     def test_maybe_update_token_with_expired_time_token(self, keystone_conn_mock):
         conn_mock = keystone_conn_mock.return_value
         conn_mock.auth_token = '12345678'
@@ -144,7 +149,7 @@ class TestVaultUtils(TestCase):
 
         self.assertTrue(result)
 
-    @patch('identity.keystone.Keystone._create_keystone_connection')
+    @patch('identity.keystone.KeystoneNoRequest._create_keystone_connection')
     def test_maybe_update_token_with_valid_time_token(self, keystone_conn_mock):
         conn_mock = keystone_conn_mock.return_value
         conn_mock.auth_token = '12345678'
@@ -155,3 +160,180 @@ class TestVaultUtils(TestCase):
         result = utils.maybe_update_token(request)
 
         self.assertFalse(result)
+
+    @patch('identity.keystone.KeystoneNoRequest._create_keystone_connection')
+    def test_maybe_update_token_not_allowed(self, keystone_conn_mock):
+        patch('identity.keystone.Keystone.is_allowed_to_connect',
+              return_value=False).start()
+
+        request = fake_request(method='GET')
+        request.session['token_time'] = None
+        result = utils.maybe_update_token(request)
+
+        self.assertFalse(result)
+        self.assertFalse(keystone_conn_mock.called)
+
+
+class TestProjectCheckCache(TestCase):
+
+    def setUp(self):
+        self.project = Project('123', {})
+        self.project.id = 'abc123'
+        self.project.name = 'project1'
+
+        self.mock_get_keystone = patch.object(
+            utils.keystone_clients, 'get_keystone').start()
+        self.keystone = self.mock_get_keystone.return_value
+        self.keystone.project_get_by_name.return_value = self.project
+
+        self.request = fake_request(method='GET')
+        self.request.session['project_id'] = self.project.id
+        self.request.session['project_name'] = self.project.name
+
+    def tearDown(self):
+        patch.stopall()
+
+    def check(self, project_name='project1'):
+        return utils.project_check(self.request, project_name)
+
+    def test_decision_is_cached(self):
+        self.assertTrue(self.check())
+        self.assertTrue(self.check())
+
+        self.assertEqual(self.mock_get_keystone.call_count, 1)
+        self.assertEqual(self.keystone.project_get_by_name.call_count, 1)
+
+    def test_other_project_is_checked(self):
+        self.check()
+        self.keystone.project_get_by_name.return_value = None
+
+        self.assertFalse(self.check('project2'))
+        self.assertEqual(self.mock_get_keystone.call_count, 2)
+
+    def test_other_user_is_checked(self):
+        self.check()
+        self.request.user = UserFactory(username='other_user')
+        self.check()
+
+        self.assertEqual(self.mock_get_keystone.call_count, 2)
+
+    def test_expired_decision_is_checked(self):
+        self.check()
+        self.request.session['project_check']['expires'] = time.time() - 1
+        self.check()
+
+        self.assertEqual(self.mock_get_keystone.call_count, 2)
+
+    def test_group_projects_change_invalidates(self):
+        self.check()
+        GroupProjects.objects.create(group=self.request.user.groups.first(),
+                                     project='other_project')
+        self.check()
+
+        self.assertEqual(self.mock_get_keystone.call_count, 2)
+
+    def test_group_membership_change_invalidates(self):
+        self.check()
+        self.request.user.groups.add(GroupFactory())
+        self.check()
+
+        self.assertEqual(self.mock_get_keystone.call_count, 2)
+
+    def test_denied_decision_is_not_cached(self):
+        self.mock_get_keystone.return_value = None
+
+        self.assertFalse(self.check())
+        self.assertNotIn('project_check', self.request.session)
+
+    @patch('vault.utils.maybe_update_token', Mock(return_value=False))
+    def test_project_required_steady_state(self):
+        view = Mock(return_value='response')
+        wrapped = utils.project_required(view)
+
+        for _ in range(3):
+            self.assertEqual(wrapped(self.request, project='project1'),
+                             'response')
+
+        self.assertEqual(self.mock_get_keystone.call_count, 1)
+
+
+class TestAccessibleProjects(TestCase):
+
+    def setUp(self):
+        self.projects = [FakeResource(1, 'Project_b'), FakeResource(2, 'project_a'),
+                         FakeResource(3, 'project_c')]
+        for project in self.projects:
+            project.id = str(project.id)
+        self.projects[2].enabled = False
+
+        patch('identity.keystone.KeystoneBase._create_keystone_connection').start()
+        self.mock_project_list = patch(
+            'identity.keystone.KeystoneBase.project_list').start()
+        self.mock_project_list.side_effect = lambda: list(self.projects)
+
+        self.team = GroupFactory(name='team_1')
+        self.other_team = GroupFactory(name='team_2')
+        self.user = UserFactory(groups=(self.team, self.other_team))
+
+        GroupProjects.objects.create(group=self.team, project='1', owner=True)
+        GroupProjects.objects.create(group=self.team, project='2')
+        GroupProjects.objects.create(group=self.other_team, project='3')
+        GroupProjects.objects.create(group=self.other_team, project='deleted')
+
+    def tearDown(self):
+        patch.stopall()
+        GroupProjects.objects.all().delete()
+
+    def test_teams_and_projects_are_joined(self):
+        teams = utils.accessible_projects(self.user)
+        by_team = {team['team']: team['projects'] for team in teams}
+
+        self.assertEqual([p['name'] for p in by_team['team_1']],
+                         ['project_a', 'Project_b'])
+        self.assertEqual([p['owner'] for p in by_team['team_1']], [False, True])
+        self.assertEqual([p['id'] for p in by_team['team_2']], ['3'])
+        self.assertFalse(by_team['team_2'][0]['enabled'])
+        self.assertEqual(self.mock_project_list.call_count, 1)
+
+    def test_projects_are_cached(self):
+        utils.accessible_projects(self.user)
+        utils.accessible_projects(self.user)
+
+        self.assertEqual(self.mock_project_list.call_count, 1)
+
+    def test_group_projects_change_invalidates(self):
+        utils.accessible_projects(self.user)
+        GroupProjects.objects.filter(project='2').delete()
+        teams = utils.accessible_projects(self.user)
+
+        self.assertEqual(self.mock_project_list.call_count, 2)
+        self.assertEqual(len(teams[0]['projects']) + len(teams[1]['projects']), 2)
+
+    def test_group_membership_change_invalidates(self):
+        utils.accessible_projects(self.user)
+        self.user.groups.remove(self.other_team)
+        teams = utils.accessible_projects(self.user)
+
+        self.assertEqual([team['team'] for team in teams], ['team_1'])
+
+    def test_project_change_invalidates(self):
+        utils.accessible_projects(self.user)
+        utils.KeystoneNoRequest().project_update('1', name='renamed')
+        utils.accessible_projects(self.user)
+
+        self.assertEqual(self.mock_project_list.call_count, 2)
+
+    def test_user_without_team(self):
+        user = UserFactory(username='no_team_user')
+
+        self.assertEqual(utils.accessible_projects(user), [])
+        self.assertFalse(self.mock_project_list.called)
+
+    def test_set_project_tag(self):
+        request = fake_request(method='GET')
+        context = vault_tags.set_project({'user': self.user, 'request': request})
+        by_team = {gp['team']: gp['projects'] for gp in context['group_projects']}
+
+        self.assertTrue(context['has_group'])
+        self.assertEqual(len(by_team['team_1']), 2)
+        self.assertEqual(by_team['team_2'], [])
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 
 import os
+import time
 import logging
 
 from datetime import datetime, timedelta
@@ -9,6 +10,7 @@ from cryptography.fernet import Fernet
 from swiftclient import client
 
 from django.conf import settings
+from django.core.cache import cache
 from django.contrib import messages
 from django.shortcuts import render
 from django.urls import reverse
@@ -17,26 +19,14 @@ from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 
 from keystoneclient import exceptions
 
+from vault.access import access_generation
 from vault.models import GroupProjects, CurrentProject
-from identity.keystone import Keystone, KeystoneNoRequest
+from identity.keystone import (KeystoneNoRequest, keystone_clients,
+                               keystone_directory)
 
 log = logging.getLogger(__name__)
 
 
-class KeystoneSingleton:
-
-    def __init__(self):
-        self.keystone = None
-
-    def get_keystone(self, request):
-        if not self.keystone:
-            self.keystone = Keystone(request)
-
-        return self.keystone
-
-
-keystone_singleton = KeystoneSingleton()
-
 def update_default_context(request, context={}):
     if not request.session.get('is_superuser'):
         request.session['is_superuser'] = request.user.is_superuser
@@ -107,7 +97,7 @@ def maybe_update_token(request):
         log.info('Updating token for user [{}]'.format(request.user))
 
         try:
-            keystone = keystone_singleton.get_keystone(request)
+            keystone = keystone_clients.get_keystone(request)
         except exceptions.AuthorizationFailure:
             msg = _('Unable to retrieve Keystone data')
             messages.add_message(request, messages.ERROR, msg)
@@ -115,7 +105,7 @@ def maybe_update_token(request):
 
             return False
 
-        if keystone.conn is None:
+        if keystone is None or keystone.conn is None:
             return False
 
         request.session['token_time'] = (timedelta(minutes=15) + datetime.utcnow())
@@ -139,6 +129,67 @@ def get_current_project(user_id):
     return keystone.project_get(current.project)
 
 
+def accessible_projects(user):
+    """
+    Returns the teams of user, each with the Keystone projects it has access
+    to (sorted by name):
+
+        [{'team': 'name', 'projects': [{'id': ..., 'name': ...,
+          'description': ..., 'enabled': True, 'owner': False}]}]
+
+    Kept for PROJECT_LIST_CACHE_TIME seconds, or until teams, their projects
+    or Keystone projects change (see vault.access).
+    """
+
+    ttl = settings.PROJECT_LIST_CACHE_TIME
+    key = 'vault:access:projects:{}:{}'.format(user.id, access_generation())
+
+    teams = cache.get(key) if ttl > 0 else None
+    if teams is None:
+        teams = _accessible_projects(user)
+        if ttl > 0:
+            cache.set(key, teams, ttl)
+
+    return teams
+
+
+def _accessible_projects(user):
+    groups = list(user.groups.all())
+    if not groups:
+        return []
+
+    group_projects = {}
+    for gp in GroupProjects.objects.filter(
+            group_id__in=[group.id for group in groups]):
+        group_projects.setdefault(gp.group_id, []).append(gp)
+
+    keystone = KeystoneNoRequest()
+    projects = {project.id: project
+                for project in keystone_directory.list(keystone, 'projects')}
+
+    teams = []
+    for group in groups:
+        team_projects = []
+
+        for gp in group_projects.get(group.id, []):
+            project = projects.get(gp.project)
+            if project is None:
+                continue
+
+            team_projects.append({
+                'id': project.id,
+                'name': project.name,
+                'description': getattr(project, 'description', ''),
+                'enabled': getattr(project, 'enabled', True),
+                'owner': bool(gp.owner),
+            })
+
+        team_projects.sort(key=lambda x: x['name'].lower())
+        teams.append({'team': group.name, 'projects': team_projects})
+
+    return teams
+
+
 def delete_current_project(user_id):
     """Delete from database user current project and removes it from session"""
 
@@ -169,13 +220,47 @@ def purge_current_project(request, project_id):
     return True
 
 
+def _cached_project_check(request, current_project):
+    """True if the user of request was allowed to use current_project (the
+    project in session) less than PROJECT_CHECK_TTL seconds ago."""
+
+    cached = request.session.get('project_check')
+    if not cached:
+        return False
+
+    checked = (cached['name'], cached['id'], cached['user'])
+    current = (current_project, request.session.get('project_id'),
+               request.user.id)
+
+    if checked != current or cached['expires'] <= time.time():
+        return False
+
+    return cached['generation'] == access_generation()
+
+
+def _cache_project_check(request, current_project):
+    if settings.PROJECT_CHECK_TTL <= 0:
+        return
+
+    request.session['project_check'] = {
+        'name': current_project,
+        'id': request.session.get('project_id'),
+        'user': request.user.id,
+        'expires': time.time() + settings.PROJECT_CHECK_TTL,
+        'generation': access_generation(),
+    }
+
+
 def project_check(request, current_project):
     project_id = request.session.get('project_id')
     user = request.user
 
     if current_project:
+        if _cached_project_check(request, current_project):
+            return True
+
         try:
-            keystone = keystone_singleton.get_keystone(request)
+            keystone = keystone_clients.get_keystone(request)
         except exceptions.AuthorizationFailure:
             msg = _('Unable to retrieve Keystone data')
             messages.add_message(request, messages.ERROR, msg)
@@ -183,7 +268,7 @@ def project_check(request, current_project):
 
             return False
 
-        if not keystone.conn:
+        if keystone is None or not keystone.conn:
             return False
 
         project = keystone.project_get_by_name(current_project)
@@ -202,6 +287,8 @@ def project_check(request, current_project):
             save_current_project(user.id, project.id)
             set_current_project(request, project)
 
+        _cache_project_check(request, current_project)
+
     return True
 
 
@@ -8,7 +8,8 @@ from django.http import JsonResponse, Http404
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth.decorators import login_required
 from identity.keystone import Keystone
-from vault.models import GroupProjects
+from vault.utils import accessible_projects
+from storage.connection import swift_pool
 from swift_cloud_tools.client import SCTClient
 
 log = logging.getLogger(__name__)
@@ -20,8 +21,7 @@ def get_conn_and_storage_url(request, project_id):
     endpoint = service.get('adminURL')
     _, current_id = endpoint.split('AUTH_')
     storage_url = endpoint.replace(current_id, project_id)
-    http_conn = client.http_connection(storage_url,
-        insecure=settings.SWIFT_INSECURE)
+    http_conn = swift_pool.http_connection(storage_url)
 
     return http_conn, storage_url
 
@@ -75,7 +75,7 @@ def swift_cloud_report(request):
 @login_required
 def swift_cloud_status(request):
     try:
-        keystone = Keystone(request)
+        teams = accessible_projects(request.user)
     except Exception as err:
         log.exception(f"Keystone error: {err}")
         return render(request, "vault/swift_cloud/status.html",
@@ -85,29 +85,21 @@ def swift_cloud_status(request):
     if not environ and "localhost" in request.get_host():
         environ = "local"
 
-    user = request.user
-    group_ids = [g.id for g in user.groups.all()]
     projects = []
-    keystone_projects = keystone.project_list()
 
-    try:
-        group_projects = GroupProjects.objects.filter(
-            group_id__in=group_ids, owner=True)
-        for project in keystone_projects:
-            for gp in group_projects:
-                if project.id == gp.project:
-                    projects.append({
-                        "id": project.id,
-                        "name": project.name,
-                        "description": project.description,
-                        "environment": environ,
-                        "team": gp.group.name,
-                        "status": "",
-                        "metadata": {}
-                    })
-        projects.sort(key=lambda p: p["name"].lower())
-    except Exception as err:
-        log.exception(f"Keystone error: {err}")
+    for team in teams:
+        for project in team["projects"]:
+            if project["owner"]:
+                projects.append({
+                    "id": project["id"],
+                    "name": project["name"],
+                    "description": project["description"],
+                    "environment": environ,
+                    "team": team["team"],
+                    "status": "",
+                    "metadata": {}
+                })
+    projects.sort(key=lambda p: p["name"].lower())
 
     # Get transfer status for all projects in swift cloud tools api
     sct_client = SCTClient(settings.SWIFT_CLOUD_TOOLS_URL,